@@ -0,0 +1,30 @@
+"""Add threat_model.updated_at version stamp
+
+Revision ID: b7c1e2d3f4a5
+Revises: a1b2c3d4e5f6
+Create Date: 2026-10-18 09:00:00.000000
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers
+revision: str = "b7c1e2d3f4a5"
+down_revision: Union[str, None] = "a1b2c3d4e5f6"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        "threat_model",
+        sa.Column(
+            "updated_at", sa.DateTime(), server_default=sa.func.now(), nullable=False
+        ),
+    )
+
+
+def downgrade() -> None:
+    op.drop_column("threat_model", "updated_at")
@@ -0,0 +1,39 @@
+"""Add gdd_snapshot table (per-parcel cumulative GDD by day)
+
+Revision ID: c3d4e5f6a7b8
+Revises: b7c1e2d3f4a5
+Create Date: 2026-10-18 09:30:00.000000
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers
+revision: str = "c3d4e5f6a7b8"
+down_revision: Union[str, None] = "b7c1e2d3f4a5"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "gdd_snapshot",
+        sa.Column("id",          sa.Integer(), nullable=False),
+        sa.Column("parcel_id",   sa.Integer(), nullable=False),
+        sa.Column("t_base",      sa.Float(),   nullable=False),
+        sa.Column("season_year", sa.Integer(), nullable=False),
+        sa.Column("date",        sa.Date(),    nullable=False),
+        sa.Column("gdd_cum",     sa.Float(),   nullable=False),
+        sa.ForeignKeyConstraint(["parcel_id"], ["parcel.id"], ondelete="CASCADE"),
+        sa.PrimaryKeyConstraint("id"),
+        sa.UniqueConstraint("id"),
+        sa.UniqueConstraint(
+            "parcel_id", "t_base", "date", name="uq_gdd_snapshot_parcel_base_date"
+        ),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("gdd_snapshot")
@@ -0,0 +1,44 @@
+"""Add fuzzy_risk_daily table (materialized daily fuzzy risk)
+
+Revision ID: d4e5f6a7b8c9
+Revises: c3d4e5f6a7b8
+Create Date: 2026-10-18 10:00:00.000000
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers
+revision: str = "d4e5f6a7b8c9"
+down_revision: Union[str, None] = "c3d4e5f6a7b8"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "fuzzy_risk_daily",
+        sa.Column("id",              sa.Integer(),    nullable=False),
+        sa.Column("parcel_id",       sa.Integer(),    nullable=False),
+        sa.Column("threat_model_id", sa.UUID(),       nullable=False),
+        sa.Column("model_version",   sa.DateTime(),   nullable=False),
+        sa.Column("date",            sa.Date(),       nullable=False),
+        sa.Column("risk_score",      sa.Float(),      nullable=False),
+        sa.Column("risk_class",      sa.String(20),   nullable=False),
+        sa.Column("detail",          sa.String(),     nullable=True),
+        sa.ForeignKeyConstraint(["parcel_id"], ["parcel.id"], ondelete="CASCADE"),
+        sa.ForeignKeyConstraint(["threat_model_id"], ["threat_model.id"], ondelete="CASCADE"),
+        sa.PrimaryKeyConstraint("id"),
+        sa.UniqueConstraint("id"),
+        # doubles as the (parcel, model, version, date) range-scan index
+        sa.UniqueConstraint(
+            "parcel_id", "threat_model_id", "model_version", "date",
+            name="uq_fuzzy_risk_daily_parcel_model_version_date",
+        ),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("fuzzy_risk_daily")
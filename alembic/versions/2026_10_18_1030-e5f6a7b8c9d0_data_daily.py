@@ -0,0 +1,55 @@
+"""Add data_daily table (daily rollup of hourly weather)
+
+Revision ID: e5f6a7b8c9d0
+Revises: d4e5f6a7b8c9
+Create Date: 2026-10-18 10:30:00.000000
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers
+revision: str = "e5f6a7b8c9d0"
+down_revision: Union[str, None] = "d4e5f6a7b8c9"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "data_daily",
+        sa.Column("id",                sa.Integer(), nullable=False),
+        sa.Column("parcel_id",         sa.Integer(), nullable=False),
+        sa.Column("date",              sa.Date(),    nullable=False),
+        sa.Column("temp_min",          sa.Float(),   nullable=True),
+        sa.Column("temp_max",          sa.Float(),   nullable=True),
+        sa.Column("temp_mean",         sa.Float(),   nullable=True),
+        sa.Column("humidity_mean",     sa.Float(),   nullable=True),
+        sa.Column("precipitation_sum", sa.Float(),   nullable=True),
+        sa.Column("hours",             sa.Integer(), nullable=False),
+        sa.Column("complete",          sa.Boolean(), nullable=False),
+        sa.ForeignKeyConstraint(["parcel_id"], ["parcel.id"], ondelete="CASCADE"),
+        sa.PrimaryKeyConstraint("id"),
+        sa.UniqueConstraint("id"),
+        sa.UniqueConstraint("parcel_id", "date", name="uq_data_daily_parcel_date"),
+    )
+    # backfill from the hourly rows already stored
+    op.execute(
+        """
+        INSERT INTO data_daily (parcel_id, date, temp_min, temp_max, temp_mean,
+                                humidity_mean, precipitation_sum, hours, complete)
+        SELECT parcel_id, date,
+               min(atmospheric_temperature), max(atmospheric_temperature), avg(atmospheric_temperature),
+               avg(atmospheric_relative_humidity), sum(precipitation),
+               count(id), count(id) >= 24
+        FROM data
+        WHERE parcel_id IS NOT NULL AND date IS NOT NULL
+        GROUP BY parcel_id, date
+        """
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("data_daily")
@@ -0,0 +1,64 @@
+"""Unique (parcel_id, date, time) on data, after removing duplicate hours
+
+Revision ID: f6a7b8c9d0e1
+Revises: e5f6a7b8c9d0
+Create Date: 2026-10-18 11:00:00.000000
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+
+# revision identifiers
+revision: str = "f6a7b8c9d0e1"
+down_revision: Union[str, None] = "e5f6a7b8c9d0"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Keep the oldest row of every duplicated hour and re-aggregate the days that had duplicates
+    op.execute(
+        """
+        CREATE TEMPORARY TABLE data_duplicate_days ON COMMIT DROP AS
+        SELECT DISTINCT a.parcel_id, a.date
+        FROM data a JOIN data b
+          ON a.parcel_id = b.parcel_id AND a.date = b.date AND a.time = b.time AND a.id > b.id
+        """
+    )
+    op.execute(
+        """
+        DELETE FROM data a USING data b
+        WHERE a.parcel_id = b.parcel_id AND a.date = b.date AND a.time = b.time AND a.id > b.id
+        """
+    )
+    op.execute(
+        """
+        INSERT INTO data_daily (parcel_id, date, temp_min, temp_max, temp_mean,
+                                humidity_mean, precipitation_sum, hours, complete)
+        SELECT d.parcel_id, d.date,
+               min(d.atmospheric_temperature), max(d.atmospheric_temperature), avg(d.atmospheric_temperature),
+               avg(d.atmospheric_relative_humidity), sum(d.precipitation),
+               count(d.id), count(d.id) >= 24
+        FROM data d JOIN data_duplicate_days u ON d.parcel_id = u.parcel_id AND d.date = u.date
+        GROUP BY d.parcel_id, d.date
+        ON CONFLICT ON CONSTRAINT uq_data_daily_parcel_date DO UPDATE SET
+            temp_min = EXCLUDED.temp_min, temp_max = EXCLUDED.temp_max, temp_mean = EXCLUDED.temp_mean,
+            humidity_mean = EXCLUDED.humidity_mean, precipitation_sum = EXCLUDED.precipitation_sum,
+            hours = EXCLUDED.hours, complete = EXCLUDED.complete
+        """
+    )
+
+    # Build the index without blocking ingestion, then promote it to the constraint
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "uq_data_parcel_date_time", "data", ["parcel_id", "date", "time"],
+            unique=True, postgresql_concurrently=True, if_not_exists=True,
+        )
+    op.execute(
+        "ALTER TABLE data ADD CONSTRAINT uq_data_parcel_date_time UNIQUE USING INDEX uq_data_parcel_date_time"
+    )
+
+
+def downgrade() -> None:
+    op.drop_constraint("uq_data_parcel_date_time", "data", type_="unique")
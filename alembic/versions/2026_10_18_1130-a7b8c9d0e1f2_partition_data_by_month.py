@@ -0,0 +1,126 @@
+"""Partition data by month on date
+
+Revision ID: a7b8c9d0e1f2
+Revises: f6a7b8c9d0e1
+Create Date: 2026-10-18 11:30:00.000000
+
+data becomes a RANGE (date) partitioned table with one partition per month
+(data_pYYYY_MM), covering the stored months up to three months ahead; the
+application creates later ones (crud.data.ensure_partitions). The partition
+key must be part of every unique constraint, so the primary key becomes
+(id, date) and date becomes NOT NULL; rows without a date, which no
+date-range read could return, are dropped.
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers
+revision: str = "a7b8c9d0e1f2"
+down_revision: Union[str, None] = "f6a7b8c9d0e1"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+VALUE_COLUMNS = [
+    ("atmospheric_temperature", sa.Float()),
+    ("atmospheric_temperature_daily_min", sa.Float()),
+    ("atmospheric_temperature_daily_max", sa.Float()),
+    ("atmospheric_temperature_daily_average", sa.Float()),
+    ("atmospheric_relative_humidity", sa.Float()),
+    ("atmospheric_pressure", sa.Float()),
+    ("precipitation", sa.Float()),
+    ("average_wind_speed", sa.Float()),
+    ("wind_direction", sa.String()),
+    ("wind_gust", sa.Float()),
+    ("leaf_relative_humidity", sa.Float()),
+    ("leaf_temperature", sa.Float()),
+    ("leaf_wetness", sa.Float()),
+    ("soil_temperature_10cm", sa.Float()),
+    ("soil_temperature_20cm", sa.Float()),
+    ("soil_temperature_30cm", sa.Float()),
+    ("soil_temperature_40cm", sa.Float()),
+    ("soil_temperature_50cm", sa.Float()),
+    ("soil_temperature_60cm", sa.Float()),
+    ("solar_irradiance_copernicus", sa.Float()),
+]
+COLUMN_NAMES = ", ".join(["id", "date", "time", "parcel_id"] + [name for name, _ in VALUE_COLUMNS])
+
+
+def _columns(date_nullable: bool) -> list:
+    return [
+        sa.Column("id", sa.Integer(), server_default=sa.text("nextval('data_id_seq')"), nullable=False),
+        sa.Column("date", sa.Date(), nullable=date_nullable),
+        sa.Column("time", sa.Time(), nullable=True),
+        *(sa.Column(name, type_, nullable=True) for name, type_ in VALUE_COLUMNS),
+        sa.Column("parcel_id", sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(["parcel_id"], ["parcel.id"]),
+    ]
+
+
+def _swap_out_current_table() -> None:
+    """Rename data out of the way, keeping its id sequence alive for the new table."""
+    op.execute("ALTER SEQUENCE data_id_seq OWNED BY NONE")
+    op.execute("ALTER TABLE data RENAME TO data_previous")
+    op.execute("ALTER TABLE data_previous RENAME CONSTRAINT data_pkey TO data_previous_pkey")
+    op.execute(
+        "ALTER TABLE data_previous RENAME CONSTRAINT uq_data_parcel_date_time "
+        "TO uq_data_previous_parcel_date_time"
+    )
+
+
+def _copy_and_drop_previous_table() -> None:
+    op.execute(
+        "INSERT INTO data ({cols}) SELECT {cols} FROM data_previous WHERE date IS NOT NULL".format(cols=COLUMN_NAMES)
+    )
+    op.execute("DROP TABLE data_previous")
+    op.execute("ALTER SEQUENCE data_id_seq OWNED BY data.id")
+
+
+def upgrade() -> None:
+    _swap_out_current_table()
+    op.create_table(
+        "data",
+        *_columns(date_nullable=False),
+        sa.PrimaryKeyConstraint("id", "date"),
+        sa.UniqueConstraint("parcel_id", "date", "time", name="uq_data_parcel_date_time"),
+        postgresql_partition_by="RANGE (date)",
+    )
+    op.execute(
+        """
+        DO $$
+        DECLARE
+            first_month date;
+            last_month  date;
+            month       date;
+        BEGIN
+            SELECT date_trunc('month', coalesce(min(date), current_date))::date,
+                   (date_trunc('month', greatest(coalesce(max(date), current_date), current_date))
+                    + interval '3 months')::date
+              INTO first_month, last_month
+              FROM data_previous;
+            month := first_month;
+            WHILE month <= last_month LOOP
+                EXECUTE format(
+                    'CREATE TABLE %I PARTITION OF data FOR VALUES FROM (%L) TO (%L)',
+                    'data_p' || to_char(month, 'YYYY_MM'), month, (month + interval '1 month')::date
+                );
+                month := (month + interval '1 month')::date;
+            END LOOP;
+        END $$;
+        """
+    )
+    _copy_and_drop_previous_table()
+
+
+def downgrade() -> None:
+    _swap_out_current_table()
+    op.create_table(
+        "data",
+        *_columns(date_nullable=True),
+        sa.PrimaryKeyConstraint("id"),
+        sa.UniqueConstraint("id"),
+        sa.UniqueConstraint("parcel_id", "date", "time", name="uq_data_parcel_date_time"),
+    )
+    _copy_and_drop_previous_table()
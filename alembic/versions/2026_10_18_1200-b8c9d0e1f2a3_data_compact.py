@@ -0,0 +1,59 @@
+"""Add data_compact table (per-day arrays of compacted hourly weather)
+
+Revision ID: b8c9d0e1f2a3
+Revises: a7b8c9d0e1f2
+Create Date: 2026-10-18 12:00:00.000000
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers
+revision: str = "b8c9d0e1f2a3"
+down_revision: Union[str, None] = "a7b8c9d0e1f2"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+REAL_ARRAY_COLUMNS = [
+    "atmospheric_temperature",
+    "atmospheric_temperature_daily_min",
+    "atmospheric_temperature_daily_max",
+    "atmospheric_temperature_daily_average",
+    "atmospheric_relative_humidity",
+    "atmospheric_pressure",
+    "precipitation",
+    "average_wind_speed",
+    "wind_gust",
+    "leaf_relative_humidity",
+    "leaf_temperature",
+    "leaf_wetness",
+    "soil_temperature_10cm",
+    "soil_temperature_20cm",
+    "soil_temperature_30cm",
+    "soil_temperature_40cm",
+    "soil_temperature_50cm",
+    "soil_temperature_60cm",
+    "solar_irradiance_copernicus",
+]
+
+
+def upgrade() -> None:
+    op.create_table(
+        "data_compact",
+        sa.Column("id",        sa.Integer(), nullable=False),
+        sa.Column("parcel_id", sa.Integer(), nullable=False),
+        sa.Column("date",      sa.Date(),    nullable=False),
+        *(sa.Column(name, postgresql.ARRAY(postgresql.REAL()), nullable=True) for name in REAL_ARRAY_COLUMNS),
+        sa.Column("wind_direction", postgresql.ARRAY(postgresql.TEXT()), nullable=True),
+        sa.ForeignKeyConstraint(["parcel_id"], ["parcel.id"], ondelete="CASCADE"),
+        sa.PrimaryKeyConstraint("id"),
+        sa.UniqueConstraint("id"),
+        sa.UniqueConstraint("parcel_id", "date", name="uq_data_compact_parcel_date"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("data_compact")
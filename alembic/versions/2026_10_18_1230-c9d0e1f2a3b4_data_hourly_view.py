@@ -0,0 +1,91 @@
+"""Add data_compact.hours and the data_hourly compatibility view
+
+Revision ID: c9d0e1f2a3b4
+Revises: b8c9d0e1f2a3
+Create Date: 2026-10-18 12:30:00.000000
+
+data_compact can now be written by the ingestion paths directly, so which
+hours of a day hold a reading is kept as a bit mask (bit h = hour h), and a
+column without any reading that day is stored as NULL instead of 24 NULL
+slots. data_hourly unpacks data_compact into Data's row layout next to the
+data rows, for the readers that want rows.
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers
+revision: str = "c9d0e1f2a3b4"
+down_revision: Union[str, None] = "b8c9d0e1f2a3"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+VALUE_COLUMNS = [
+    "atmospheric_temperature",
+    "atmospheric_temperature_daily_min",
+    "atmospheric_temperature_daily_max",
+    "atmospheric_temperature_daily_average",
+    "atmospheric_relative_humidity",
+    "atmospheric_pressure",
+    "precipitation",
+    "average_wind_speed",
+    "wind_direction",
+    "wind_gust",
+    "leaf_relative_humidity",
+    "leaf_temperature",
+    "leaf_wetness",
+    "soil_temperature_10cm",
+    "soil_temperature_20cm",
+    "soil_temperature_30cm",
+    "soil_temperature_40cm",
+    "soil_temperature_50cm",
+    "soil_temperature_60cm",
+    "solar_irradiance_copernicus",
+]
+
+
+def upgrade() -> None:
+    op.add_column("data_compact", sa.Column("hours", sa.Integer(), server_default="0", nullable=False))
+    # compaction wrote a slot for every hour of the day; a slot holds a reading when any column has one
+    op.execute(
+        """
+        UPDATE data_compact SET hours = (
+            SELECT coalesce(bit_or(1 << (h - 1)), 0)
+            FROM generate_series(1, 24) AS h
+            WHERE {}
+        ), {}
+        """.format(
+            " OR ".join("{}[h] IS NOT NULL".format(name) for name in VALUE_COLUMNS),
+            ", ".join(
+                "{0} = CASE WHEN cardinality(array_remove({0}, NULL)) > 0 THEN {0} END".format(name)
+                for name in VALUE_COLUMNS
+            ),
+        )
+    )
+    op.execute(
+        """
+        CREATE VIEW data_hourly AS
+        SELECT id, date, time, {columns}, parcel_id
+        FROM data
+        UNION ALL
+        SELECT NULL::integer, c.date, make_time(slot.h - 1, 0, 0), {slots}, c.parcel_id
+        FROM data_compact AS c
+        CROSS JOIN generate_series(1, 24) AS slot(h)
+        WHERE c.hours & (1 << (slot.h - 1)) <> 0
+          AND NOT EXISTS (
+              SELECT 1 FROM data AS d
+              WHERE d.parcel_id = c.parcel_id AND d.date = c.date
+                AND extract(hour FROM d.time) = slot.h - 1
+          )
+        """.format(
+            columns=", ".join(VALUE_COLUMNS),
+            slots=", ".join("c.{0}[slot.h]".format(name) for name in VALUE_COLUMNS),
+        )
+    )
+
+
+def downgrade() -> None:
+    op.execute("DROP VIEW data_hourly")
+    op.drop_column("data_compact", "hours")
@@ -0,0 +1,31 @@
+"""Cascade parcel deletes to data in the database
+
+Revision ID: d0e1f2a3b4c5
+Revises: c9d0e1f2a3b4
+Create Date: 2026-10-18 13:00:00.000000
+
+data.parcel_id gets ON DELETE CASCADE, like the other per-parcel tables, so
+deleting a parcel no longer loads and deletes its hour rows one by one
+through the ORM.
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+
+# revision identifiers
+revision: str = "d0e1f2a3b4c5"
+down_revision: Union[str, None] = "c9d0e1f2a3b4"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # a partitioned table's foreign key cannot be added NOT VALID; it is checked once here
+    op.drop_constraint("data_parcel_id_fkey", "data", type_="foreignkey")
+    op.create_foreign_key("data_parcel_id_fkey", "data", "parcel", ["parcel_id"], ["id"], ondelete="CASCADE")
+
+
+def downgrade() -> None:
+    op.drop_constraint("data_parcel_id_fkey", "data", type_="foreignkey")
+    op.create_foreign_key("data_parcel_id_fkey", "data", "parcel", ["parcel_id"], ["id"])
@@ -0,0 +1,81 @@
+"""Add weather cells: hourly weather stored once per grid cell
+
+Revision ID: e1f2a3b4c5d6
+Revises: d0e1f2a3b4c5
+Create Date: 2026-10-18 13:30:00.000000
+
+Parcels get a weather_cell_id, assigned on their first fetch with
+WEATHER_SHARED_CELLS on; the data already stored per parcel stays where it is
+and keeps overriding the cell's series.
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers
+revision: str = "e1f2a3b4c5d6"
+down_revision: Union[str, None] = "d0e1f2a3b4c5"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+VALUE_COLUMNS = [
+    ("atmospheric_temperature", sa.Float()),
+    ("atmospheric_temperature_daily_min", sa.Float()),
+    ("atmospheric_temperature_daily_max", sa.Float()),
+    ("atmospheric_temperature_daily_average", sa.Float()),
+    ("atmospheric_relative_humidity", sa.Float()),
+    ("atmospheric_pressure", sa.Float()),
+    ("precipitation", sa.Float()),
+    ("average_wind_speed", sa.Float()),
+    ("wind_direction", sa.String()),
+    ("wind_gust", sa.Float()),
+    ("leaf_relative_humidity", sa.Float()),
+    ("leaf_temperature", sa.Float()),
+    ("leaf_wetness", sa.Float()),
+    ("soil_temperature_10cm", sa.Float()),
+    ("soil_temperature_20cm", sa.Float()),
+    ("soil_temperature_30cm", sa.Float()),
+    ("soil_temperature_40cm", sa.Float()),
+    ("soil_temperature_50cm", sa.Float()),
+    ("soil_temperature_60cm", sa.Float()),
+    ("solar_irradiance_copernicus", sa.Float()),
+]
+
+
+def upgrade() -> None:
+    op.create_table(
+        "weather_cell",
+        sa.Column("id",        sa.Integer(), nullable=False),
+        sa.Column("latitude",  sa.Float(),   nullable=False),
+        sa.Column("longitude", sa.Float(),   nullable=False),
+        sa.PrimaryKeyConstraint("id"),
+        sa.UniqueConstraint("id"),
+        sa.UniqueConstraint("latitude", "longitude", name="uq_weather_cell_latitude_longitude"),
+    )
+    op.create_table(
+        "weather_cell_data",
+        sa.Column("id",      sa.Integer(), nullable=False),
+        sa.Column("cell_id", sa.Integer(), nullable=False),
+        sa.Column("date",    sa.Date(),    nullable=False),
+        sa.Column("time",    sa.Time(),    nullable=False),
+        *(sa.Column(name, type_, nullable=True) for name, type_ in VALUE_COLUMNS),
+        sa.ForeignKeyConstraint(["cell_id"], ["weather_cell.id"], ondelete="CASCADE"),
+        sa.PrimaryKeyConstraint("id"),
+        sa.UniqueConstraint("id"),
+        sa.UniqueConstraint("cell_id", "date", "time", name="uq_weather_cell_data_cell_date_time"),
+    )
+    op.add_column("parcel", sa.Column("weather_cell_id", sa.Integer(), nullable=True))
+    op.create_foreign_key(
+        "parcel_weather_cell_id_fkey", "parcel", "weather_cell", ["weather_cell_id"], ["id"], ondelete="SET NULL"
+    )
+    op.create_index("ix_parcel_weather_cell_id", "parcel", ["weather_cell_id"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_parcel_weather_cell_id", table_name="parcel")
+    op.drop_constraint("parcel_weather_cell_id_fkey", "parcel", type_="foreignkey")
+    op.drop_column("parcel", "weather_cell_id")
+    op.drop_table("weather_cell_data")
+    op.drop_table("weather_cell")
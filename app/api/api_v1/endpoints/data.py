@@ -1,31 +1,41 @@
+import base64
+import csv
 import datetime
-from typing import List
+import io
+import json
+from typing import List, Literal, Optional
 
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, UploadFile, File
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
 
 import crud
 from api import deps
-from schemas import Message, CreateData, ListData
+from core.config import settings
+from schemas import Message, CreateData, DataDB, ListData, UploadedData, SensorReading, SensorBufferStats
 
-from utils import get_logger
+from utils import get_logger, store_weather_upload
+from utils.gdd_snapshot import refresh_after_ingest
+from utils.sensor_buffer import sensor_buffer
 
 logger = get_logger(api_path_name=__name__)
 router = APIRouter()
 
 @router.get("/", response_model=ListData, dependencies=[Depends(deps.get_jwt)])
 def get_all_data(
-        db: Session = Depends(deps.get_db)
-) -> ListData:
+        db: Session = Depends(deps.get_db),
+        limit: Optional[int] = None,
+        cursor: Optional[str] = None,
+        formatting: Literal["JSON", "NDJSON", "CSV"] = "JSON"
+):
     """
-    This API returns all weather data present in the db.
+    This API returns all weather data present in the db, ordered by parcel, date and time.
 
-    WARNING: WILL BE SLOWER AS MORE DATA IS ACCRUED OVER TIME
+    Pass limit to get one page; the response's next_cursor, passed back as cursor, returns the
+    page after it. NDJSON and CSV stream the rows as they are read, in constant memory.
     """
 
-    response_object = crud.data.get_all(db=db)
-
-    return ListData(list_of_data=response_object)
+    return _hours_response(db=db, limit=limit, cursor=cursor, formatting=formatting)
 
 
 @router.get("/parcel/{parcel_id}/from/{start}/to/{end}/", response_model=ListData, dependencies=[Depends(deps.get_jwt)])
@@ -33,17 +43,96 @@ def get_data_for_parcel(
         parcel_id: int,
         start: datetime.date,
         end: datetime.date,
-        db: Session = Depends(deps.get_db)
-) -> ListData:
+        db: Session = Depends(deps.get_db),
+        limit: Optional[int] = None,
+        cursor: Optional[str] = None,
+        formatting: Literal["JSON", "NDJSON", "CSV"] = "JSON"
+):
     """
     This API returns weather data for a date interval, for some parcel
+
+    Paginated and streamed as GET /data/.
     """
 
-    response_object = crud.data.get_data_by_parcel_id_and_date_interval(
-        db=db, parcel_id=parcel_id, start=start, end=end
+    return _hours_response(
+        db=db, limit=limit, cursor=cursor, formatting=formatting, parcel_id=parcel_id, start=start, end=end
     )
 
-    return ListData(list_of_data=response_object)
+
+_FIELDS = list(DataDB.model_fields)
+
+
+def _encode_cursor(row) -> str:
+    key = "{},{},{}".format(row.parcel_id, row.date.isoformat(), row.time.isoformat() if row.time else "")
+    return base64.urlsafe_b64encode(key.encode()).decode()
+
+
+def _decode_cursor(cursor: str):
+    try:
+        parcel_id, date, time = base64.urlsafe_b64decode(cursor.encode()).decode().split(",")
+        return (int(parcel_id), datetime.date.fromisoformat(date),
+                datetime.time.fromisoformat(time) if time else None)
+    except ValueError:
+        raise HTTPException(
+            status_code=400,
+            detail="Error, invalid cursor: {}".format(cursor)
+        )
+
+
+def _hours_response(db: Session, limit: Optional[int], cursor: Optional[str], formatting: str, **filters):
+    if limit is not None and not 1 <= limit <= settings.DATA_PAGE_MAX_SIZE:
+        raise HTTPException(
+            status_code=400,
+            detail="Error, limit outside of bounds, bounds are from 1 to {}".format(settings.DATA_PAGE_MAX_SIZE)
+        )
+    after = _decode_cursor(cursor) if cursor else None
+
+    if formatting == "JSON":
+        rows = [
+            row
+            for chunk in crud.data.stream_hours(db=db, after=after, limit=limit + 1 if limit else None, **filters)
+            for row in chunk
+        ]
+        next_cursor = None
+        if limit and len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = _encode_cursor(rows[-1])
+        return ListData(list_of_data=rows, next_cursor=next_cursor)
+
+    encode = _ndjson_lines if formatting == "NDJSON" else _csv_lines
+    return StreamingResponse(
+        _stream(db, encode, crud.data.stream_hours(db=db, after=after, limit=limit, **filters)),
+        media_type="application/x-ndjson" if formatting == "NDJSON" else "text/csv",
+    )
+
+
+def _stream(db: Session, encode, chunks):
+    # The request's session may be closed before the body is sent (dependency teardown runs
+    # first); it reconnects on first use, so close it once the stream is done.
+    try:
+        if encode is _csv_lines:
+            yield ",".join(_FIELDS) + "\n"
+        for chunk in chunks:
+            yield encode(chunk)
+    finally:
+        db.close()
+
+
+def _json_value(value):
+    return value.isoformat() if isinstance(value, (datetime.date, datetime.time)) else value
+
+
+def _ndjson_lines(rows) -> str:
+    return "".join(
+        json.dumps({name: _json_value(getattr(row, name)) for name in _FIELDS}) + "\n" for row in rows
+    )
+
+
+def _csv_lines(rows) -> str:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator="\n")
+    writer.writerows([[_json_value(getattr(row, name)) for name in _FIELDS] for row in rows])
+    return buffer.getvalue()
 
 
 @router.post("/{parcel_id}/", response_model=Message, dependencies=[Depends(deps.get_jwt)])
@@ -79,7 +168,18 @@ def upload_weather_data_for_parcel(
             detail="Error, parcel with ID:{} does not exist".format(parcel_id)
         )
 
-    crud.data.batch_insert(db=db, list_of_data=data, parcel_id=parcel_id)
+    # a later upload of the same (date, time) replaces the stored values
+    written = crud.data.batch_insert(db=db, list_of_data=data, parcel_id=parcel_id, on_conflict="update")
+
+    if written is None:
+        raise HTTPException(
+            status_code=400,
+            detail="Error, could not store the data points of parcel with ID:{}".format(parcel_id)
+        )
+
+    if written:
+        # backfilled or overwritten hours change the GDD history from their first day on
+        refresh_after_ingest(db, parcel_id, min(x.date for x in data))
 
     response_object = Message(
         message="Successfully uploaded data."
@@ -88,6 +188,131 @@ def upload_weather_data_for_parcel(
     return response_object
 
 
+@router.post("/{parcel_id}/upload/", response_model=UploadedData, dependencies=[Depends(deps.get_jwt)])
+def upload_weather_file_for_parcel(
+        parcel_id: int,
+        file: UploadFile = File(...),
+        formatting: Literal["CSV", "PARQUET"] = "CSV",
+        on_conflict: Literal["nothing", "update"] = "update",
+        db: Session = Depends(deps.get_db)
+) -> UploadedData:
+    """
+    Upload weather data points from a CSV or Parquet file, e.g. a station logger export.
+
+    Columns are named as the elements of POST /data/{parcel_id}/; date and time are mandatory
+    and other columns are ignored. The file is read, validated and stored in chunks, so its
+    size is not limited by memory. Rows with an unreadable date, time or value are skipped.
+
+    on_conflict: "update" overwrites the stored values of the same (date, time), "nothing" keeps them.
+    """
+
+    parcel_db = crud.parcel.get(db=db, id=parcel_id)
+
+    if not parcel_db:
+        raise HTTPException(
+            status_code=400,
+            detail="Error, parcel with ID:{} does not exist".format(parcel_id)
+        )
+
+    try:
+        inserted, skipped = store_weather_upload(
+            db=db, file=file.file, parcel_id=parcel_id, formatting=formatting, on_conflict=on_conflict
+        )
+    except ValueError as e:
+        raise HTTPException(
+            status_code=400,
+            detail="Error, {}".format(e)
+        )
+
+    return UploadedData(inserted=inserted, skipped=skipped)
+
+
+@router.post("/{parcel_id}/sensor/", response_model=Message, status_code=202,
+             dependencies=[Depends(deps.get_jwt)])
+def post_sensor_readings(
+        parcel_id: int,
+        readings: List[SensorReading]
+) -> Message:
+    """
+    Post a small batch of in-field sensor readings, e.g. minute-resolution leaf wetness.
+
+    The readings are buffered in memory and written as hourly data points (the mean of the hour,
+    precipitation summed per node) by a background flush a few seconds later; the request does
+    not open a database connection. Readings for a parcel that does not exist are dropped at
+    flush time.
+    """
+
+    if len(readings) > settings.SENSOR_BATCH_MAX_SIZE:
+        raise HTTPException(
+            status_code=400,
+            detail="Error, at most {} readings per batch".format(settings.SENSOR_BATCH_MAX_SIZE)
+        )
+
+    accepted = sensor_buffer.append(parcel_id=parcel_id, readings=[
+        (r.timestamp, r.node_id, r.model_dump(exclude={"timestamp", "node_id"}, exclude_none=True))
+        for r in readings
+    ])
+
+    if not accepted:
+        raise HTTPException(
+            status_code=503,
+            detail="Error, sensor buffer is full, retry after the next flush"
+        )
+
+    response_object = Message(
+        message="Accepted {} readings.".format(len(readings))
+    )
+
+    return response_object
+
+
+@router.get("/sensor/buffer/", response_model=SensorBufferStats, dependencies=[Depends(deps.get_jwt)])
+def get_sensor_buffer_stats() -> SensorBufferStats:
+    """
+    Depth and flush latency of this worker's sensor buffer.
+    """
+
+    return SensorBufferStats(**sensor_buffer.stats())
+
+
+@router.delete("/parcel/{parcel_id}/from/{start}/to/{end}/", response_model=Message,
+               dependencies=[Depends(deps.get_jwt)])
+def remove_data_for_parcel(
+        parcel_id: int,
+        start: datetime.date,
+        end: datetime.date,
+        db: Session = Depends(deps.get_db)
+) -> Message:
+    """
+    Remove every weather data point of a date interval, for some parcel
+
+    The daily rollups of those days are removed too; GDD and risk history from start on is
+    recomputed from the remaining data.
+    """
+
+    if start > end:
+        raise HTTPException(
+            status_code=400,
+            detail="Error, start date {} is after end date {}".format(start, end)
+        )
+
+    parcel_db = crud.parcel.get(db=db, id=parcel_id)
+
+    if not parcel_db:
+        raise HTTPException(
+            status_code=400,
+            detail="Error, parcel with ID:{} does not exist".format(parcel_id)
+        )
+
+    deleted = crud.data.remove_range(db=db, parcel_id=parcel_id, start=start, end=end)
+
+    response_object = Message(
+        message="Successfully removed {} datapoints of parcel with ID:{}".format(deleted, parcel_id)
+    )
+
+    return response_object
+
+
 @router.delete("/{data_id}/", response_model=Message, dependencies=[Depends(deps.get_jwt)])
 def remove_data_point(
         data_id: int,
@@ -95,6 +320,9 @@ def remove_data_point(
 ) -> Message:
     """
     Remove a single weather datapoint
+
+    The daily rollup of its day is rebuilt; GDD and risk history from that day on is
+    recomputed from the remaining data.
     """
 
     data_db = crud.data.get(db=db, id=data_id)
@@ -105,7 +333,13 @@ def remove_data_point(
             detail="Error, data point with ID:{} does not exist.".format(data_id)
         )
 
-    crud.data.remove(db=db, id=data_id)
+    removed = crud.data.remove(db=db, id=data_id)
+
+    if not removed:
+        raise HTTPException(
+            status_code=400,
+            detail="Error, could not remove data point with ID:{}".format(data_id)
+        )
 
     response_object = Message(
         message="Successfully removed datapoint with ID:{}".format(data_id)
@@ -11,9 +11,12 @@ from typing import Literal
 from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.orm import Session
 
+import pandas as pd
+
 import crud
 from api import deps
 from schemas.fuzzy_risk import (
+    FuzzyRiskBatchForecastRequest,
     FuzzyRiskCalculateRequest,
     FuzzyRiskFetchRequest,
     FuzzyRiskForecastFcRequest,
@@ -25,12 +28,15 @@ from utils.data import (
     fetch_forecast_hourly_for_range,
 )
 from utils.fcutils import fetch_parcel_by_id, fetch_parcel_lat_lon
+from utils.fuzzy_risk_daily import load_materialized_risk, score_missing_days
+from utils.gdd_snapshot import gdd_annual_refs, gdd_seed_for_window
+from utils.grid import snap_to_grid
 from utils.fuzzy_risk import (
     _format_results,
     _hourly_df_to_daily,
     _openmeteo_to_daily_df,
+    _openmeteo_to_daily_dfs,
     _resolve_threat_models,
-    _weather_rows_to_daily_df,
     calculate_fuzzy_risk,
 )
 
@@ -43,24 +49,28 @@ def calculate_risk(
     response_format: Literal["json", "json-ld"] = Query(default="json-ld", alias="format"),
     db: Session = Depends(deps.get_db),
 ):
-    """Historical fuzzy risk from stored weather data."""
+    """Historical fuzzy risk from stored weather data.
+
+    Served from the materialized fuzzy_risk_daily rows; the days a model has
+    no row for yet are computed live.
+    """
     parcel = crud.parcel.get(db=db, id=req.parcel_id)
     if not parcel:
         raise HTTPException(status_code=404, detail="Parcel not found")
 
-    rows = crud.data.get_data_by_parcel_id_and_date_interval(
-        db=db, parcel_id=req.parcel_id,
-        start=req.from_date, end=req.to_date,
-    )
-    daily_df = _weather_rows_to_daily_df(rows)
-    if daily_df.empty:
-        raise HTTPException(status_code=404, detail="No weather data for this parcel and date range")
-
     threat_models = _resolve_threat_models(db, req.threat_model_ids)
     if not threat_models:
         raise HTTPException(status_code=404, detail="No threat models found")
 
-    results = calculate_fuzzy_risk(daily_df, threat_models)
+    stored, missing = load_materialized_risk(
+        db, parcel.id, threat_models, req.from_date, req.to_date,
+    )
+    if stored.empty and not missing:
+        raise HTTPException(status_code=404, detail="No weather data for this parcel and date range")
+
+    live    = score_missing_days(db, parcel.id, missing) if missing else pd.DataFrame()
+    frames  = [frame for frame in (stored, live) if not frame.empty]
+    results = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
     return _format_results(results, parcel, response_format)
 
 
@@ -84,10 +94,85 @@ def forecast_risk(
     if not threat_models:
         raise HTTPException(status_code=404, detail="No threat models found")
 
-    results = calculate_fuzzy_risk(daily_df, threat_models)
+    seed    = gdd_seed_for_window(db, parcel.id, daily_df["date"].min(), threat_models)
+    refs    = gdd_annual_refs(db, parcel.id, threat_models)
+    results = calculate_fuzzy_risk(daily_df, threat_models, gdd_seed=seed, gdd_annual_ref=refs)
     return _format_results(results, parcel, response_format)
 
 
+@router.post("/forecast/batch/", dependencies=[Depends(deps.get_jwt)])
+def forecast_risk_batch(
+    req: FuzzyRiskBatchForecastRequest,
+    response_format: Literal["json", "json-ld"] = Query(default="json-ld", alias="format"),
+    db: Session = Depends(deps.get_db),
+):
+    """Forecast fuzzy risk for several parcels via one OpenMeteo call.
+
+    Parcels are grouped by forecast grid cell; each cell is fetched once and
+    scored once per distinct GDD seed and annual reference, then the results
+    are fanned out to every parcel in the group. JSON records carry a
+    parcel_id; JSON-LD collections point at their own parcel's coordinates.
+    """
+    parcel_ids = list(dict.fromkeys(req.parcel_ids))
+    parcels    = {p.id: p for p in crud.parcel.get_by_ids(db=db, ids=parcel_ids)}
+    missing    = [pid for pid in parcel_ids if pid not in parcels]
+    if missing:
+        raise HTTPException(status_code=404, detail=f"Parcels not found: {missing}")
+
+    threat_models = _resolve_threat_models(db, req.threat_model_ids)
+    if not threat_models:
+        raise HTTPException(status_code=404, detail="No threat models found")
+
+    cells: dict[tuple[float, float], list] = {}
+    for pid in parcel_ids:
+        parcel = parcels[pid]
+        cells.setdefault(snap_to_grid(parcel.latitude, parcel.longitude), []).append(parcel)
+
+    days      = req.days_ahead or 7
+    forecasts = _openmeteo_to_daily_dfs(list(cells), days)
+
+    per_parcel: dict[int, pd.DataFrame] = {}
+    for (cell, cell_parcels), daily_df in zip(cells.items(), forecasts):
+        if daily_df.empty:
+            raise HTTPException(
+                status_code=502, detail=f"No forecast data returned from OpenMeteo for cell {cell}",
+            )
+        # Parcels in one cell share the forecast but not necessarily their
+        # season-to-date or annual GDD, so seed and refs are part of the sharing key.
+        groups: dict[tuple, list] = {}
+        inputs: dict[tuple, tuple] = {}
+        for parcel in cell_parcels:
+            seed = gdd_seed_for_window(db, parcel.id, daily_df["date"].min(), threat_models)
+            refs = gdd_annual_refs(db, parcel.id, threat_models)
+            key  = tuple(
+                tuple(sorted((label, round(value, 6)) for label, value in gdd.items()))
+                for gdd in (seed, refs)
+            )
+            groups.setdefault(key, []).append(parcel)
+            inputs[key] = (seed, refs)
+        for key, group in groups.items():
+            seed, refs = inputs[key]
+            results = calculate_fuzzy_risk(daily_df, threat_models, gdd_seed=seed, gdd_annual_ref=refs)
+            for parcel in group:
+                per_parcel[parcel.id] = results
+
+    if response_format == "json":
+        records = []
+        for pid in parcel_ids:
+            for record in _format_results(per_parcel[pid], parcels[pid], "json"):
+                records.append({"parcel_id": pid, **record})
+        return records
+
+    envelope = None
+    for pid in parcel_ids:
+        doc = _format_results(per_parcel[pid], parcels[pid], "json-ld")
+        if envelope is None:
+            envelope = doc
+        else:
+            envelope["@graph"].extend(doc["@graph"])
+    return envelope
+
+
 @router.post("/historical/", dependencies=[Depends(deps.get_jwt)])
 def historical_fetch_and_calculate(
     req: FuzzyRiskFetchRequest,
@@ -117,10 +202,12 @@ def historical_fetch_and_calculate(
     if hourly_df.empty:
         raise HTTPException(status_code=502, detail="No data returned from OpenMeteo archive")
 
-    _dedupe_and_store_hourly(db, hourly_df, req.parcel_id, req.from_date, req.to_date)
+    _dedupe_and_store_hourly(db, hourly_df, parcel)
 
     daily_df = _hourly_df_to_daily(hourly_df)
-    results  = calculate_fuzzy_risk(daily_df, threat_models)
+    seed     = gdd_seed_for_window(db, parcel.id, daily_df["date"].min(), threat_models)
+    refs     = gdd_annual_refs(db, parcel.id, threat_models)
+    results  = calculate_fuzzy_risk(daily_df, threat_models, gdd_seed=seed, gdd_annual_ref=refs)
     return _format_results(results, parcel, response_format)
 
 
@@ -181,8 +268,10 @@ def forecast_fetch_and_calculate(
     if hourly_df.empty:
         raise HTTPException(status_code=502, detail="No data returned from OpenMeteo forecast")
 
-    _dedupe_and_store_hourly(db, hourly_df, req.parcel_id, req.from_date, req.to_date)
+    _dedupe_and_store_hourly(db, hourly_df, parcel)
 
     daily_df = _hourly_df_to_daily(hourly_df)
-    results  = calculate_fuzzy_risk(daily_df, threat_models)
+    seed     = gdd_seed_for_window(db, parcel.id, daily_df["date"].min(), threat_models)
+    refs     = gdd_annual_refs(db, parcel.id, threat_models)
+    results  = calculate_fuzzy_risk(daily_df, threat_models, gdd_seed=seed, gdd_annual_ref=refs)
     return _format_results(results, parcel, response_format)
@@ -28,10 +28,23 @@ from utils import (
     calculate_risk_index_forecast_wd
 )
 
+from utils.rule_compiler import CompiledPestModel, pest_model_catalog
+
 from http import HTTPStatus
 
 router = APIRouter()
 
+
+def _resolve_pest_models(db: Session, model_ids: DatasetIds) -> list[CompiledPestModel]:
+    pest_models, missing = pest_model_catalog.resolve(db, model_ids.ids)
+    if missing:
+        raise HTTPException(
+            status_code=400,
+            detail="Error, model with ID {} does not exist".format(missing[0]),
+        )
+    return pest_models
+
+
 @router.get("/{model_ids}/gdd/", dependencies=[Depends(deps.is_using_gatekeeper)])
 def calculate_gdd_fc(
         parcel_id: str,
@@ -137,23 +150,9 @@ def calculate_risk_index_fc(
             detail="Parcel with ID:{} doesn't exist".format(parcel_id)
         )
 
-    # Fetch the pest models from the database AND fetch a unique list of the units they require
-    variables_for_weather_data_call = []
-    pest_models_db = []
-    for pest_id in model_ids.ids:
-        pest_model_db = crud.pest_model.get(db=db, id=pest_id)
-        if not pest_model_db:
-            raise HTTPException(
-                status_code=400,
-                detail="Error, model with ID {} does not exist".format(pest_id)
-            )
-
-        pest_models_db.append(pest_model_db)
-
-        # Appends the list of units
-        list_of_values = list(set([condition.unit.name for rule in pest_model_db.rules for condition in rule.conditions]))
-
-        variables_for_weather_data_call += list_of_values
+    # Fetch the compiled pest models AND a unique list of the units they require
+    pest_models_db = _resolve_pest_models(db, model_ids)
+    variables_for_weather_data_call = sorted(set().union(*(pm.units() for pm in pest_models_db)))
 
     lat, lon = fetch_parcel_lat_lon(parcel_fc)
 
@@ -221,31 +220,9 @@ def calculate_risk_index_including_forecast(
             detail="Error, parcel with id {} doesn't exist".format(parcel_id),
         )
 
-    # Fetch the pest models from the database AND fetch a unique list of the units they require
-    variables_for_weather_data_call = []
-    pest_models_db = []
-    for pest_id in model_ids.ids:
-        pest_model_db = crud.pest_model.get(db=db, id=pest_id)
-        if not pest_model_db:
-            raise HTTPException(
-                status_code=400,
-                detail="Error, model with ID {} does not exist".format(pest_id),
-            )
-
-        pest_models_db.append(pest_model_db)
-
-        # Appends the list of units
-        list_of_values = list(
-            set(
-                [
-                    condition.unit.name
-                    for rule in pest_model_db.rules
-                    for condition in rule.conditions
-                ]
-            )
-        )
-
-        variables_for_weather_data_call += list_of_values
+    # Fetch the compiled pest models AND a unique list of the units they require
+    pest_models_db = _resolve_pest_models(db, model_ids)
+    variables_for_weather_data_call = sorted(set().union(*(pm.units() for pm in pest_models_db)))
 
     hourly_fields = [
         openmeteo_friendly_variables[var_name]
@@ -318,17 +295,8 @@ def risk_index_forecast_wd(
         access_token=access_token
     )
 
-    # Fetch the pest models from the database
-    pest_models_db = []
-    for pest_id in model_ids.ids:
-        pest_model_db = crud.pest_model.get(db=db, id=pest_id)
-        if not pest_model_db:
-            raise HTTPException(
-                status_code=400,
-                detail="Error, model with ID {} does not exist".format(pest_id),
-            )
-
-        pest_models_db.append(pest_model_db)
+    # Fetch the compiled pest models
+    pest_models_db = _resolve_pest_models(db, model_ids)
 
     calculation_results = calculate_risk_index_forecast_wd(
         parcel=parcel_fc, pest_models=pest_models_db, df=weather_data, formatting=formatting
@@ -366,15 +334,7 @@ def risk_index_forecast_wd_offline(
         longitude=longitude,
     )
 
-    pest_models_db = []
-    for pest_id in model_ids.ids:
-        pest_model_db = crud.pest_model.get(db=db, id=pest_id)
-        if not pest_model_db:
-            raise HTTPException(
-                status_code=400,
-                detail="Error, model with ID {} does not exist".format(pest_id),
-            )
-        pest_models_db.append(pest_model_db)
+    pest_models_db = _resolve_pest_models(db, model_ids)
 
     synthetic_parcel = {
         "@id": "urn:openagri:offline:{}".format(uuid.uuid4()),
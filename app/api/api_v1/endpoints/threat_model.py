@@ -13,6 +13,7 @@ from schemas.threat_model import (
     ThreatModelCreate, ThreatModelUpdate, ThreatModelDB, ThreatModelDefinition,
     BioParams, FuzzyRule, RiskLevel,
 )
+from utils.fuzzy_risk import threat_model_catalog
 
 router = APIRouter()
 
@@ -102,7 +103,10 @@ def create_threat_model(
     crop = crud.crop.get(db=db, id=tm_in.crop_id)
     if not crop:
         raise HTTPException(status_code=404, detail="Crop not found")
-    return crud.threat_model.create(db=db, obj_in=tm_in)
+    tm = crud.threat_model.create(db=db, obj_in=tm_in)
+    if tm:
+        threat_model_catalog.invalidate(tm.id)
+    return tm
 
 
 @router.patch("/{tm_id}/", response_model=ThreatModelDB, dependencies=[Depends(deps.get_jwt)])
@@ -114,6 +118,7 @@ def update_threat_model(
     obj = crud.threat_model.get(db=db, id=tm_id)
     if not obj:
         raise HTTPException(status_code=404, detail="ThreatModel not found")
+    threat_model_catalog.invalidate(tm_id)
     return crud.threat_model.update(db=db, db_obj=obj, obj_in=tm_in)
 
 
@@ -125,6 +130,7 @@ def delete_threat_model(
     obj = crud.threat_model.get(db=db, id=tm_id)
     if not obj:
         raise HTTPException(status_code=404, detail="ThreatModel not found")
+    threat_model_catalog.invalidate(tm_id)
     return crud.threat_model.remove(db=db, id=tm_id)
 
 
@@ -197,6 +203,8 @@ def import_from_excel(
         crud.threat_model.create(db=db, obj_in=tm_in)
         created_tms += 1
 
+    if created_tms:
+        threat_model_catalog.invalidate()
     return {"created_crops": created_crops, "created_threat_models": created_tms}
 
 
@@ -267,4 +275,6 @@ def import_from_json(
                 crud.threat_model.update(db=db, db_obj=match, obj_in={"definition": new_def})
             updated += 1
 
+    if updated:
+        threat_model_catalog.invalidate()
     return {"updated_threat_models": updated}
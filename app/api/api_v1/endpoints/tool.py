@@ -8,6 +8,7 @@ from api import deps
 from schemas import list_path_param, DatasetIds
 
 import crud
+from utils.rule_compiler import pest_model_catalog
 
 router = APIRouter()
 
@@ -39,18 +40,13 @@ def calculate_risk_index_verbose(
             detail="Error, parcel with ID:{} does not exist".format(parcel_id)
         )
 
-    pest_models = []
+    pest_models, missing = pest_model_catalog.resolve(db, model_ids.ids)
 
-    for mid in model_ids.ids:
-        pest_model_db = crud.pest_model.get(db=db, id=mid)
-
-        if not pest_model_db:
-            raise HTTPException(
-                status_code=400,
-                detail="Error, pest model with ID:{} does not exist".format(mid)
-            )
-
-        pest_models.append(pest_model_db)
+    if missing:
+        raise HTTPException(
+            status_code=400,
+            detail="Error, pest model with ID:{} does not exist".format(missing[0])
+        )
 
     calculations = utils.calculate_risk_index_probability(db=db, parcel=parcel_db, pest_models=pest_models,
                                                           from_date=from_date, to_date=to_date)
@@ -86,18 +82,13 @@ def calculate_risk_index_high(
             detail="Error, parcel with ID:{} does not exist".format(parcel_id)
         )
 
-    pest_models = []
+    pest_models, missing = pest_model_catalog.resolve(db, model_ids.ids)
 
-    for mid in model_ids.ids:
-        pest_model_db = crud.pest_model.get(db=db, id=mid)
-
-        if not pest_model_db:
-            raise HTTPException(
-                status_code=400,
-                detail="Error, pest model with ID:{} does not exist".format(mid)
-            )
-
-        pest_models.append(pest_model_db)
+    if missing:
+        raise HTTPException(
+            status_code=400,
+            detail="Error, pest model with ID:{} does not exist".format(missing[0])
+        )
 
     calculations = utils.calculate_risk_index_probability(db=db, parcel=parcel_db, pest_models=pest_models,
                                                           from_date=from_date, to_date=to_date, parameter="high")
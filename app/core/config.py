@@ -62,6 +62,67 @@ class Settings(BaseSettings):
     OPEN_METEO_MIN_PAST_DAYS: int = 0
     OPEN_METEO_MIN_FORECAST_DAYS: int = 1
     OPEN_METEO_MAX_FORECAST_DAYS: int = 16
+    # Degrees; parcels snapping to the same cell share one forecast
+    OPEN_METEO_GRID_RESOLUTION: float = 0.1
+    # Fetch and store Open-Meteo weather once per grid cell, shared by the parcels in it;
+    # a parcel's own (uploaded) data overrides the shared series hour by hour
+    WEATHER_SHARED_CELLS: bool = False
+    # HTTP cache shared by every Open-Meteo fetch of the process: sqlite, filesystem, redis or memory;
+    # redis needs the redis package and OPEN_METEO_REDIS_URL
+    OPEN_METEO_CACHE_BACKEND: str = "sqlite"
+    OPEN_METEO_CACHE_NAME: str = ".cache"
+    OPEN_METEO_REDIS_URL: str = "redis://localhost:6379/0"
+    # Seconds a cached response stays fresh per API (-1 = forever, archived days do not change)
+    OPEN_METEO_ARCHIVE_CACHE_SECONDS: int = -1
+    OPEN_METEO_FORECAST_CACHE_SECONDS: int = 3600
+    # Pooled keep-alive connections per Open-Meteo host
+    OPEN_METEO_POOL_SIZE: int = 10
+    # Decoded responses kept in memory (0 = off), so warm hits skip HTTP and flatbuffer decoding
+    OPEN_METEO_FRAME_CACHE_SIZE: int = 64
+
+    # Worker processes for fuzzy scoring (0 = score in the request thread);
+    # jobs below FUZZY_PROCESS_MIN_MODEL_DAYS (days x threat models) stay inline
+    FUZZY_PROCESS_WORKERS: int = 0
+    FUZZY_PROCESS_MIN_MODEL_DAYS: int = 20000
+
+    # Days back the backfill job keeps fuzzy_risk_daily complete, and how often it runs (0 = never)
+    FUZZY_MATERIALIZE_BACKFILL_DAYS: int = 365
+    FUZZY_MATERIALIZE_BACKFILL_MINUTES: int = 15
+
+    # Compiled pest models kept by the risk-index endpoints
+    PEST_MODEL_CACHE_SIZE: int = 256
+    # Evaluate stored-data risk index rules in Postgres (CASE WHEN) instead of pandas
+    RISK_INDEX_SQL_PUSHDOWN: bool = False
+
+    # Rows fetched per round trip when streaming stored weather into arrays
+    WEATHER_READ_CHUNK_SIZE: int = 10000
+    # Largest page the /data/ endpoints return for one limit
+    DATA_PAGE_MAX_SIZE: int = 10000
+    # Monthly data partitions created ahead of the current month by the daily maintenance job
+    DATA_PARTITION_MONTHS_AHEAD: int = 3
+    # Hourly data older than this many whole months is dropped by partition (0 = keep forever)
+    DATA_RETENTION_MONTHS: int = 0
+    # Hourly data older than this many days is compacted into per-day arrays and the daily
+    # rollup by the nightly job (0 = never; two seasons is 730). Hourly reads merge in
+    # data_compact only while this or DATA_STORE_DAILY_ARRAYS is set, so keep it once used
+    DATA_COMPACT_AFTER_DAYS: int = 0
+    # Keep the compacted hours as per-day arrays; when False only the daily rollup remains
+    DATA_COMPACT_KEEP_HOURLY: bool = True
+    # Ingestion writes hourly readings straight into data_compact's per-day arrays instead of data rows
+    DATA_STORE_DAILY_ARRAYS: bool = False
+    # Rows read, validated and written per step of a CSV / Parquet upload to /data/
+    DATA_UPLOAD_CHUNK_SIZE: int = 50000
+
+    # Sensor readings are buffered in process and written as hourly Data rows by a flush job,
+    # once this many are pending or the oldest has waited this many seconds
+    SENSOR_BUFFER_FLUSH_SIZE: int = 5000
+    SENSOR_BUFFER_FLUSH_SECONDS: int = 10
+    # Pending readings past which a sensor batch is refused until the next flush
+    SENSOR_BUFFER_MAX_DEPTH: int = 200000
+    # Seconds an hour keeps averaging late readings after its last one
+    SENSOR_BUFFER_HOUR_SECONDS: int = 7200
+    # Largest batch one sensor request may post
+    SENSOR_BATCH_MAX_SIZE: int = 1000
 
     # Month when cumulative GDD resets (1 = Jan for NH, 7 = Jul for SH)
     GDD_RESET_MONTH: int = 1
@@ -2,10 +2,16 @@ from .crud_user import user
 from .crud_unit import unit
 from .crud_operator import operator
 from .crud_data import data
+from .crud_data_daily import data_daily
 from .crud_condition import condition
 from .crud_rule import rule
 from .crud_pest_model import pest_model
 from .crud_parcel import parcel
 from .crud_disease import disease
 from .crud_crop import crop
-from .crud_threat_model import threat_model
\ No newline at end of file
+from .crud_threat_model import threat_model
+from .crud_gdd_snapshot import gdd_snapshot
+from .crud_fuzzy_risk_daily import fuzzy_risk_daily
+from .crud_data_compact import data_compact
+from .crud_weather_cell import weather_cell
+from .crud_weather_cell_data import weather_cell_data
@@ -1,30 +1,234 @@
 import datetime
-from typing import List, Optional
+import io
+import re
+import threading
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Literal, Optional, Sequence, Tuple, Union
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import Float, Row, and_, column, delete, or_, select, table, text, tuple_
+from sqlalchemy.dialects.postgresql import Insert, insert
 from sqlalchemy.exc import SQLAlchemyError
 from sqlalchemy.orm import Session
+from sqlalchemy.sql.elements import ColumnElement
+from core.config import settings
 from crud.base import CRUDBase
-from models import Data
+from crud.crud_data_compact import data_compact, hourly_select, uses_compact_store
+from crud.crud_data_daily import data_daily
+from models import Data, DataCompact, DataDaily, FuzzyRiskDaily, GDDSnapshot, Parcel, WeatherCellData
 from schemas import CreateData, Temp
 
 
 class CrudData(CRUDBase[Data, CreateData, dict]):
+    # rows per INSERT statement, keeping the bind parameters under the Postgres limit
+    INSERT_CHUNK_SIZE = 1000
 
     def get_all(self, db: Session):
+        if uses_compact_store(db):
+            return db.execute(hourly_select(None, compacted=True)).all()
         return db.query(Data).all()
 
-    def batch_insert(self, db: Session, list_of_data: List[Temp], parcel_id: int) -> Optional[List[Data]]:
-        data_model = [Data(**x.model_dump(), parcel_id=parcel_id) for x in list_of_data]
+    def batch_insert(self, db: Session, list_of_data: List[Temp], parcel_id: int,
+                     on_conflict: Literal["nothing", "update"] = "nothing") -> Optional[int]:
+        """Insert hourly rows, leaving (on_conflict="nothing") or overwriting ("update") the rows
+        already stored for the same (parcel_id, date, time). Duplicates are resolved by the
+        uq_data_parcel_date_time constraint, and the data_daily rollup of the days written is
+        refreshed in the same transaction. Returns the number of rows written, None on error."""
+        rows = {}
+        for x in list_of_data:
+            row = {**x.model_dump(), "parcel_id": parcel_id}
+            key = (row.get("date"), row.get("time"))
+            if on_conflict == "update" or key not in rows:
+                rows[key] = row
+        rows = list(rows.values())
+        if not rows:
+            return 0
+        if settings.DATA_STORE_DAILY_ARRAYS and uses_compact_store(db):
+            return self._write_daily_arrays(db, pd.DataFrame(rows), parcel_id, on_conflict)
+
+        written, dates = 0, set()
+        try:
+            self.ensure_partitions(db=db, dates=(row["date"] for row in rows))
+            for i in range(0, len(rows), self.INSERT_CHUNK_SIZE):
+                stmt = _on_conflict(insert(Data).values(rows[i:i + self.INSERT_CHUNK_SIZE]), on_conflict, rows[0])
+                for row in db.execute(stmt.returning(Data.date)):
+                    written += 1
+                    dates.add(row.date)
+            data_daily.refresh(db=db, parcel_id=parcel_id, dates=dates)
+            db.commit()
+        except SQLAlchemyError:
+            db.rollback()
+            return None
+
+        return written
+
+    def bulk_write(self, db: Session, frame: pd.DataFrame, parcel_id: int,
+                   on_conflict: Literal["nothing", "update"] = "nothing",
+                   method: Literal["copy", "executemany"] = "copy",
+                   return_rows: bool = False) -> Optional[Union[int, List[Data]]]:
+        """Columnar counterpart of batch_insert for frames with a "date" timestamp column and
+        Data column names (other columns are ignored), e.g. from _openmeteo_response_to_dataframe.
+
+        "copy" streams the frame into a temporary table with PostgreSQL COPY and upserts from
+        there in one statement; "executemany" sends the rows as batched multi-row INSERTs.
+        Conflicts, the rollup refresh and errors are handled as in batch_insert. Returns the
+        number of rows written, or the written rows as Data objects when return_rows is set."""
+        values = _frame_to_rows(frame, parcel_id, keep="last" if on_conflict == "update" else "first")
+        if values.empty:
+            return [] if return_rows else 0
+        if settings.DATA_STORE_DAILY_ARRAYS and uses_compact_store(db):
+            return self._write_daily_arrays(db, values, parcel_id, on_conflict, return_rows)
+
+        try:
+            self.ensure_partitions(db=db, dates=values["date"])
+            if method == "copy" and db.get_bind().dialect.driver == "psycopg2":
+                written = self._copy_from_frame(db, values, on_conflict)
+            else:
+                records = values.astype(object).where(values.notna(), None).to_dict("records")
+                stmt = _on_conflict(insert(Data), on_conflict, values.columns)
+                written = db.execute(stmt.returning(Data.id, Data.date), records).all()
+            data_daily.refresh(db=db, parcel_id=parcel_id, dates={row.date for row in written})
+            db.commit()
+        except SQLAlchemyError:
+            db.rollback()
+            return None
+
+        if return_rows:
+            ids = [row.id for row in written]
+            return db.query(Data).filter(Data.id.in_(ids)).order_by(Data.date.asc(), Data.time.asc()).all()
+        return len(written)
 
-        db.add_all(data_model)
+    def _write_daily_arrays(self, db: Session, values: pd.DataFrame, parcel_id: int, on_conflict: str,
+                            return_rows: bool = False):
+        """batch_insert / bulk_write with settings.DATA_STORE_DAILY_ARRAYS: the hours are merged
+        into data_compact instead. "Written" counts the hours added or whose values changed."""
         try:
+            written = data_compact.write_hours(db=db, values=values, parcel_id=parcel_id, on_conflict=on_conflict)
+            data_daily.refresh(db=db, parcel_id=parcel_id, dates=list(written))
             db.commit()
         except SQLAlchemyError:
             db.rollback()
             return None
 
-        [db.refresh(x) for x in data_model]
+        if return_rows:
+            hourly = hourly_select(parcel_id, compacted=True, dates=list(written)).subquery()
+            return db.execute(select(hourly).order_by(hourly.c.date.asc(), hourly.c.time.asc())).all()
+        return sum(written.values())
+
+    def _copy_from_frame(self, db: Session, values: pd.DataFrame, on_conflict: str):
+        columns = list(values.columns)
+        buffer = io.StringIO()
+        values.to_csv(buffer, index=False, header=False, na_rep="")
+        buffer.seek(0)
+
+        db.execute(text(
+            "CREATE TEMPORARY TABLE data_staging ON COMMIT DROP AS SELECT {} FROM data WITH NO DATA".format(
+                ", ".join(columns))
+        ))
+        with db.connection().connection.cursor() as cursor:
+            cursor.copy_expert("COPY data_staging ({}) FROM STDIN WITH (FORMAT csv)".format(", ".join(columns)), buffer)
+        staging = table("data_staging", *(column(name) for name in columns))
+        stmt = _on_conflict(insert(Data).from_select(columns, select(*staging.c)), on_conflict, columns)
+        written = db.execute(stmt.returning(Data.id, Data.date)).all()
+        db.execute(text("DROP TABLE data_staging"))
+        return written
+
+    def get_partitions(self, db: Session) -> List[datetime.date]:
+        """First day of every month that has a data partition, oldest first."""
+        names = db.execute(text(
+            "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+            "WHERE i.inhparent = 'data'::regclass"
+        )).scalars()
+        months = []
+        for name in names:
+            match = _PARTITION_NAME.fullmatch(name)
+            if match:
+                months.append(datetime.date(int(match[1]), int(match[2]), 1))
+        return sorted(months)
+
+    def ensure_partitions(self, db: Session, dates: Iterable[datetime.date]) -> List[datetime.date]:
+        """Create the monthly partitions covering dates that don't exist yet, in the caller's
+        transaction. Months seen before are skipped without a query; no-op off PostgreSQL.
+        Returns the months created."""
+        if db.get_bind().dialect.name != "postgresql":
+            return []
+        months = {d.replace(day=1) for d in dates if d is not None}
+        with _partitions_lock:
+            months -= _known_partitions
+        if not months:
+            return []
+
+        existing = set(self.get_partitions(db=db))
+        created = sorted(months - existing)
+        for month in created:
+            db.execute(text(
+                "CREATE TABLE IF NOT EXISTS {} PARTITION OF data FOR VALUES FROM ('{}') TO ('{}')".format(
+                    partition_name(month), month.isoformat(), _next_month(month).isoformat())
+            ))
+        with _partitions_lock:
+            # created ones are only cached once a later call sees them committed
+            _known_partitions.update(months & existing)
+        return created
+
+    def drop_partitions_before(self, db: Session, month: datetime.date) -> List[datetime.date]:
+        """Drop every partition of a month before `month` and commit; the data_daily rollup
+        of those days is kept. Returns the months dropped."""
+        dropped = [m for m in self.get_partitions(db=db) if m < month.replace(day=1)]
+        for m in dropped:
+            db.execute(text("DROP TABLE IF EXISTS {}".format(partition_name(m))))
+        db.commit()
+        with _partitions_lock:
+            _known_partitions.difference_update(dropped)
+        return dropped
+
+    def remove(self, db: Session, id: int, **kwargs) -> Optional[Row]:
+        """Delete the data row with this id. The primary key is (id, date), so the row is
+        deleted by id alone instead of being loaded by its key. The day's data_daily rollup
+        is rebuilt from its remaining hours, and GDD snapshots and materialized risk from
+        that day on are dropped, as in remove_range. Returns the row's (id, parcel_id, date,
+        time), None when there is no such row or on error."""
+        try:
+            row = db.execute(
+                delete(Data).where(Data.id == id).returning(Data.id, Data.parcel_id, Data.date, Data.time)
+            ).first()
+            if row is not None:
+                # deleted first, the day may have no hours left to roll up
+                db.execute(delete(DataDaily).where(DataDaily.parcel_id == row.parcel_id, DataDaily.date == row.date))
+                data_daily.refresh(db=db, parcel_id=row.parcel_id, dates=[row.date])
+                db.execute(delete(GDDSnapshot).where(GDDSnapshot.parcel_id == row.parcel_id,
+                                                     GDDSnapshot.date >= row.date))
+                db.execute(delete(FuzzyRiskDaily).where(FuzzyRiskDaily.parcel_id == row.parcel_id,
+                                                        FuzzyRiskDaily.date >= row.date))
+            db.commit()
+        except SQLAlchemyError:
+            db.rollback()
+            return None
+        return row
 
-        return data_model
+    def remove_range(self, db: Session, parcel_id: int, start: datetime.date, end: datetime.date) -> int:
+        """Delete the parcel's hours of [start, end], compacted ones included, with their
+        data_daily rollup, in one set-based statement per table, then commit. GDD snapshots and
+        materialized risk from start on are dropped too; they are rebuilt from the remaining
+        hours by the next refresh. Returns the number of hours deleted."""
+        deleted = db.execute(
+            delete(Data).where(Data.parcel_id == parcel_id, Data.date.between(start, end))
+        ).rowcount
+        if uses_compact_store(db):
+            hours = db.execute(
+                delete(DataCompact)
+                .where(DataCompact.parcel_id == parcel_id, DataCompact.date.between(start, end))
+                .returning(DataCompact.hours)
+            ).scalars()
+            deleted += sum(bin(mask).count("1") for mask in hours)
+        db.execute(delete(DataDaily).where(DataDaily.parcel_id == parcel_id, DataDaily.date.between(start, end)))
+        if settings.WEATHER_SHARED_CELLS:
+            # the weather cell's series shows through again where the parcel's own hours were
+            data_daily.refresh(db=db, parcel_id=parcel_id,
+                               dates=[d.date() for d in pd.date_range(start, end, freq="D")])
+        db.execute(delete(GDDSnapshot).where(GDDSnapshot.parcel_id == parcel_id, GDDSnapshot.date >= start))
+        db.execute(delete(FuzzyRiskDaily).where(FuzzyRiskDaily.parcel_id == parcel_id, FuzzyRiskDaily.date >= start))
+        db.commit()
+        return deleted
 
     def get_data_query_by_parcel_id(self, db: Session, parcel_id: int):
         return db.query(Data).filter(Data.parcel_id == parcel_id).order_by(Data.date.asc(), Data.time.asc())
@@ -36,12 +240,175 @@ class CrudData(CRUDBase[Data, CreateData, dict]):
             Data.date.between(date_from, date_to)
         ).order_by(Data.date.asc(), Data.time.asc())
 
+    def get_risk_rows(self, db: Session, parcel_id: int, date_from: datetime.date, date_to: datetime.date,
+                      risk: Callable[[Any], ColumnElement], only: Optional[str] = None):
+        """(date, time, risk) per stored hour, risk(columns) building a SQL expression over the
+        hourly readings' Data columns; only rows whose risk equals `only` when given."""
+        hourly = hourly_select(parcel_id, compacted=uses_compact_store(db),
+                               date_from=date_from, date_to=date_to).subquery()
+        expression = risk(hourly.c)
+        query = select(hourly.c.date, hourly.c.time, expression.label("risk"))
+        if only is not None:
+            query = query.filter(expression == only)
+        return db.execute(query.order_by(hourly.c.date.asc(), hourly.c.time.asc())).all()
+
+    def get_weather_columns(self, db: Session, parcel_id: int, columns: Sequence[str],
+                            date_from: datetime.date, date_to: datetime.date,
+                            chunk_size: Optional[int] = None) -> Dict[str, np.ndarray]:
+        """Stored hours of the interval as arrays, oldest first: "date" (datetime64[D]),
+        "time" (timedelta64[s] since midnight, NaT when missing) and one float64 array per
+        requested Data column (NaN for NULL). Only those columns are selected and the data
+        rows are streamed chunk_size at a time, without building ORM instances; data_compact
+        days are read as whole per-column blocks and merged in, then the hours of the parcel's
+        weather cell it has no reading of."""
+        columns = list(dict.fromkeys(columns))
+        hourly = hourly_select(parcel_id, compacted=False, date_from=date_from, date_to=date_to,
+                               shared=False).subquery()
+        rows = _read_columns(db, hourly, columns, chunk_size)
+        if uses_compact_store(db):
+            rows = _merge_hours(rows, data_compact.get_blocks(
+                db=db, parcel_id=parcel_id, columns=columns, date_from=date_from, date_to=date_to
+            ))
+        if settings.WEATHER_SHARED_CELLS:
+            cell = WeatherCellData.__table__
+            shared = select(cell).join_from(cell, Parcel, Parcel.weather_cell_id == cell.c.cell_id).filter(
+                Parcel.id == parcel_id, cell.c.date.between(date_from, date_to)
+            ).subquery()
+            rows = _merge_hours(rows, _read_columns(db, shared, columns, chunk_size))
+        return rows
+
+    def stream_hours(self, db: Session, parcel_id: Optional[int] = None, start: Optional[datetime.date] = None,
+                     end: Optional[datetime.date] = None,
+                     after: Optional[Tuple[int, datetime.date, Optional[datetime.time]]] = None,
+                     limit: Optional[int] = None, chunk_size: Optional[int] = None) -> Iterator[Sequence[Row]]:
+        """Stored hours in Data column layout, ordered by (parcel_id, date, time) with missing
+        times first, in chunks of chunk_size rows fetched from a server-side cursor.
+
+        after is the (parcel_id, date, time) of the last row already seen; the rows past it are
+        found through the (parcel_id, date, time) index instead of by OFFSET."""
+        hourly = hourly_select(parcel_id, compacted=uses_compact_store(db), date_from=start, date_to=end).subquery()
+        stmt = select(hourly)
+        if after is not None:
+            after_parcel, after_date, after_time = after
+            if after_time is None:
+                stmt = stmt.filter(or_(
+                    tuple_(hourly.c.parcel_id, hourly.c.date) > tuple_(after_parcel, after_date),
+                    and_(hourly.c.parcel_id == after_parcel, hourly.c.date == after_date,
+                         hourly.c.time.is_not(None)),
+                ))
+            else:
+                # a row comparison stops at the first differing element, so later days'
+                # rows without a time still qualify
+                stmt = stmt.filter(tuple_(hourly.c.parcel_id, hourly.c.date, hourly.c.time)
+                                   > tuple_(after_parcel, after_date, after_time))
+        stmt = stmt.order_by(
+            hourly.c.parcel_id.asc(), hourly.c.date.asc(), hourly.c.time.asc().nulls_first()
+        ).limit(limit).execution_options(yield_per=chunk_size or settings.WEATHER_READ_CHUNK_SIZE)
+        yield from db.execute(stmt).partitions()
+
     def get_data_by_parcel_id_and_date(self, db: Session, parcel_id: int, date: datetime.date, time: datetime.time):
         return db.query(Data).filter(Data.parcel_id == parcel_id, Data.date == date, Data.time == time).first()
 
     def get_data_by_parcel_id_and_date_interval(self, db: Session, parcel_id: int,
                                                 start: datetime.date, end: datetime.date):
-        return db.query(Data).filter(Data.parcel_id == parcel_id, Data.date >= start, Data.date <= end).all()
+        """Stored hours of [start, end] in Data column layout, oldest first; compacted hours
+        have no id."""
+        hourly = hourly_select(parcel_id, compacted=uses_compact_store(db),
+                               date_from=start, date_to=end).subquery()
+        return db.execute(select(hourly).order_by(hourly.c.date.asc(), hourly.c.time.asc())).all()
+
+
+_PARTITION_NAME = re.compile(r"data_p(\d{4})_(\d{2})")
+
+# months this process has seen a partition for
+_known_partitions: set = set()
+_partitions_lock = threading.Lock()
+
+
+def partition_name(month: datetime.date) -> str:
+    return "data_p{:%Y_%m}".format(month)
+
+
+def _next_month(month: datetime.date) -> datetime.date:
+    return (month.replace(day=28) + datetime.timedelta(days=4)).replace(day=1)
+
+
+def _on_conflict(stmt: Insert, on_conflict: str, columns: Sequence[str]) -> Insert:
+    if on_conflict == "update":
+        return stmt.on_conflict_do_update(
+            constraint="uq_data_parcel_date_time",
+            set_={name: stmt.excluded[name] for name in columns if name not in ("parcel_id", "date", "time")},
+        )
+    return stmt.on_conflict_do_nothing(constraint="uq_data_parcel_date_time")
+
+
+def _merge_hours(rows: Dict[str, np.ndarray], compacted: Dict[str, np.ndarray]) -> Dict[str, np.ndarray]:
+    """rows plus the hours of compacted (or of another lower-priority source) no row covers,
+    by date then time (missing times last)."""
+    if not len(compacted["date"]):
+        return rows
+
+    def hour_keys(columns):
+        return columns["date"].astype(np.int64) * 24 + columns["time"].astype("timedelta64[h]").astype(np.int64)
+
+    covered = hour_keys(rows)[~np.isnat(rows["time"])]
+    keep = ~np.isin(hour_keys(compacted), covered)
+    merged = {name: np.concatenate([rows[name], compacted[name][keep]]) for name in rows}
+    times = merged["time"].astype(np.int64)
+    times[np.isnat(merged["time"])] = np.iinfo(np.int64).max
+    order = np.lexsort((times, merged["date"]))
+    return {name: values[order] for name, values in merged.items()}
+
+
+def _read_columns(db: Session, hourly, columns: Sequence[str], chunk_size: Optional[int]) -> Dict[str, np.ndarray]:
+    """date, time and columns of the hourly subquery as arrays (see CrudData.get_weather_columns)."""
+    stmt = select(hourly.c.date, hourly.c.time, *(hourly.c[name] for name in columns)).order_by(
+        hourly.c.date.asc(), hourly.c.time.asc()
+    ).execution_options(
+        yield_per=chunk_size or settings.WEATHER_READ_CHUNK_SIZE
+    )
+
+    chunks = []
+    for partition in db.execute(stmt).partitions():
+        dates, times, *values = zip(*partition)
+        chunk = {
+            "date": np.array(dates, dtype="datetime64[D]"),
+            "time": np.full(len(partition), np.timedelta64("NaT"), dtype="timedelta64[s]"),
+        }
+        seconds = np.array(
+            [np.nan if t is None else t.hour * 3600 + t.minute * 60 + t.second for t in times]
+        )
+        present = ~np.isnan(seconds)
+        chunk["time"][present] = seconds[present].astype("timedelta64[s]")
+        for name, column in zip(columns, values):
+            chunk[name] = np.array(column, dtype=float)
+        chunks.append(chunk)
+
+    if chunks:
+        return {name: np.concatenate([c[name] for c in chunks]) for name in chunks[0]}
+    empty = {"date": np.empty(0, dtype="datetime64[D]"), "time": np.empty(0, dtype="timedelta64[s]")}
+    return {**empty, **{name: np.empty(0) for name in columns}}
+
+
+def _frame_to_rows(frame: pd.DataFrame, parcel_id: int, keep: str) -> pd.DataFrame:
+    """parcel_id, date, time and the frame's Data columns as float64, one row per (date, time)."""
+    timestamps = pd.to_datetime(frame["date"])
+    present = timestamps.notna().to_numpy()
+    timestamps = timestamps[present]
+    rows = pd.DataFrame({
+        "parcel_id": parcel_id,
+        "date":      timestamps.dt.date.to_numpy(),
+        "time":      timestamps.dt.time.to_numpy(),
+    })
+    for name in frame.columns:
+        if name not in Data.__table__.c or name in ("id", "parcel_id", "date", "time"):
+            continue
+        values = frame[name].to_numpy()[present]
+        if isinstance(Data.__table__.c[name].type, Float):
+            # float64, so a float32 reading is stored as the driver would send it for a Python float
+            values = values.astype(float)
+        rows[name] = values
+    return rows.drop_duplicates(subset=["date", "time"], keep=keep).reset_index(drop=True)
 
 
 data = CrudData(Data)
\ No newline at end of file
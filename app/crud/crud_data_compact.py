@@ -0,0 +1,279 @@
+import datetime
+from typing import Dict, Iterable, List, Literal, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import Date, Integer, and_, cast, column, exists, func, literal_column, null, select, table, text, \
+    true, union_all
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+
+import crud
+from crud.base import CRUDBase
+from core.config import settings
+from models import Data, DataCompact, Parcel, WeatherCellData
+
+HOURS_PER_DAY = 24
+
+# Data columns holding a reading; DataCompact has one array of the same name per column
+VALUE_COLUMNS = [
+    c.name for c in Data.__table__.columns if c.name not in ("id", "parcel_id", "date", "time")
+]
+
+# Compatibility view: the data rows plus the hours unpacked from data_compact, in Data
+# column layout; compacted hours have no id, and a data row wins over the same compacted
+# hour (a late write shows up before the next compaction merges it in)
+data_hourly = table("data_hourly", *(column(c.name, c.type) for c in Data.__table__.columns))
+
+
+def uses_compact_store(db: Session) -> bool:
+    """Whether hourly reads merge in data_compact: only on PostgreSQL (where it exists) and only
+    when compaction or daily-array ingestion is configured; otherwise they read the data table alone."""
+    if settings.DATA_COMPACT_AFTER_DAYS <= 0 and not settings.DATA_STORE_DAILY_ARRAYS:
+        return False
+    return db.get_bind().dialect.name == "postgresql"
+
+
+def hourly_select(parcel_id: Optional[int], compacted: bool, date_from: Optional[datetime.date] = None,
+                  date_to: Optional[datetime.date] = None, dates: Optional[Iterable[datetime.date]] = None,
+                  shared: Optional[bool] = None):
+    """SELECT of the parcel's hourly readings (every parcel's when parcel_id is None) in Data
+    column layout: id, parcel_id, date, time and the value columns, limited to
+    [date_from, date_to] and/or dates. With compacted, reads the data_hourly view.
+
+    With shared (settings.WEATHER_SHARED_CELLS when None), the hours of the parcel's weather
+    cell it has no reading of itself are added, without id."""
+    source = data_hourly if compacted else Data.__table__
+    own = select(
+        *(source.c[name] for name in ["id", "parcel_id", "date", "time", *VALUE_COLUMNS])
+    ).filter(_range(source.c.parcel_id, source.c.date, parcel_id, date_from, date_to, dates))
+    if not (settings.WEATHER_SHARED_CELLS if shared is None else shared):
+        return own
+
+    parcel, cell = Parcel.__table__, WeatherCellData.__table__
+    stored = source.alias("stored")
+    from_cell = select(
+        cast(null(), Integer).label("id"), parcel.c.id.label("parcel_id"), cell.c.date, cell.c.time,
+        *(cell.c[name] for name in VALUE_COLUMNS)
+    ).select_from(
+        cell.join(parcel, parcel.c.weather_cell_id == cell.c.cell_id)
+    ).filter(
+        _range(parcel.c.id, cell.c.date, parcel_id, date_from, date_to, dates),
+        ~exists().where(stored.c.parcel_id == parcel.c.id, stored.c.date == cell.c.date,
+                        stored.c.time == cell.c.time),
+    )
+    return union_all(own, from_cell)
+
+
+def _range(parcel_column, date_column, parcel_id, date_from, date_to, dates):
+    clauses = []
+    if parcel_id is not None:
+        clauses.append(parcel_column == parcel_id)
+    if date_from is not None:
+        clauses.append(date_column >= date_from)
+    if date_to is not None:
+        clauses.append(date_column <= date_to)
+    if dates is not None:
+        clauses.append(date_column.in_(sorted(set(dates))))
+    return and_(true(), *clauses)
+
+
+def _merged_array(name: str, prefer: str) -> str:
+    """SQL for an upsert's merge of the stored and excluded arrays of column name, slot by slot;
+    prefer ("excluded" or "data_compact") wins where both hold a reading."""
+    other = "data_compact" if prefer == "excluded" else "excluded"
+    return (
+        "CASE WHEN {other}.{0} IS NULL THEN {prefer}.{0} WHEN {prefer}.{0} IS NULL THEN {other}.{0} "
+        "ELSE ARRAY(SELECT coalesce(p, o) FROM unnest({prefer}.{0}, {other}.{0}) "
+        "WITH ORDINALITY AS u(p, o, i) ORDER BY i) END"
+    ).format(name, prefer=prefer, other=other)
+
+
+def _compact_sql() -> str:
+    """INSERT ... SELECT folding the parcel's timed data rows of [:start, :end) into one row per
+    day; a day compacted before is merged slot by slot, the new reading winning."""
+    arrays, hourly, merge = [], [], []
+    for name in VALUE_COLUMNS:
+        array_type = "text[]" if name == "wind_direction" else "real[]"
+        aggregate = "max" if name == "wind_direction" else "avg"
+        arrays.append(
+            "CASE WHEN count(reading.{0}) > 0 "
+            "THEN array_agg(reading.{0} ORDER BY slot.hour)::{1} END".format(name, array_type)
+        )
+        hourly.append("{0}({1}) AS {1}".format(aggregate, name))
+        merge.append("{} = {}".format(name, _merged_array(name, prefer="excluded")))
+    return """
+        INSERT INTO data_compact (parcel_id, date, hours, {columns})
+        SELECT :parcel_id, slot.date,
+               coalesce(bit_or(1 << slot.hour) FILTER (WHERE reading.hour IS NOT NULL), 0),
+               {arrays}
+        FROM (
+            SELECT day.date, hour
+            FROM (SELECT DISTINCT date FROM data
+                  WHERE parcel_id = :parcel_id AND date >= :start AND date < :end
+                    AND time IS NOT NULL) AS day
+            CROSS JOIN generate_series(0, {last_hour}) AS hour
+        ) AS slot
+        LEFT JOIN (
+            SELECT date, extract(hour FROM time)::int AS hour, {hourly}
+            FROM data
+            WHERE parcel_id = :parcel_id AND date >= :start AND date < :end AND time IS NOT NULL
+            GROUP BY date, extract(hour FROM time)
+        ) AS reading ON reading.date = slot.date AND reading.hour = slot.hour
+        GROUP BY slot.date
+        ON CONFLICT ON CONSTRAINT uq_data_compact_parcel_date DO UPDATE SET
+            hours = data_compact.hours | excluded.hours, {merge}
+    """.format(columns=", ".join(VALUE_COLUMNS), arrays=", ".join(arrays), last_hour=HOURS_PER_DAY - 1,
+               hourly=", ".join(hourly), merge=", ".join(merge))
+
+
+COMPACT_SQL = _compact_sql()
+
+
+def day_arrays(values: pd.DataFrame) -> List[dict]:
+    """DataCompact records (date, hours and one 24-slot list per value column, None for a
+    column without readings) from hourly rows with date, time and Data value columns.
+    Readings falling in the same hour are averaged (the last wind direction is kept)."""
+    columns = [name for name in values.columns if name in VALUE_COLUMNS]
+    frame = values[["date", *columns]].assign(hour=[t.hour for t in values["time"]])
+    grouped = frame.groupby(["date", "hour"], sort=True).agg(
+        {name: "last" if name == "wind_direction" else "mean" for name in columns}
+    )
+    days = grouped.index.get_level_values("date").unique()
+    present = np.zeros((len(days), HOURS_PER_DAY), dtype=bool)
+    present[days.get_indexer(grouped.index.get_level_values("date")),
+            grouped.index.get_level_values("hour")] = True
+    slots = pd.MultiIndex.from_product([days, range(HOURS_PER_DAY)], names=["date", "hour"])
+    grouped = grouped.reindex(slots)
+
+    records = [
+        {"date": day, "hours": int(mask @ (1 << np.arange(HOURS_PER_DAY)))}
+        for day, mask in zip(days, present)
+    ]
+    for name in columns:
+        block = grouped[name].to_numpy().reshape(len(days), HOURS_PER_DAY)
+        for record, slots_of_day in zip(records, block):
+            missing = pd.isna(slots_of_day)
+            record[name] = None if missing.all() else [
+                None if gap else value for value, gap in zip(slots_of_day.tolist(), missing)
+            ]
+    return records
+
+
+def _changed_hours(record: dict, stored, columns: Sequence[str], on_conflict: str) -> int:
+    """Hours of a day_arrays record that its upsert adds or changes, against the stored row
+    (None for a new day), following _merged_array: a reading overwrites the stored one with
+    on_conflict="update", and only fills a stored hour's missing column otherwise."""
+    if stored is None:
+        return bin(record["hours"]).count("1")
+    changed = record["hours"] & ~stored.hours
+    for hour in range(HOURS_PER_DAY):
+        bit = 1 << hour
+        if not record["hours"] & bit & stored.hours:
+            continue
+        for name in columns:
+            new = None if record[name] is None else record[name][hour]
+            old = None if getattr(stored, name) is None else getattr(stored, name)[hour]
+            if new is None:
+                continue
+            if old is None or (on_conflict == "update" and not _same_reading(new, old)):
+                changed |= bit
+                break
+    return bin(changed).count("1")
+
+
+def _same_reading(new, old) -> bool:
+    # the float arrays are real[], so compare at that precision
+    if isinstance(new, str) or isinstance(old, str):
+        return new == old
+    return np.float32(new) == np.float32(old)
+
+
+class CrudDataCompact(CRUDBase[DataCompact, dict, dict]):
+    # days per INSERT statement, keeping the bind parameters under the Postgres limit
+    INSERT_CHUNK_SIZE = 1000
+
+    def get_pending(self, db: Session, before: datetime.date) -> List[Tuple[int, datetime.date]]:
+        """(parcel_id, first day of month) of every month holding timed data rows before `before`."""
+        month = cast(func.date_trunc("month", Data.date), Date)
+        rows = db.execute(
+            select(Data.parcel_id, month).filter(Data.date < before, Data.time.is_not(None))
+            .distinct().order_by(Data.parcel_id, month)
+        ).all()
+        return [(parcel_id, month) for parcel_id, month in rows]
+
+    def compact(self, db: Session, parcel_id: int, start: datetime.date, end: datetime.date,
+                keep_hourly: bool = True) -> int:
+        """Fold the parcel's timed data rows of [start, end) into data_compact (unless not
+        keep_hourly), refresh their data_daily rollup and delete them, then commit. Rows without
+        a time have no hour slot and stay in data. Returns the number of rows deleted."""
+        params = {"parcel_id": parcel_id, "start": start, "end": end}
+        if keep_hourly:
+            db.execute(text(COMPACT_SQL), params)
+        deleted = db.execute(text(
+            "DELETE FROM data WHERE parcel_id = :parcel_id AND date >= :start AND date < :end "
+            "AND time IS NOT NULL RETURNING date"
+        ), params).scalars().all()
+        # the rollup reads the compacted arrays once the rows are gone; without them it keeps
+        # what the writers last aggregated
+        if keep_hourly:
+            crud.data_daily.refresh(db=db, parcel_id=parcel_id, dates=set(deleted))
+        db.commit()
+        return len(deleted)
+
+    def write_hours(self, db: Session, values: pd.DataFrame, parcel_id: int,
+                    on_conflict: Literal["nothing", "update"] = "nothing") -> Dict[datetime.date, int]:
+        """Upsert hourly rows (date, time and Data value columns) as per-day arrays, in the
+        caller's transaction. Stored hours are kept (on_conflict="nothing") or overwritten
+        ("update") slot by slot. Returns the number of hours added or changed per day written."""
+        records = day_arrays(values)
+        if not records:
+            return {}
+        columns = [name for name in records[0] if name in VALUE_COLUMNS]
+        prefer = "excluded" if on_conflict == "update" else "data_compact"
+        written = {}
+        for i in range(0, len(records), self.INSERT_CHUNK_SIZE):
+            chunk = {r["date"]: r for r in records[i:i + self.INSERT_CHUNK_SIZE]}
+            stored = {row.date: row for row in db.execute(
+                select(DataCompact.date, DataCompact.hours, *(DataCompact.__table__.c[name] for name in columns))
+                .filter(DataCompact.parcel_id == parcel_id, DataCompact.date.in_(list(chunk)))
+            ).all()}
+            stmt = insert(DataCompact).values([{**r, "parcel_id": parcel_id} for r in chunk.values()])
+            stmt = stmt.on_conflict_do_update(
+                constraint="uq_data_compact_parcel_date",
+                set_={
+                    "hours": DataCompact.hours.op("|")(stmt.excluded.hours),
+                    **{name: literal_column(_merged_array(name, prefer)) for name in columns},
+                },
+                # with "nothing" a day only changes when it gains hours
+                where=None if on_conflict == "update" else
+                DataCompact.hours.op("|")(stmt.excluded.hours) != DataCompact.hours,
+            )
+            for day in db.execute(stmt.returning(DataCompact.date)).scalars():
+                written[day] = _changed_hours(chunk[day], stored.get(day), columns, on_conflict)
+        return written
+
+    def get_blocks(self, db: Session, parcel_id: int, columns: Sequence[str], date_from: datetime.date,
+                   date_to: datetime.date) -> Dict[str, np.ndarray]:
+        """The compacted hours of [date_from, date_to] as arrays, as in crud.data.get_weather_columns:
+        each day's slots are read as one (days, 24) block per column and the hours without a
+        reading are dropped."""
+        rows = db.execute(
+            select(DataCompact.date, DataCompact.hours, *(DataCompact.__table__.c[name] for name in columns))
+            .filter(DataCompact.parcel_id == parcel_id, DataCompact.date.between(date_from, date_to))
+            .order_by(DataCompact.date.asc())
+        ).all()
+        empty = [np.nan] * HOURS_PER_DAY
+        present = ((np.array([r.hours for r in rows], dtype=np.int64).reshape(-1, 1)
+                    >> np.arange(HOURS_PER_DAY)) & 1).astype(bool).ravel()
+        blocks = {
+            "date": np.repeat(np.array([r.date for r in rows], dtype="datetime64[D]"), HOURS_PER_DAY)[present],
+            "time": np.tile(np.arange(HOURS_PER_DAY) * 3600, len(rows)).astype("timedelta64[s]")[present],
+        }
+        for i, name in enumerate(columns, start=2):
+            block = np.array([empty if r[i] is None else r[i] for r in rows], dtype=float)
+            blocks[name] = block.reshape(-1)[present]
+        return blocks
+
+
+data_compact = CrudDataCompact(DataCompact)
@@ -0,0 +1,70 @@
+import datetime
+from typing import Iterable, List, Optional
+
+from sqlalchemy import func, select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+
+from crud.base import CRUDBase
+from crud.crud_data_compact import HOURS_PER_DAY, hourly_select, uses_compact_store
+from models import DataDaily
+
+
+def rollup_select(parcel_id: int, dates: Iterable[datetime.date], compacted: bool = False):
+    """SELECT aggregating the parcel's hourly readings of the given days, in DataDaily column order;
+    with compacted, hours kept in data_compact count too (see hourly_select)."""
+    hourly = hourly_select(parcel_id, compacted=compacted, dates=dates).subquery()
+    hours = func.count()
+    return select(
+        hourly.c.parcel_id,
+        hourly.c.date,
+        func.min(hourly.c.atmospheric_temperature),
+        func.max(hourly.c.atmospheric_temperature),
+        func.avg(hourly.c.atmospheric_temperature),
+        func.avg(hourly.c.atmospheric_relative_humidity),
+        func.sum(hourly.c.precipitation),
+        hours,
+        hours >= HOURS_PER_DAY,
+    ).group_by(hourly.c.parcel_id, hourly.c.date)
+
+
+ROLLUP_COLUMNS = [
+    "parcel_id", "date", "temp_min", "temp_max", "temp_mean",
+    "humidity_mean", "precipitation_sum", "hours", "complete",
+]
+
+
+class CrudDataDaily(CRUDBase[DataDaily, dict, dict]):
+
+    def refresh(self, db: Session, parcel_id: int, dates: Iterable[datetime.date]) -> None:
+        """Re-aggregate the given days from the hourly readings; runs in the caller's transaction."""
+        dates = [d for d in dates if d is not None]
+        if not dates:
+            return
+        stmt = insert(DataDaily).from_select(
+            ROLLUP_COLUMNS, rollup_select(parcel_id, dates, compacted=uses_compact_store(db))
+        )
+        stmt = stmt.on_conflict_do_update(
+            constraint="uq_data_daily_parcel_date",
+            set_={name: stmt.excluded[name] for name in ROLLUP_COLUMNS[2:]},
+        )
+        db.execute(stmt)
+
+    def get_range(self, db: Session, parcel_id: int, start: Optional[datetime.date] = None,
+                  end: Optional[datetime.date] = None) -> List[DataDaily]:
+        """Rollup rows of [start, end] (open-ended when omitted), oldest first."""
+        query = db.query(DataDaily).filter(DataDaily.parcel_id == parcel_id)
+        if start is not None:
+            query = query.filter(DataDaily.date >= start)
+        if end is not None:
+            query = query.filter(DataDaily.date <= end)
+        return query.order_by(DataDaily.date.asc()).all()
+
+    def get_dates(self, db: Session, parcel_id: int, start: datetime.date, end: datetime.date) -> List[datetime.date]:
+        rows = db.query(DataDaily.date).filter(
+            DataDaily.parcel_id == parcel_id, DataDaily.date >= start, DataDaily.date <= end
+        ).all()
+        return [row.date for row in rows]
+
+
+data_daily = CrudDataDaily(DataDaily)
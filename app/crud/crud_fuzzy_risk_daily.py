@@ -0,0 +1,64 @@
+import datetime
+import logging
+from typing import Iterable, List
+from uuid import UUID
+
+from sqlalchemy import delete
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import Session
+
+from crud.base import CRUDBase
+from models import FuzzyRiskDaily
+
+logger = logging.getLogger(__name__)
+
+
+class CrudFuzzyRiskDaily(CRUDBase[FuzzyRiskDaily, dict, dict]):
+    # rows per INSERT statement, keeping the bind parameters under the Postgres limit
+    INSERT_CHUNK_SIZE = 1000
+
+    def get_range(self, db: Session, parcel_id: int, threat_model_ids: Iterable[UUID],
+                  start: datetime.date, end: datetime.date) -> List[FuzzyRiskDaily]:
+        """Rows of all versions of the given models in [start, end]; callers pick the version."""
+        return db.query(FuzzyRiskDaily).filter(
+            FuzzyRiskDaily.parcel_id == parcel_id,
+            FuzzyRiskDaily.threat_model_id.in_(list(threat_model_ids)),
+            FuzzyRiskDaily.date >= start,
+            FuzzyRiskDaily.date <= end,
+        ).order_by(FuzzyRiskDaily.threat_model_id, FuzzyRiskDaily.date.asc()).all()
+
+    def remove_from(self, db: Session, parcel_id: int, start: datetime.date) -> int:
+        """Delete the parcel's rows of every model and version from start on, then commit."""
+        deleted = db.execute(
+            delete(FuzzyRiskDaily).where(FuzzyRiskDaily.parcel_id == parcel_id, FuzzyRiskDaily.date >= start)
+        ).rowcount
+        db.commit()
+        return deleted
+
+    def upsert(self, db: Session, rows: Iterable[dict]) -> int:
+        """Insert or overwrite rows, INSERT_CHUNK_SIZE per statement, in one transaction.
+        Errors are logged and raised, leaving the rollback to the caller."""
+        rows = list(rows)
+        if not rows:
+            return 0
+        try:
+            for i in range(0, len(rows), self.INSERT_CHUNK_SIZE):
+                stmt = insert(FuzzyRiskDaily).values(rows[i:i + self.INSERT_CHUNK_SIZE])
+                stmt = stmt.on_conflict_do_update(
+                    constraint="uq_fuzzy_risk_daily_parcel_model_version_date",
+                    set_={
+                        "risk_score": stmt.excluded.risk_score,
+                        "risk_class": stmt.excluded.risk_class,
+                        "detail":     stmt.excluded.detail,
+                    },
+                )
+                db.execute(stmt)
+            db.commit()
+        except SQLAlchemyError:
+            logger.exception("Could not store %d fuzzy_risk_daily rows", len(rows))
+            raise
+        return len(rows)
+
+
+fuzzy_risk_daily = CrudFuzzyRiskDaily(FuzzyRiskDaily)
@@ -0,0 +1,71 @@
+import datetime
+import logging
+from typing import Iterable, List, Optional
+
+from sqlalchemy import func
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import Session
+
+from crud.base import CRUDBase
+from models import GDDSnapshot
+
+logger = logging.getLogger(__name__)
+
+
+class CrudGDDSnapshot(CRUDBase[GDDSnapshot, dict, dict]):
+    # rows per INSERT statement, keeping the bind parameters under the Postgres limit
+    INSERT_CHUNK_SIZE = 1000
+
+    def get_last(self, db: Session, parcel_id: int, t_base: float) -> Optional[GDDSnapshot]:
+        return db.query(GDDSnapshot).filter(
+            GDDSnapshot.parcel_id == parcel_id, GDDSnapshot.t_base == t_base
+        ).order_by(GDDSnapshot.date.desc()).first()
+
+    def get_before(self, db: Session, parcel_id: int, t_base: float,
+                   date: datetime.date) -> Optional[GDDSnapshot]:
+        """Latest snapshot strictly before date — the accumulator seed for a window starting at date."""
+        return db.query(GDDSnapshot).filter(
+            GDDSnapshot.parcel_id == parcel_id,
+            GDDSnapshot.t_base == t_base,
+            GDDSnapshot.date < date,
+        ).order_by(GDDSnapshot.date.desc()).first()
+
+    def get_season_totals(self, db: Session, parcel_id: int, t_base: float):
+        """(season_year, days, total) per season, oldest first."""
+        return db.query(
+            GDDSnapshot.season_year,
+            func.count(GDDSnapshot.id).label("days"),
+            func.max(GDDSnapshot.gdd_cum).label("total"),
+        ).filter(
+            GDDSnapshot.parcel_id == parcel_id, GDDSnapshot.t_base == t_base
+        ).group_by(GDDSnapshot.season_year).order_by(GDDSnapshot.season_year.asc()).all()
+
+    def get_t_bases(self, db: Session, parcel_id: int) -> List[float]:
+        rows = db.query(func.distinct(GDDSnapshot.t_base)).filter(
+            GDDSnapshot.parcel_id == parcel_id
+        ).all()
+        return [row[0] for row in rows]
+
+    def upsert(self, db: Session, rows: Iterable[dict]) -> int:
+        """Insert or overwrite rows, INSERT_CHUNK_SIZE per statement, in one transaction.
+        Errors are logged and raised, leaving the rollback to the caller."""
+        rows = list(rows)
+        if not rows:
+            return 0
+        try:
+            for i in range(0, len(rows), self.INSERT_CHUNK_SIZE):
+                stmt = insert(GDDSnapshot).values(rows[i:i + self.INSERT_CHUNK_SIZE])
+                stmt = stmt.on_conflict_do_update(
+                    constraint="uq_gdd_snapshot_parcel_base_date",
+                    set_={"season_year": stmt.excluded.season_year, "gdd_cum": stmt.excluded.gdd_cum},
+                )
+                db.execute(stmt)
+            db.commit()
+        except SQLAlchemyError:
+            logger.exception("Could not store %d gdd_snapshot rows", len(rows))
+            raise
+        return len(rows)
+
+
+gdd_snapshot = CrudGDDSnapshot(GDDSnapshot)
@@ -1,4 +1,4 @@
-from typing import List
+from typing import Iterable, List
 
 from sqlalchemy.orm import Session
 
@@ -12,5 +12,11 @@ class CrudParcel(CRUDBase[Parcel, CreateParcel, dict]):
     def get_all(self, db: Session) -> List[Parcel]:
         return db.query(Parcel).all()
 
+    def get_by_ids(self, db: Session, ids: Iterable[int]) -> List[Parcel]:
+        ids = list(ids)
+        if not ids:
+            return []
+        return db.query(Parcel).filter(Parcel.id.in_(ids)).all()
+
 
 parcel = CrudParcel(Parcel)
\ No newline at end of file
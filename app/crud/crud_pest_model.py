@@ -1,10 +1,11 @@
-from typing import Optional
+from typing import Iterable, List, Optional
+from uuid import UUID
 
 from sqlalchemy.exc import SQLAlchemyError
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import Session, selectinload
 from crud.base import CRUDBase
 
-from models import PestModel, Cultivation
+from models import Condition, PestModel, Cultivation, Rule
 from schemas import CreatePestModel, UpdatePestModel
 
 
@@ -52,5 +53,25 @@ class CrudPestModel(CRUDBase[PestModel, CreatePestModel, UpdatePestModel]):
     def get_all(self, db: Session):
         return db.query(PestModel).all()
 
+    def get_with_rules(self, db: Session, ids: Iterable[UUID]) -> List[PestModel]:
+        """Pest models with rules, conditions, units and operators eagerly loaded.
+
+        One IN query per level (pest, rule, condition, unit, operator)
+        regardless of how many models are requested.
+        """
+        ids = list(ids)
+        if not ids:
+            return []
+        return (
+            db.query(PestModel)
+            .filter(PestModel.id.in_(ids))
+            .options(
+                selectinload(PestModel.rules)
+                .selectinload(Rule.conditions)
+                .options(selectinload(Condition.unit), selectinload(Condition.operator))
+            )
+            .all()
+        )
+
 
 pest_model = CrudPestModel(PestModel)
@@ -1,4 +1,5 @@
-from typing import List, Optional
+import datetime
+from typing import Iterable, List, Optional, Tuple
 from uuid import UUID
 
 from fastapi.encoders import jsonable_encoder
@@ -19,6 +20,21 @@ class CRUDThreatModel(CRUDBase[ThreatModel, ThreatModelCreate, ThreatModelUpdate
             .all()
         )
 
+    def get_by_ids(self, db: Session, ids: Iterable[UUID]) -> List[ThreatModel]:
+        ids = list(ids)
+        if not ids:
+            return []
+        return db.query(self.model).filter(self.model.id.in_(ids)).all()
+
+    def get_versions(
+        self, db: Session, ids: Optional[Iterable[UUID]] = None
+    ) -> List[Tuple[UUID, datetime.datetime]]:
+        """(id, updated_at) pairs — cheap staleness check without loading definitions."""
+        query = db.query(self.model.id, self.model.updated_at)
+        if ids is not None:
+            query = query.filter(self.model.id.in_(list(ids)))
+        return [(row.id, row.updated_at) for row in query.all()]
+
     def create(self, db: Session, obj_in: ThreatModelCreate, **kwargs) -> Optional[ThreatModel]:
         data = jsonable_encoder(obj_in)
         # definition is a nested Pydantic model — encode to plain dict for JSONB
@@ -0,0 +1,36 @@
+from typing import List
+
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+
+from crud.base import CRUDBase
+from models import Parcel, WeatherCell
+from utils.grid import snap_to_grid
+
+
+class CrudWeatherCell(CRUDBase[WeatherCell, dict, dict]):
+
+    def get_or_create(self, db: Session, latitude: float, longitude: float) -> WeatherCell:
+        """The cell (latitude, longitude) snaps to, created if new, in the caller's transaction."""
+        latitude, longitude = snap_to_grid(latitude, longitude)
+        db.execute(
+            insert(WeatherCell).values(latitude=latitude, longitude=longitude)
+            .on_conflict_do_nothing(constraint="uq_weather_cell_latitude_longitude")
+        )
+        return db.query(WeatherCell).filter(
+            WeatherCell.latitude == latitude, WeatherCell.longitude == longitude
+        ).one()
+
+    def assign(self, db: Session, parcel: Parcel) -> WeatherCell:
+        """The parcel's cell, assigning it from the parcel's coordinates (and committing) on first use."""
+        if parcel.weather_cell_id is None:
+            parcel.weather_cell_id = self.get_or_create(db=db, latitude=parcel.latitude, longitude=parcel.longitude).id
+            db.commit()
+        return self.get(db=db, id=parcel.weather_cell_id)
+
+    def get_parcel_ids(self, db: Session, cell_id: int) -> List[int]:
+        rows = db.query(Parcel.id).filter(Parcel.weather_cell_id == cell_id).order_by(Parcel.id.asc()).all()
+        return [row.id for row in rows]
+
+
+weather_cell = CrudWeatherCell(WeatherCell)
@@ -0,0 +1,62 @@
+import datetime
+from typing import List, Literal, Optional
+
+import pandas as pd
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import Session
+
+from crud.base import CRUDBase
+from crud.crud_data import _frame_to_rows
+from crud.crud_data_daily import data_daily
+from crud.crud_weather_cell import weather_cell
+from models import WeatherCellData
+
+
+class CrudWeatherCellData(CRUDBase[WeatherCellData, dict, dict]):
+    # rows per INSERT statement, keeping the bind parameters under the Postgres limit
+    INSERT_CHUNK_SIZE = 1000
+
+    def bulk_write(self, db: Session, frame: pd.DataFrame, cell_id: int,
+                   on_conflict: Literal["nothing", "update"] = "nothing") -> Optional[int]:
+        """crud.data.bulk_write for a weather cell: stores the frame's hours once for the cell and
+        refreshes the data_daily rollup of the days written for every parcel in it, then commits.
+        Returns the number of rows written, None on error."""
+        values = _frame_to_rows(frame, cell_id, keep="last" if on_conflict == "update" else "first")
+        values = values.rename(columns={"parcel_id": "cell_id"})
+        if values.empty:
+            return 0
+
+        records = values.astype(object).where(values.notna(), None).to_dict("records")
+        written, dates = 0, set()
+        try:
+            for i in range(0, len(records), self.INSERT_CHUNK_SIZE):
+                stmt = insert(WeatherCellData).values(records[i:i + self.INSERT_CHUNK_SIZE])
+                if on_conflict == "update":
+                    stmt = stmt.on_conflict_do_update(
+                        constraint="uq_weather_cell_data_cell_date_time",
+                        set_={name: stmt.excluded[name] for name in values.columns
+                              if name not in ("cell_id", "date", "time")},
+                    )
+                else:
+                    stmt = stmt.on_conflict_do_nothing(constraint="uq_weather_cell_data_cell_date_time")
+                returned = db.execute(stmt.returning(WeatherCellData.date)).scalars().all()
+                written += len(returned)
+                dates.update(returned)
+            for parcel_id in weather_cell.get_parcel_ids(db=db, cell_id=cell_id):
+                data_daily.refresh(db=db, parcel_id=parcel_id, dates=dates)
+            db.commit()
+        except SQLAlchemyError:
+            db.rollback()
+            return None
+        return written
+
+    def get_dates(self, db: Session, cell_id: int, start: datetime.date, end: datetime.date) -> List[datetime.date]:
+        """Days of [start, end] the cell has hours of, oldest first."""
+        rows = db.query(WeatherCellData.date).filter(
+            WeatherCellData.cell_id == cell_id, WeatherCellData.date.between(start, end)
+        ).distinct().order_by(WeatherCellData.date.asc()).all()
+        return [row.date for row in rows]
+
+
+weather_cell_data = CrudWeatherCellData(WeatherCellData)
@@ -1,17 +1,34 @@
 import db.session
 
+from core.config import settings
 from models import Parcel
 
-import openmeteo_requests
 import crud
 
-import requests_cache
 import pandas as pd
-from retry_requests import retry
+from sqlalchemy.exc import SQLAlchemyError
 
 from datetime import timedelta, datetime
 
-from schemas import NewCreateData
+from utils.data import store_parcel_weather
+from utils.fuzzy_risk import threat_model_catalog
+from utils.fuzzy_risk_daily import materialize_fuzzy_risk, materialize_missing_fuzzy_risk
+from utils.gdd_snapshot import refresh_after_ingest
+from utils.openmeteo import FORECAST_URL, weather_api
+from utils.sensor_buffer import sensor_buffer
+
+# Forecast variables stored by the nightly job → Data column ("rain" is not stored)
+_FORECAST_TO_DB_COLUMNS = {
+    "temperature_2m": "atmospheric_temperature",
+    "relative_humidity_2m": "atmospheric_relative_humidity",
+    "precipitation": "precipitation",
+    "surface_pressure": "atmospheric_pressure",
+    "wind_speed_10m": "average_wind_speed",
+    "soil_temperature_0cm": "soil_temperature_10cm",
+    "soil_temperature_6cm": "soil_temperature_20cm",
+    "soil_temperature_18cm": "soil_temperature_30cm",
+    "soil_temperature_54cm": "soil_temperature_40cm",
+}
 
 
 def get_open_meteo_data():
@@ -24,24 +41,29 @@ def get_open_meteo_data():
         session.close()
         return
 
-    # Set up the Open-Meteo API client with cache and retry on error
-    # Set to 240, in an attempt to solve issue of service failing to fetch data after having worked for ~3 weeks.
-    # This: https://github.com/open-meteo/open-meteo/issues/1042 issue was found and examined.
-    cache_session = requests_cache.CachedSession('.cache', expire_after=240)
-    retry_session = retry(cache_session, retries=5, backoff_factor=0.2)
-    openmeteo = openmeteo_requests.Client(session=retry_session)
-
     try:
-        url = "https://api.open-meteo.com/v1/forecast"
+        threat_models = threat_model_catalog.resolve(session)
+
+        locations = parcels
+        if settings.WEATHER_SHARED_CELLS:
+            # one location and one stored series per grid cell, read by every parcel in it
+            cells = {}
+            for parcel_db in parcels:
+                cells.setdefault(crud.weather_cell.assign(db=session, parcel=parcel_db).id, parcel_db)
+            parcels = list(cells.values())
+            locations = [crud.weather_cell.get(db=session, id=cell_id) for cell_id in cells]
+
         params = {
-            "latitude": [x.latitude for x in parcels],
-            "longitude": [x.longitude for x in parcels],
+            "latitude": [x.latitude for x in locations],
+            "longitude": [x.longitude for x in locations],
             "hourly": ["temperature_2m", "relative_humidity_2m", "precipitation", "rain", "surface_pressure",
                        "wind_speed_10m", "soil_temperature_0cm", "soil_temperature_6cm", "soil_temperature_18cm",
                        "soil_temperature_54cm"],
             "past_days": 1
         }
-        responses = openmeteo.weather_api(url, params=params)
+        # Cached for 240 s only, in an attempt to solve issue of service failing to fetch data after having
+        # worked for ~3 weeks. This: https://github.com/open-meteo/open-meteo/issues/1042 issue was found and examined.
+        responses = weather_api(FORECAST_URL, params=params, expire_after=240)
 
         for parcel, parcel_db in zip(responses, parcels):
             # Process hourly data. The order of variables needs to be the same as requested.
@@ -86,34 +108,91 @@ def get_open_meteo_data():
             if hourly_dataframe.shape[0] == 0:
                 continue
 
-            # check whether data already present (to dodge duplicates)
-            if crud.data.get_data_by_parcel_id_and_date(db=session, parcel_id=parcel_db.id,
-                                                        date=hourly_dataframe.iloc[0]["date"].date(),
-                                                        time=hourly_dataframe.iloc[0]["date"].time()):
+            # hours already stored are skipped by the (parcel_id, date, time) constraint
+            written, parcel_ids = store_parcel_weather(
+                db=session,
+                frame=hourly_dataframe.rename(columns=_FORECAST_TO_DB_COLUMNS),
+                parcel=parcel_db
+            )
+            if not written:
                 continue
+            first_day = hourly_dataframe.iloc[0]["date"].date()
+            for parcel_id in parcel_ids:
+                refresh_after_ingest(session, parcel_id, first_day)
+                materialize_fuzzy_risk(session, parcel_id, first_day, threat_models=threat_models)
+    except Exception:
+        session.close()
 
-            crud.data.batch_insert(
+    session.close()
+
+def maintain_data_partitions():
+    """Create the data partitions of the coming months and apply the retention policy."""
+    session = db.session.SessionLocal()
+    try:
+        this_month = datetime.today().date().replace(day=1)
+        months = [this_month]
+        for _ in range(settings.DATA_PARTITION_MONTHS_AHEAD):
+            months.append((months[-1] + timedelta(days=31)).replace(day=1))
+        crud.data.ensure_partitions(db=session, dates=months)
+        session.commit()
+
+        if settings.DATA_RETENTION_MONTHS > 0:
+            cutoff = this_month
+            for _ in range(settings.DATA_RETENTION_MONTHS):
+                cutoff = (cutoff - timedelta(days=1)).replace(day=1)
+            crud.data.drop_partitions_before(db=session, month=cutoff)
+    finally:
+        session.close()
+
+
+def compact_hourly_data():
+    """Fold hourly data older than DATA_COMPACT_AFTER_DAYS into data_compact / data_daily,
+    one parcel and month at a time."""
+    if settings.DATA_COMPACT_AFTER_DAYS <= 0:
+        return
+    session = db.session.SessionLocal()
+    try:
+        cutoff = datetime.today().date() - timedelta(days=settings.DATA_COMPACT_AFTER_DAYS)
+        for parcel_id, month in crud.data_compact.get_pending(db=session, before=cutoff):
+            crud.data_compact.compact(
                 db=session,
-                list_of_data=[
-                    NewCreateData(
-                        date=x[1].date(),
-                        time=x[1].time(),
-                        atmospheric_temperature=x[2],
-                        atmospheric_relative_humidity=x[3],
-                        atmospheric_pressure=x[6],
-                        precipitation=x[4],
-                        average_wind_speed=x[7],
-                        soil_temperature_10cm=x[8],
-                        soil_temperature_20cm=x[9],
-                        soil_temperature_30cm=x[10],
-                        soil_temperature_40cm=x[11]
-                    ) for x in hourly_dataframe.itertuples()
-                ],
-                parcel_id=parcel_db.id
+                parcel_id=parcel_id,
+                start=month,
+                end=min((month + timedelta(days=31)).replace(day=1), cutoff),
+                keep_hourly=settings.DATA_COMPACT_KEEP_HOURLY,
             )
-    except Exception:
-        openmeteo.session.close()
+    finally:
+        session.close()
+
+
+def backfill_fuzzy_risk():
+    """Materialize the fuzzy risk days that ingests, weather backfills or threat model edits
+    left without a current row, over the last FUZZY_MATERIALIZE_BACKFILL_DAYS."""
+    if settings.FUZZY_MATERIALIZE_BACKFILL_DAYS <= 0:
+        return
+    session = db.session.SessionLocal()
+    try:
+        threat_models = threat_model_catalog.resolve(session)
+        today = datetime.today().date()
+        start = today - timedelta(days=settings.FUZZY_MATERIALIZE_BACKFILL_DAYS)
+        # stored forecasts run ahead of today
+        end = today + timedelta(days=settings.OPEN_METEO_MAX_FORECAST_DAYS)
+        for (parcel_id,) in session.query(Parcel.id).all():
+            try:
+                materialize_missing_fuzzy_risk(session, parcel_id, start, end, threat_models=threat_models)
+            except SQLAlchemyError:
+                # already logged by the upsert; the next run retries the parcel
+                session.rollback()
+    finally:
         session.close()
 
-    openmeteo.session.close()
-    session.close()
\ No newline at end of file
+
+def flush_sensor_buffer(force: bool = False):
+    """Write the buffered sensor readings once the buffer is due (or always, with force)."""
+    if not force and not sensor_buffer.due():
+        return
+    session = db.session.SessionLocal()
+    try:
+        sensor_buffer.flush(db=session)
+    finally:
+        session.close()
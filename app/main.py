@@ -9,7 +9,11 @@ from core.config import settings
 from init.db_init import init_db
 from init.init_gatekeeper import register_apis_to_gatekeeper
 
-from jobs.background_tasks import get_open_meteo_data
+from jobs.background_tasks import (
+    backfill_fuzzy_risk, compact_hourly_data, flush_sensor_buffer, get_open_meteo_data,
+    maintain_data_partitions
+)
+from utils.fuzzy_executor import shutdown_executor
 
 
 import logging
@@ -19,10 +23,19 @@ async def lifespan(fa: FastAPI):
     init_db()
     if settings.USING_GATEKEEPER:
         register_apis_to_gatekeeper()
+    # partitions first, so the ingestion run that follows never has to create one
+    scheduler.add_job(maintain_data_partitions, 'cron', day_of_week='*', hour=0, minute=0, second=0)
     scheduler.add_job(get_open_meteo_data, 'cron', day_of_week='*', hour=0, minute=5, second=0)
+    scheduler.add_job(compact_hourly_data, 'cron', day_of_week='*', hour=0, minute=30, second=0)
+    if settings.FUZZY_MATERIALIZE_BACKFILL_MINUTES > 0:
+        scheduler.add_job(backfill_fuzzy_risk, 'interval', minutes=settings.FUZZY_MATERIALIZE_BACKFILL_MINUTES)
+    # checks every second whether the sensor buffer is due (by size or age)
+    scheduler.add_job(flush_sensor_buffer, 'interval', seconds=1)
     scheduler.start()
     yield
     scheduler.shutdown()
+    flush_sensor_buffer(force=True)
+    shutdown_executor()
     logging.shutdown()
 
 
@@ -11,3 +11,9 @@ from .disease import Disease
 from .gddinterval import GDDInterval
 from .crop import Crop
 from .threat_model import ThreatModel
+from .gdd_snapshot import GDDSnapshot
+from .fuzzy_risk_daily import FuzzyRiskDaily
+from .data_daily import DataDaily
+from .data_compact import DataCompact
+from .weather_cell import WeatherCell
+from .weather_cell_data import WeatherCellData
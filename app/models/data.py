@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, Date, Time, String, Float, ForeignKey
+from sqlalchemy import Column, Integer, Date, Time, String, Float, ForeignKey, Sequence, UniqueConstraint
 from sqlalchemy.orm import Mapped, relationship
 from sqlalchemy.testing.schema import mapped_column
 
@@ -7,9 +7,17 @@ from db.base_class import Base
 
 class Data(Base):
     __tablename__ = 'data'
-    id = Column(Integer, primary_key=True, unique=True, nullable=False)
-
-    date = Column(Date, nullable=True)
+    __table_args__ = (
+        # one reading per parcel and hour; also the index behind every per-parcel range read
+        UniqueConstraint("parcel_id", "date", "time", name="uq_data_parcel_date_time"),
+        # monthly partitions data_pYYYY_MM, managed by crud.data.ensure_partitions
+        {"postgresql_partition_by": "RANGE (date)"},
+    )
+    # the partition key has to be part of every unique constraint, the primary key included;
+    # a composite key gets no SERIAL, so id draws from the original sequence explicitly
+    id = Column(Integer, Sequence("data_id_seq"), primary_key=True, nullable=False)
+
+    date = Column(Date, primary_key=True, nullable=False)
     time = Column(Time, nullable=True)
 
     atmospheric_temperature = Column(Float, nullable=True, info={"unit_of_measure": "celsius"})
@@ -41,5 +49,5 @@ class Data(Base):
     # also these
     solar_irradiance_copernicus = Column(Float, nullable=True, info={"unit_of_measure": "W/m2"})
 
-    parcel_id: Mapped[int] = mapped_column(ForeignKey("parcel.id"))
+    parcel_id: Mapped[int] = mapped_column(ForeignKey("parcel.id", ondelete="CASCADE"))
     parcel: Mapped["Parcel"] = relationship(back_populates="data")
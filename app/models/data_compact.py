@@ -0,0 +1,51 @@
+from sqlalchemy import Column, Integer, Date, ForeignKey, UniqueConstraint
+from sqlalchemy.dialects.postgresql import ARRAY, REAL, TEXT
+
+from db.base_class import Base
+
+
+class DataCompact(Base):
+    """A parcel's hourly Data of one day, one 24-slot array per Data column.
+
+    Slot h holds the reading of hour h (averaged when several fall in that hour),
+    NULL where there was none; a column without any reading that day is NULL.
+    Written by crud.data_compact.compact, and by the ingestion paths when
+    settings.DATA_STORE_DAILY_ARRAYS is on. The data_hourly view unpacks it.
+    """
+    __tablename__ = "data_compact"
+    __table_args__ = (
+        UniqueConstraint("parcel_id", "date", name="uq_data_compact_parcel_date"),
+    )
+
+    id = Column(Integer, primary_key=True, unique=True, nullable=False)
+
+    parcel_id = Column(Integer, ForeignKey("parcel.id", ondelete="CASCADE"), nullable=False)
+    date = Column(Date, nullable=False)
+    # bit h set when hour h has a reading
+    hours = Column(Integer, nullable=False, server_default="0")
+
+    atmospheric_temperature = Column(ARRAY(REAL), nullable=True, info={"unit_of_measure": "celsius"})
+    atmospheric_temperature_daily_min = Column(ARRAY(REAL), nullable=True, info={"unit_of_measure": "celsius"})
+    atmospheric_temperature_daily_max = Column(ARRAY(REAL), nullable=True, info={"unit_of_measure": "celsius"})
+    atmospheric_temperature_daily_average = Column(ARRAY(REAL), nullable=True, info={"unit_of_measure": "celsius"})
+    atmospheric_relative_humidity = Column(ARRAY(REAL), nullable=True, info={"unit_of_measure": "percentage"})
+    atmospheric_pressure = Column(ARRAY(REAL), nullable=True, info={"unit_of_measure": "mbar"})
+
+    precipitation = Column(ARRAY(REAL), nullable=True, info={"unit_of_measure": "mm"})
+
+    average_wind_speed = Column(ARRAY(REAL), nullable=True, info={"unit_of_measure": "km/h"})
+    wind_direction = Column(ARRAY(TEXT), nullable=True)
+    wind_gust = Column(ARRAY(REAL), nullable=True, info={"unit_of_measure": "km/h"})
+
+    leaf_relative_humidity = Column(ARRAY(REAL), nullable=True, info={"unit_of_measure": "percentage"})
+    leaf_temperature = Column(ARRAY(REAL), nullable=True, info={"unit_of_measure": "celsius"})
+    leaf_wetness = Column(ARRAY(REAL), nullable=True, info={"unit_of_measure": "time-frame"})
+
+    soil_temperature_10cm = Column(ARRAY(REAL), nullable=True, info={"unit_of_measure": "celsius"})
+    soil_temperature_20cm = Column(ARRAY(REAL), nullable=True, info={"unit_of_measure": "celsius"})
+    soil_temperature_30cm = Column(ARRAY(REAL), nullable=True, info={"unit_of_measure": "celsius"})
+    soil_temperature_40cm = Column(ARRAY(REAL), nullable=True, info={"unit_of_measure": "celsius"})
+    soil_temperature_50cm = Column(ARRAY(REAL), nullable=True, info={"unit_of_measure": "celsius"})
+    soil_temperature_60cm = Column(ARRAY(REAL), nullable=True, info={"unit_of_measure": "celsius"})
+
+    solar_irradiance_copernicus = Column(ARRAY(REAL), nullable=True, info={"unit_of_measure": "W/m2"})
@@ -0,0 +1,26 @@
+from sqlalchemy import Boolean, Column, Integer, Float, Date, ForeignKey, UniqueConstraint
+
+from db.base_class import Base
+
+
+class DataDaily(Base):
+    """Daily rollup of a parcel's hourly Data rows, rewritten by crud.data.batch_insert."""
+    __tablename__ = "data_daily"
+    __table_args__ = (
+        UniqueConstraint("parcel_id", "date", name="uq_data_daily_parcel_date"),
+    )
+
+    id = Column(Integer, primary_key=True, unique=True, nullable=False)
+
+    parcel_id = Column(Integer, ForeignKey("parcel.id", ondelete="CASCADE"), nullable=False)
+    date = Column(Date, nullable=False)
+
+    temp_min = Column(Float, nullable=True, info={"unit_of_measure": "celsius"})
+    temp_max = Column(Float, nullable=True, info={"unit_of_measure": "celsius"})
+    temp_mean = Column(Float, nullable=True, info={"unit_of_measure": "celsius"})
+    humidity_mean = Column(Float, nullable=True, info={"unit_of_measure": "percentage"})
+    precipitation_sum = Column(Float, nullable=True, info={"unit_of_measure": "mm"})
+
+    # hourly rows the day was aggregated from; complete once all 24 are stored
+    hours = Column(Integer, nullable=False)
+    complete = Column(Boolean, nullable=False)
@@ -0,0 +1,26 @@
+from sqlalchemy import Column, Integer, Float, Date, DateTime, String, ForeignKey, UniqueConstraint, Uuid
+
+from db.base_class import Base
+
+
+class FuzzyRiskDaily(Base):
+    """Precomputed fuzzy risk per parcel, threat model version and day."""
+    __tablename__ = "fuzzy_risk_daily"
+    __table_args__ = (
+        UniqueConstraint(
+            "parcel_id", "threat_model_id", "model_version", "date",
+            name="uq_fuzzy_risk_daily_parcel_model_version_date",
+        ),
+    )
+
+    id = Column(Integer, primary_key=True, unique=True, nullable=False)
+
+    parcel_id = Column(Integer, ForeignKey("parcel.id", ondelete="CASCADE"), nullable=False)
+    threat_model_id = Column(Uuid, ForeignKey("threat_model.id", ondelete="CASCADE"), nullable=False)
+    # threat_model.updated_at the row was computed with
+    model_version = Column(DateTime, nullable=False)
+    date = Column(Date, nullable=False)
+
+    risk_score = Column(Float, nullable=False)
+    risk_class = Column(String(20), nullable=False)
+    detail = Column(String, nullable=True)
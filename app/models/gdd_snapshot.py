@@ -0,0 +1,19 @@
+from sqlalchemy import Column, Integer, Float, Date, ForeignKey, UniqueConstraint
+
+from db.base_class import Base
+
+
+class GDDSnapshot(Base):
+    """Season-to-date cumulative GDD per parcel, base temperature and day."""
+    __tablename__ = "gdd_snapshot"
+    __table_args__ = (
+        UniqueConstraint("parcel_id", "t_base", "date", name="uq_gdd_snapshot_parcel_base_date"),
+    )
+
+    id = Column(Integer, primary_key=True, unique=True, nullable=False)
+
+    parcel_id = Column(Integer, ForeignKey("parcel.id", ondelete="CASCADE"), nullable=False)
+    t_base = Column(Float, nullable=False, info={"unit_of_measure": "celsius"})
+    season_year = Column(Integer, nullable=False)
+    date = Column(Date, nullable=False)
+    gdd_cum = Column(Float, nullable=False, info={"unit_of_measure": "celsius"})
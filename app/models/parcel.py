@@ -1,6 +1,6 @@
 from typing import List
 
-from sqlalchemy import Column, Integer, Float, String
+from sqlalchemy import Column, Integer, Float, String, ForeignKey
 from sqlalchemy.orm import Mapped, relationship
 
 from db.base_class import Base
@@ -12,5 +12,11 @@ class Parcel(Base):
     name = Column(String, nullable=False)
     latitude = Column(Float, nullable=False)
     longitude = Column(Float, nullable=False)
+    # grid cell whose shared weather the parcel reads, assigned on its first fetch
+    weather_cell_id = Column(Integer, ForeignKey("weather_cell.id", ondelete="SET NULL"), nullable=True, index=True)
 
-    data: Mapped[List["Data"]] = relationship(back_populates="parcel", cascade="all, delete-orphan")
+    # the database cascades the delete to data; passive_deletes keeps the ORM from loading
+    # and deleting every hour row itself
+    data: Mapped[List["Data"]] = relationship(
+        back_populates="parcel", cascade="all, delete-orphan", passive_deletes=True
+    )
@@ -1,6 +1,7 @@
+import datetime
 import uuid
 
-from sqlalchemy import String, ForeignKey
+from sqlalchemy import String, ForeignKey, DateTime, func
 from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
@@ -17,6 +18,9 @@ class ThreatModel(Base):
     label: Mapped[str] = mapped_column(String(50), nullable=True)
     note: Mapped[str] = mapped_column(String(300), nullable=True)
     definition: Mapped[dict] = mapped_column(JSONB())
+    updated_at: Mapped[datetime.datetime] = mapped_column(
+        DateTime(), server_default=func.now(), onupdate=func.now()
+    )
 
     crop_id: Mapped[uuid.UUID] = mapped_column(ForeignKey("crop.id"))
     crop: Mapped["Crop"] = relationship(back_populates="threat_models")
@@ -0,0 +1,16 @@
+from sqlalchemy import Column, Integer, Float, UniqueConstraint
+
+from db.base_class import Base
+
+
+class WeatherCell(Base):
+    """A weather model grid cell (see utils.grid.snap_to_grid); the parcels snapping to it
+    share its hourly series in weather_cell_data."""
+    __tablename__ = "weather_cell"
+    __table_args__ = (
+        UniqueConstraint("latitude", "longitude", name="uq_weather_cell_latitude_longitude"),
+    )
+
+    id = Column(Integer, primary_key=True, unique=True, nullable=False)
+    latitude = Column(Float, nullable=False)
+    longitude = Column(Float, nullable=False)
@@ -0,0 +1,50 @@
+from sqlalchemy import Column, Integer, Date, Time, String, Float, ForeignKey, UniqueConstraint
+
+from db.base_class import Base
+
+
+class WeatherCellData(Base):
+    """Hourly weather of a grid cell, fetched once for every parcel in it.
+
+    A parcel's own Data rows take precedence over the cell's reading of the same hour
+    (see crud.crud_data_compact.hourly_select).
+    """
+    __tablename__ = "weather_cell_data"
+    __table_args__ = (
+        UniqueConstraint("cell_id", "date", "time", name="uq_weather_cell_data_cell_date_time"),
+    )
+
+    id = Column(Integer, primary_key=True, unique=True, nullable=False)
+
+    cell_id = Column(Integer, ForeignKey("weather_cell.id", ondelete="CASCADE"), nullable=False)
+    date = Column(Date, nullable=False)
+    time = Column(Time, nullable=False)
+
+    atmospheric_temperature = Column(Float, nullable=True, info={"unit_of_measure": "celsius"})
+    atmospheric_temperature_daily_min = Column(Float, nullable=True, info={"unit_of_measure": "celsius"})
+    atmospheric_temperature_daily_max = Column(Float, nullable=True, info={"unit_of_measure": "celsius"})
+    atmospheric_temperature_daily_average = Column(Float, nullable=True, info={"unit_of_measure": "celsius"})
+    atmospheric_relative_humidity = Column(Float, nullable=True, info={"unit_of_measure": "percentage"})
+    atmospheric_pressure = Column(Float, nullable=True, info={"unit_of_measure": "mbar"})
+
+    precipitation = Column(Float, nullable=True, info={"unit_of_measure": "mm"})
+
+    average_wind_speed = Column(Float, nullable=True, info={"unit_of_measure": "km/h"})
+    wind_direction = Column(String, nullable=True)
+    wind_gust = Column(Float, nullable=True, info={"unit_of_measure": "km/h"})
+
+    # Open meteo does not have these
+    leaf_relative_humidity = Column(Float, nullable=True, info={"unit_of_measure": "percentage"})
+    leaf_temperature = Column(Float, nullable=True, info={"unit_of_measure": "celsius"})
+    leaf_wetness = Column(Float, nullable=True, info={"unit_of_measure": "time-frame"})
+
+    # it has 0-7, 7-28, 28-100, 100-255
+    soil_temperature_10cm = Column(Float, nullable=True, info={"unit_of_measure": "celsius"})
+    soil_temperature_20cm = Column(Float, nullable=True, info={"unit_of_measure": "celsius"})
+    soil_temperature_30cm = Column(Float, nullable=True, info={"unit_of_measure": "celsius"})
+    soil_temperature_40cm = Column(Float, nullable=True, info={"unit_of_measure": "celsius"})
+    soil_temperature_50cm = Column(Float, nullable=True, info={"unit_of_measure": "celsius"})
+    soil_temperature_60cm = Column(Float, nullable=True, info={"unit_of_measure": "celsius"})
+
+    # also these
+    solar_irradiance_copernicus = Column(Float, nullable=True, info={"unit_of_measure": "W/m2"})
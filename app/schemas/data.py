@@ -57,9 +57,54 @@ class NewCreateData(Temp):
     soil_temperature_40cm: Optional[float]
 
 class DataDB(CreateData):
-    id: int
+    # None for hours read back from the compacted store
+    id: Optional[int] = None
+    # data.time is nullable
+    time: Optional[datetime.time] = None
 
 class ListData(BaseModel):
     list_of_data: List[DataDB]
+    # cursor of the next page when the list was limited and more rows follow
+    next_cursor: Optional[str] = None
 
-    model_config = ConfigDict(from_attributes=True)
\ No newline at end of file
+    model_config = ConfigDict(from_attributes=True)
+
+class UploadedData(BaseModel):
+    # rows stored, new or overwritten
+    inserted: int
+    # rows left out: unreadable, repeated, or already stored when not overwriting
+    skipped: int
+
+class SensorReading(BaseModel):
+    timestamp: datetime.datetime
+    # the station or node the reading comes from; precipitation is summed per node
+    node_id: Optional[str] = None
+
+    atmospheric_temperature: Optional[float] = None
+    atmospheric_relative_humidity: Optional[float] = None
+    atmospheric_pressure: Optional[float] = None
+    precipitation: Optional[float] = None
+    average_wind_speed: Optional[float] = None
+    wind_gust: Optional[float] = None
+
+    leaf_relative_humidity: Optional[float] = None
+    leaf_temperature: Optional[float] = None
+    leaf_wetness: Optional[float] = None
+
+    soil_temperature_10cm: Optional[float] = None
+    soil_temperature_20cm: Optional[float] = None
+    soil_temperature_30cm: Optional[float] = None
+    soil_temperature_40cm: Optional[float] = None
+
+class SensorBufferStats(BaseModel):
+    # readings received since the last flush
+    depth: int
+    # parcel hours still averaging readings
+    open_hours: int
+    seconds_since_flush: float
+    flushes: int
+    last_flush_seconds: Optional[float] = None
+    max_flush_seconds: Optional[float] = None
+    written_hours: int
+    failed_hours: int
+    rejected_readings: int
@@ -4,7 +4,7 @@ import datetime
 import uuid
 from typing import List, Optional
 
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 
 
 class FuzzyRiskCalculateRequest(BaseModel):
@@ -20,6 +20,12 @@ class FuzzyRiskForecastRequest(BaseModel):
     days_ahead:        Optional[int] = 7
 
 
+class FuzzyRiskBatchForecastRequest(BaseModel):
+    parcel_ids:        List[int] = Field(..., min_length=1)
+    threat_model_ids:  Optional[List[uuid.UUID]] = None
+    days_ahead:        Optional[int] = 7
+
+
 class FuzzyRiskFetchRequest(BaseModel):
     parcel_id:         int
     from_date:         datetime.date
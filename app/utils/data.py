@@ -1,37 +1,44 @@
 import datetime
 from datetime import timedelta
+from typing import BinaryIO, Iterator, List, Literal, Optional, Tuple
 
-import openmeteo_requests
 import pandas as pd
-import requests_cache
-from retry_requests import retry
+from sqlalchemy import Float
 from sqlalchemy.orm import Session
 
 import crud
+from core.config import settings
 from models import Data, Parcel
-from schemas import NewCreateData
+from utils.gdd_snapshot import refresh_after_ingest
+from utils.openmeteo import ARCHIVE_URL, FORECAST_URL, weather_api
 
 
 def fetch_historical_data_for_parcel(db: Session, parcel: Parcel):
 
-    # Set up the Open-Meteo API client with cache and retry on error
-    cache_session = requests_cache.CachedSession('.cache', expire_after=-1)
-    retry_session = retry(cache_session, retries=5, backoff_factor=0.2)
-    openmeteo = openmeteo_requests.Client(session=retry_session)
+    start_date = (datetime.datetime.now() - timedelta(days=365)).date()
+    end_date = (datetime.datetime.now() - timedelta(days=2)).date()
+    latitude, longitude = parcel.latitude, parcel.longitude
+    if settings.WEATHER_SHARED_CELLS:
+        cell = crud.weather_cell.assign(db=db, parcel=parcel)
+        stored = crud.weather_cell_data.get_dates(db=db, cell_id=cell.id, start=start_date, end=end_date)
+        # a parcel of the same cell fetched the year already
+        if len(stored) == (end_date - start_date).days + 1:
+            _join_weather_cell(db, parcel, start_date, end_date)
+            return
+        latitude, longitude = cell.latitude, cell.longitude
 
-    url = "https://archive-api.open-meteo.com/v1/archive"
     params = {
-        "latitude": "{}".format(parcel.latitude),
-        "longitude": "{}".format(parcel.longitude),
-        "start_date": "{}".format((datetime.datetime.now() - timedelta(days=365)).date().strftime("%Y-%m-%d")),
-        "end_date": "{}".format((datetime.datetime.now() - timedelta(days=2)).date().strftime("%Y-%m-%d")),
+        "latitude": "{}".format(latitude),
+        "longitude": "{}".format(longitude),
+        "start_date": "{}".format(start_date.strftime("%Y-%m-%d")),
+        "end_date": "{}".format(end_date.strftime("%Y-%m-%d")),
         "hourly": ["temperature_2m", "relative_humidity_2m", "precipitation", "surface_pressure", "wind_speed_10m",
                    "soil_temperature_0_to_7cm", "soil_temperature_7_to_28cm", "soil_temperature_28_to_100cm",
                    "soil_temperature_100_to_255cm"],
         "timezone": "auto",
         "elevation": "NaN"
         }
-    responses = openmeteo.weather_api(url, params=params)
+    responses = weather_api(ARCHIVE_URL, params=params)
 
     # Process hourly data. The order of variables needs to be the same as requested.
     hourly = responses[0].Hourly()
@@ -64,32 +71,31 @@ def fetch_historical_data_for_parcel(db: Session, parcel: Parcel):
 
     hourly_dataframe = pd.DataFrame(data=hourly_data)
 
-    hourly_dataframe["date"] = hourly_dataframe["date"].astype(str)
-
-    crud.data.batch_insert(
-        db=db,
-        list_of_data=[
-            NewCreateData(
-                date=x[1].split(" ")[0],
-                time=x[1].split(" ")[1],
-                atmospheric_temperature=x[2],
-                atmospheric_relative_humidity=x[3],
-                precipitation=x[4],
-                atmospheric_pressure=x[5],
-                average_wind_speed=x[6],
-                soil_temperature_10cm=x[7],
-                soil_temperature_20cm=x[8],
-                soil_temperature_30cm=x[9],
-                soil_temperature_40cm=x[10]
-            ) for x in hourly_dataframe.itertuples()
-        ],
-        parcel_id=parcel.id
-    )
-
-    openmeteo.session.close()
+    store_parcel_weather(db=db, frame=hourly_dataframe.rename(columns=_OPENMETEO_TO_DB_COLUMNS), parcel=parcel)
+    if settings.WEATHER_SHARED_CELLS:
+        _join_weather_cell(db, parcel, start_date, end_date)
     return
 
 
+def store_parcel_weather(db: Session, frame: pd.DataFrame, parcel: Parcel,
+                         on_conflict: Literal["nothing", "update"] = "nothing") -> Tuple[Optional[int], List[int]]:
+    """Store fetched hourly weather (a crud.data.bulk_write frame) for the parcel: once for its
+    weather cell with settings.WEATHER_SHARED_CELLS, else as the parcel's own data rows.
+    Returns the rows written (None on error) and the ids of the parcels that read them."""
+    if not settings.WEATHER_SHARED_CELLS:
+        return crud.data.bulk_write(db=db, frame=frame, parcel_id=parcel.id, on_conflict=on_conflict), [parcel.id]
+    cell = crud.weather_cell.assign(db=db, parcel=parcel)
+    written = crud.weather_cell_data.bulk_write(db=db, frame=frame, cell_id=cell.id, on_conflict=on_conflict)
+    return written, crud.weather_cell.get_parcel_ids(db=db, cell_id=cell.id)
+
+
+def _join_weather_cell(db: Session, parcel: Parcel, start: datetime.date, end: datetime.date):
+    """Roll up the cell's stored days of [start, end] for a parcel new to the cell."""
+    dates = crud.weather_cell_data.get_dates(db=db, cell_id=parcel.weather_cell_id, start=start, end=end)
+    crud.data_daily.refresh(db=db, parcel_id=parcel.id, dates=dates)
+    db.commit()
+
+
 # Param values like past_days and forecast_days should be checked before calling this function
 # Besides fetching the forecast data, this function also converts it into a pandas dataframe
 def fetch_forecast_data_for_parcel(
@@ -99,12 +105,6 @@ def fetch_forecast_data_for_parcel(
     past_days: int,
     forecast_days: int,
 ):
-    cache_session = requests_cache.CachedSession(".cache", expire_after=3600)
-    retry_session = retry(cache_session, retries=5, backoff_factor=0.2)
-    openmeteo = openmeteo_requests.Client(session=retry_session)
-
-    url = "https://api.open-meteo.com/v1/forecast"
-
     params = {
         "latitude": latitude,
         "longitude": longitude,
@@ -113,7 +113,7 @@ def fetch_forecast_data_for_parcel(
         "forecast_days": forecast_days,
     }
 
-    responses = openmeteo.weather_api(url, params=params)
+    responses = weather_api(FORECAST_URL, params=params)
     response = responses[0]
     hourly = response.Hourly()
 
@@ -182,24 +182,17 @@ def fetch_archive_hourly_for_range(
 
     Columns are renamed to match the DB Data model (atmospheric_temperature, etc.).
     """
-    cache_session = requests_cache.CachedSession(".cache", expire_after=-1)
-    retry_session = retry(cache_session, retries=5, backoff_factor=0.2)
-    openmeteo     = openmeteo_requests.Client(session=retry_session)
-
-    try:
-        responses = openmeteo.weather_api(
-            "https://archive-api.open-meteo.com/v1/archive",
-            params={
-                "latitude":   latitude,
-                "longitude":  longitude,
-                "start_date": start_date.strftime("%Y-%m-%d"),
-                "end_date":   end_date.strftime("%Y-%m-%d"),
-                "hourly":     _FULL_HOURLY_FIELDS,
-                "timezone":   "auto",
-            },
-        )
-    finally:
-        openmeteo.session.close()
+    responses = weather_api(
+        ARCHIVE_URL,
+        params={
+            "latitude":   latitude,
+            "longitude":  longitude,
+            "start_date": start_date.strftime("%Y-%m-%d"),
+            "end_date":   end_date.strftime("%Y-%m-%d"),
+            "hourly":     _FULL_HOURLY_FIELDS,
+            "timezone":   "auto",
+        },
+    )
 
     return _openmeteo_response_to_dataframe(responses[0].Hourly(), _FULL_HOURLY_FIELDS)
 
@@ -219,24 +212,17 @@ def fetch_forecast_hourly_for_range(
     past_days    = max(0, (today - start_date).days)
     forecast_days = max(1, (end_date - today).days + 1)  # forecast_days is 1-based and required
 
-    cache_session = requests_cache.CachedSession(".cache", expire_after=3600)
-    retry_session = retry(cache_session, retries=5, backoff_factor=0.2)
-    openmeteo     = openmeteo_requests.Client(session=retry_session)
-
-    try:
-        responses = openmeteo.weather_api(
-            "https://api.open-meteo.com/v1/forecast",
-            params={
-                "latitude":      latitude,
-                "longitude":     longitude,
-                "hourly":        _FULL_HOURLY_FIELDS,
-                "past_days":     past_days,
-                "forecast_days": forecast_days,
-                "timezone":      "auto",
-            },
-        )
-    finally:
-        openmeteo.session.close()
+    responses = weather_api(
+        FORECAST_URL,
+        params={
+            "latitude":      latitude,
+            "longitude":     longitude,
+            "hourly":        _FULL_HOURLY_FIELDS,
+            "past_days":     past_days,
+            "forecast_days": forecast_days,
+            "timezone":      "auto",
+        },
+    )
 
     df = _openmeteo_response_to_dataframe(responses[0].Hourly(), _FULL_HOURLY_FIELDS)
     # Clip to requested range
@@ -244,52 +230,103 @@ def fetch_forecast_hourly_for_range(
     return df[mask].reset_index(drop=True)
 
 
-def _dedupe_and_store_hourly(
-    db: Session,
-    hourly_df: pd.DataFrame,
-    parcel_id: int,
-    from_date: datetime.date,
-    to_date:   datetime.date,
-) -> int:
-    """Insert hourly rows for the parcel, skipping any that already exist for
-    the same (date, time). Returns the count of rows inserted."""
+def _dedupe_and_store_hourly(db: Session, hourly_df: pd.DataFrame, parcel: Parcel) -> int:
+    """Insert hourly rows for the parcel (for its weather cell, see store_parcel_weather),
+    skipping any that already exist for the same (date, time). Returns the count of rows inserted."""
     if hourly_df.empty:
         return 0
 
-    existing = db.query(Data.date, Data.time).filter(
-        Data.parcel_id == parcel_id,
-        Data.date.between(from_date, to_date),
-    ).all()
-    existing_keys = {(row.date, row.time) for row in existing}
-
-    records: list[NewCreateData] = []
-    for row in hourly_df.itertuples(index=False):
-        ts = row.date
-        if hasattr(ts, "to_pydatetime"):
-            ts = ts.to_pydatetime()
-        d = ts.date()
-        t = ts.time().replace(tzinfo=None)
-        if (d, t) in existing_keys:
-            continue
+    # existing (date, time) rows are left alone by the unique constraint
+    written, parcel_ids = store_parcel_weather(db=db, frame=hourly_df, parcel=parcel)
+    if written:
+        first_day = pd.to_datetime(hourly_df["date"]).min().date()
+        for parcel_id in parcel_ids:
+            refresh_after_ingest(db, parcel_id, first_day)
+    return written or 0
+
+
+def store_weather_upload(db: Session, file: BinaryIO, parcel_id: int, formatting: Literal["CSV", "PARQUET"],
+                         on_conflict: Literal["nothing", "update"] = "update",
+                         chunk_size: Optional[int] = None) -> Tuple[int, int]:
+    """Store a CSV or Parquet file of hourly readings for the parcel, chunk_size rows at a time.
+
+    The file has a "date" (%Y-%m-%d) and a "time" (%H:%M:%S) column and any of the Data value
+    columns; other columns are ignored. Each chunk is validated column by column and written
+    with crud.data.bulk_write, so memory stays bounded by the chunk whatever the file size.
+    Rows with an unreadable date, time or value are skipped, as are the rows bulk_write leaves
+    alone (repeated hours, and stored hours when on_conflict is "nothing").
+    Returns (inserted, skipped); raises ValueError for a malformed file or a failed write,
+    the chunks before it staying stored.
+    """
+    chunk_size = chunk_size or settings.DATA_UPLOAD_CHUNK_SIZE
+    inserted, skipped, first_day = 0, 0, None
+    for chunk in _read_upload_chunks(file, formatting, chunk_size):
+        frame = _upload_chunk_to_frame(chunk)
+        written = crud.data.bulk_write(db=db, frame=frame, parcel_id=parcel_id, on_conflict=on_conflict)
+        if written is None:
+            raise ValueError("could not store rows {} to {}".format(
+                inserted + skipped + 1, inserted + skipped + len(chunk)))
+        inserted += written
+        skipped += len(chunk) - written
+        if written and len(frame):
+            day = frame["date"].min().date()
+            first_day = day if first_day is None else min(first_day, day)
+
+    if first_day is not None:
+        refresh_after_ingest(db, parcel_id, first_day)
+    return inserted, skipped
+
+
+def _read_upload_chunks(file: BinaryIO, formatting: str, chunk_size: int) -> Iterator[pd.DataFrame]:
+    if formatting == "PARQUET":
+        try:
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise ValueError("Parquet uploads need pyarrow installed, upload CSV instead")
+        try:
+            batches = pq.ParquetFile(file).iter_batches(batch_size=chunk_size)
+        except Exception as e:
+            raise ValueError("cannot read Parquet: {}".format(e))
+        for batch in batches:
+            yield batch.to_pandas()
+        return
 
-        def _f(v):
-            return None if pd.isna(v) else float(v)
-
-        records.append(NewCreateData(
-            date=d,
-            time=t,
-            atmospheric_temperature       = _f(getattr(row, "atmospheric_temperature",       float("nan"))),
-            atmospheric_relative_humidity = _f(getattr(row, "atmospheric_relative_humidity", float("nan"))),
-            atmospheric_pressure          = _f(getattr(row, "atmospheric_pressure",          float("nan"))),
-            precipitation                 = _f(getattr(row, "precipitation",                 float("nan"))),
-            average_wind_speed            = _f(getattr(row, "average_wind_speed",            float("nan"))),
-            soil_temperature_10cm         = _f(getattr(row, "soil_temperature_10cm",         float("nan"))),
-            soil_temperature_20cm         = _f(getattr(row, "soil_temperature_20cm",         float("nan"))),
-            soil_temperature_30cm         = _f(getattr(row, "soil_temperature_30cm",         float("nan"))),
-            soil_temperature_40cm         = _f(getattr(row, "soil_temperature_40cm",         float("nan"))),
-        ))
-
-    if not records:
-        return 0
-    crud.data.batch_insert(db=db, list_of_data=records, parcel_id=parcel_id)
-    return len(records)
+    try:
+        # strings throughout; each column is parsed as a whole in _upload_chunk_to_frame
+        yield from pd.read_csv(file, dtype=str, chunksize=chunk_size)
+    except (pd.errors.ParserError, UnicodeDecodeError) as e:
+        raise ValueError("cannot read CSV: {}".format(e))
+    except pd.errors.EmptyDataError:
+        return
+
+
+def _as_text(values: pd.Series, fmt: str) -> pd.Series:
+    if pd.api.types.is_datetime64_any_dtype(values):
+        return values.dt.strftime(fmt)
+    return values.astype(str)
+
+
+def _upload_chunk_to_frame(chunk: pd.DataFrame) -> pd.DataFrame:
+    """The chunk's valid rows as a bulk_write frame: a "date" timestamp and the Data value columns."""
+    missing = {"date", "time"} - set(chunk.columns)
+    if missing:
+        raise ValueError("missing column(s): {}".format(", ".join(sorted(missing))))
+
+    stamps = pd.to_datetime(
+        _as_text(chunk["date"], "%Y-%m-%d") + " " + _as_text(chunk["time"], "%H:%M:%S"),
+        format="%Y-%m-%d %H:%M:%S", errors="coerce",
+    )
+    valid = stamps.notna()
+    frame = pd.DataFrame({"date": stamps})
+    for name in chunk.columns:
+        if name not in Data.__table__.c or name in ("id", "parcel_id", "date", "time"):
+            continue
+        values = chunk[name]
+        if isinstance(Data.__table__.c[name].type, Float):
+            parsed = pd.to_numeric(values, errors="coerce")
+            # a reading that is present but not a number invalidates its row
+            valid &= parsed.notna() | values.isna()
+            frame[name] = parsed
+        else:
+            frame[name] = values.astype(object).where(values.notna(), None)
+    return frame[valid.to_numpy()].reset_index(drop=True)
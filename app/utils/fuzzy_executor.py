@@ -0,0 +1,258 @@
+"""
+Process-pool execution of fuzzy scoring
+
+Fuzzy scoring is CPU-bound pandas/numpy work; run in the request thread it
+holds the GIL, so concurrent requests (and the cheap CRUD endpoints sharing
+the threadpool) serialise behind it. With settings.FUZZY_PROCESS_WORKERS > 0,
+fuzzy_risk.score_threat_models hands large jobs to this module, which splits
+them into (threat model group, season range) partitions and scores each one
+in a worker process. The weather columns travel through one shared-memory
+block; only the compiled models and the scored arrays are pickled.
+
+Partitions reproduce the single-pass result: each season range carries
+enough preceding days for the rolling windows and for any humidity streak
+running into it, cumulative GDD restarts at every season anyway (only the
+first range gets the caller's gdd_seed), and the annual GDD reference is
+estimated once over the whole frame and passed to every partition.
+"""
+
+from __future__ import annotations
+
+import sys
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import replace
+from multiprocessing import shared_memory
+from typing import Any, Optional
+
+import numpy as np
+import pandas as pd
+
+from core.config import settings
+from utils.custom_logger import get_logger
+from utils.fuzzy_risk import (
+    CompiledThreatModel,
+    FeaturePlan,
+    _gdd_season_key,
+    _run_lengths,
+    _score_threat_models_inline,
+    _season_bounds,
+    compute_features,
+    plan_features,
+)
+
+logger = get_logger(api_path_name=__name__)
+
+_WEATHER_COLUMNS = ("temp_max", "temp_min", "humidity", "rainfall")
+
+_executor: Optional[ProcessPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+
+def get_executor() -> Optional[ProcessPoolExecutor]:
+    """Process-wide pool, created on first use; None when disabled."""
+    global _executor
+    if settings.FUZZY_PROCESS_WORKERS <= 0:
+        return None
+    with _executor_lock:
+        if _executor is None:
+            _executor = ProcessPoolExecutor(max_workers=settings.FUZZY_PROCESS_WORKERS)
+        return _executor
+
+
+def shutdown_executor() -> None:
+    global _executor
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown(wait=True, cancel_futures=True)
+            _executor = None
+
+
+def should_partition(weather_df: pd.DataFrame, threat_models: list[Any]) -> bool:
+    """True when the pool is enabled and the job is big enough to pay for it.
+
+    Frames carrying columns beyond the raw weather (e.g. precomputed
+    gdd_cum_*) are always scored inline, since only the raw columns are
+    shared with the workers.
+    """
+    if settings.FUZZY_PROCESS_WORKERS <= 0:
+        return False
+    if set(weather_df.columns) - {"date", *_WEATHER_COLUMNS}:
+        return False
+    return len(weather_df) * len(threat_models) >= settings.FUZZY_PROCESS_MIN_MODEL_DAYS
+
+
+def score_partitioned(
+    weather_df:     pd.DataFrame,
+    threat_models:  list[CompiledThreatModel],
+    gdd_seed:       Optional[dict[str, float]] = None,
+    gdd_annual_ref: Optional[dict[str, float]] = None,
+) -> list[tuple[CompiledThreatModel, pd.DataFrame]]:
+    """score_threat_models over the process pool; same return value."""
+    executor = get_executor()
+    models   = [tm for tm in threat_models if tm.rules]
+    df       = weather_df.sort_values("date").reset_index(drop=True)
+    if executor is None or df.empty or not models:
+        return _score_threat_models_inline(df, threat_models, gdd_seed, gdd_annual_ref)
+
+    workers = settings.FUZZY_PROCESS_WORKERS
+    plan    = plan_features(models)
+    refs    = _annual_refs(df, plan, gdd_annual_ref)
+    season  = np.asarray(
+        _gdd_season_key(pd.to_datetime(df["date"], cache=False), settings.GDD_RESET_MONTH)
+    )
+    chunks   = _season_chunks(_season_bounds(season), workers)
+    groups   = _model_groups(models, max(1, workers // len(chunks)))
+    lookback = _lookback_rows(df["humidity"].to_numpy(dtype=float), plan)
+
+    block = np.empty((len(df), 1 + len(_WEATHER_COLUMNS)))
+    block[:, 0] = pd.to_datetime(df["date"]).to_numpy().astype("datetime64[s]").astype(np.int64)
+    for i, name in enumerate(_WEATHER_COLUMNS, start=1):
+        block[:, i] = df[name].to_numpy(dtype=float)
+
+    shm = shared_memory.SharedMemory(create=True, size=block.nbytes)
+    try:
+        np.ndarray(block.shape, dtype=block.dtype, buffer=shm.buf)[:] = block
+        tasks = []
+        for lo, hi in chunks:
+            start = lo - lookback(lo)
+            for group in groups:
+                future = executor.submit(
+                    _score_partition,
+                    shm.name, block.shape, start, lo, hi,
+                    [models[i] for i in group],
+                    plan.extra_t_bases,
+                    gdd_seed if lo == 0 else None,
+                    refs,
+                )
+                tasks.append((group, future))
+        parts = [(group, future.result()) for group, future in tasks]
+    except BrokenProcessPool:
+        logger.warning("fuzzy process pool broke; scoring inline")
+        shutdown_executor()
+        return _score_threat_models_inline(df, threat_models, gdd_seed, gdd_annual_ref)
+    finally:
+        shm.close()
+        shm.unlink()
+
+    per_model: dict[int, list[dict]] = {}
+    for group, results in parts:
+        for i, arrays in zip(group, results):
+            per_model.setdefault(i, []).append(arrays)
+
+    dates = df["date"].to_numpy()
+    scored_models = []
+    for i, tm in enumerate(models):
+        arrays = per_model[i]
+        scored_models.append((tm, pd.DataFrame({
+            "date":       dates,
+            "score":      np.concatenate([a["score"] for a in arrays]),
+            "risk_class": np.concatenate([a["risk_class"] for a in arrays]),
+            "detail":     np.concatenate([a["detail"] for a in arrays]),
+        })))
+    return scored_models
+
+
+# ─── partitioning ────────────────────────────────────────────────────────────
+
+def _annual_refs(
+    df: pd.DataFrame, plan: FeaturePlan, overrides: Optional[dict[str, float]],
+) -> dict[str, float]:
+    """Annual GDD reference per label, estimated over the whole frame."""
+    labels = plan.t_bases()
+    if not labels:
+        return dict(overrides or {})
+    gdd_only = FeaturePlan(
+        windows=(), streak_thresholds=(), gdd_labels=tuple(labels),
+        extra_t_bases=plan.extra_t_bases,
+        rain_10d=False, wetness_3d=False, vpd=False, pheno=False,
+    )
+    enriched = compute_features(df, plan=gdd_only, gdd_annual_ref=overrides)
+    refs = {lb: float(enriched[f"gdd_annual_ref_{lb}"].iloc[0]) for lb in labels}
+    return {**(overrides or {}), **refs}
+
+
+def _season_chunks(bounds: list[tuple[int, int]], parts: int) -> list[tuple[int, int]]:
+    """Merge consecutive seasons into at most `parts` row ranges of similar size."""
+    parts = max(1, min(parts, len(bounds)))
+    total = bounds[-1][1]
+    chunks, lo = [], 0
+    for _, hi in bounds:
+        if hi == total or hi >= total * (len(chunks) + 1) / parts:
+            chunks.append((lo, hi))
+            lo = hi
+    return chunks
+
+
+def _model_groups(models: list[CompiledThreatModel], parts: int) -> list[list[int]]:
+    """Round-robin model indices into at most `parts` groups."""
+    parts = max(1, min(parts, len(models)))
+    return [list(range(g, len(models), parts)) for g in range(parts)]
+
+
+def _lookback_rows(humidity: np.ndarray, plan: FeaturePlan):
+    """Rows a partition starting at row lo must read before lo."""
+    window = max(
+        [*plan.windows, 10 if plan.rain_10d else 1, 7 if plan.vpd else 1,
+         3 if plan.wetness_3d else 1]
+    ) - 1
+    if plan.streak_thresholds:
+        runs = _run_lengths(humidity >= min(plan.streak_thresholds))
+    else:
+        runs = np.zeros(len(humidity), dtype=int)
+
+    def lookback(lo: int) -> int:
+        if lo == 0:
+            return 0
+        return min(lo, max(window, int(runs[lo - 1])))
+
+    return lookback
+
+
+# ─── worker side ─────────────────────────────────────────────────────────────
+
+def _attach(name: str) -> shared_memory.SharedMemory:
+    if sys.version_info >= (3, 13):
+        return shared_memory.SharedMemory(name=name, track=False)
+    return shared_memory.SharedMemory(name=name)
+
+
+def _score_partition(
+    shm_name:       str,
+    shape:          tuple[int, int],
+    start:          int,
+    keep_from:      int,
+    stop:           int,
+    models:         list[CompiledThreatModel],
+    extra_t_bases:  tuple[float, ...],
+    gdd_seed:       Optional[dict[str, float]],
+    gdd_annual_ref: dict[str, float],
+) -> list[dict[str, np.ndarray]]:
+    """Score rows [keep_from, stop) for models, reading from row start.
+
+    extra_t_bases are those of the whole job, so GDD labels resolve to the
+    same base in every group.
+    """
+    shm = _attach(shm_name)
+    try:
+        rows = np.ndarray(shape, dtype=np.float64, buffer=shm.buf)[start:stop].copy()
+    finally:
+        shm.close()
+
+    df = pd.DataFrame({
+        "date": pd.to_datetime(rows[:, 0].astype(np.int64), unit="s"),
+        **{name: rows[:, i] for i, name in enumerate(_WEATHER_COLUMNS, start=1)},
+    })
+    skip = keep_from - start
+    plan = replace(plan_features(models), extra_t_bases=extra_t_bases)
+    return [
+        {
+            "score":      scored["score"].to_numpy()[skip:],
+            "risk_class": scored["risk_class"].to_numpy()[skip:],
+            "detail":     scored["detail"].to_numpy()[skip:],
+        }
+        for _, scored in _score_threat_models_inline(
+            df, models, gdd_seed, gdd_annual_ref, plan=plan,
+        )
+    ]
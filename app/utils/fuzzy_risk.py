@@ -3,27 +3,33 @@ Fuzzy pest/disease risk engine
 
 Public API
 ──────────
-compute_features(df, extra_t_bases)  → enriched DataFrame
+compute_features(df, extra_t_bases, plan, gdd_seed, gdd_annual_ref) → enriched DataFrame
+plan_features(compiled_models)       → FeaturePlan (only the columns they read)
+score_period(enriched, rules, pest_key, pest_params) → per-day scores for one pest
+compile_threat_model(tm)             → CompiledThreatModel
+score_threat_models(weather_df, threat_models) → [(compiled model, scores)]
 calculate_fuzzy_risk(weather_df, threat_models) → results DataFrame
+
+threat_model_catalog caches compiled models per process, keyed by
+(id, updated_at); the threat model endpoints invalidate it on writes.
 """
 
 from __future__ import annotations
 
 import datetime
+import threading
 import uuid
 import warnings
+from dataclasses import dataclass, replace
 from typing import Any, List, Optional
 
 import numpy as np
-import openmeteo_requests
 import pandas as pd
-import requests_cache
 from fastapi import HTTPException
-from retry_requests import retry
 from sqlalchemy.orm import Session
 
 import crud
-from schemas.threat_model import ThreatModelDB
+from utils.custom_logger import get_logger
 from utils.custom_schemas import context as OPENAGRI_CONTEXT
 from utils.fuzzy_config import (
     FUZZY_TRANSITION_FRACTION,
@@ -38,9 +44,12 @@ from utils.fuzzy_config import (
     WETNESS_HOURS_BY_RAIN,
 )
 from core.config import settings
+from utils.openmeteo import FORECAST_URL, weather_api
 
 warnings.filterwarnings("ignore")
 
+logger = get_logger(api_path_name=__name__)
+
 _RISK_SCORE_MAP = {
     "critical": 100,
     "high":      80,
@@ -59,6 +68,10 @@ _PATHOGEN_KEYWORDS = {
 }
 
 
+def _is_pathogen(pest_key: str) -> bool:
+    return any(kw in pest_key for kw in _PATHOGEN_KEYWORDS)
+
+
 # ─────────────────────────────────────────────────────────────────────────────
 # FEATURE ENGINEERING
 # ─────────────────────────────────────────────────────────────────────────────
@@ -83,75 +96,259 @@ def _gdd_season_key(date_series: pd.Series, gdd_reset_month: int) -> pd.Series:
     return np.where(months >= gdd_reset_month, years, years - 1)
 
 
+_STREAK_THRESHOLDS = (60, 70, 80, 85, 90, 95)
+_STANDARD_T_BASES  = (0.0, 5.0, 10.0)
+
+
+@dataclass(frozen=True)
+class FeaturePlan:
+    """Which derived columns compute_features builds.
+
+    windows:           rolling windows for temp_avg/humidity/rainfall
+    streak_thresholds: humidity thresholds for streak_hum{thr}
+    gdd_labels:        GDD labels ("5b", ...) getting gdd_daily/cum/annual_ref
+    extra_t_bases:     bases beyond {0, 5, 10}; decide which base owns a label
+    """
+    windows:           tuple[int, ...]   = (3, 7, 14)
+    streak_thresholds: tuple[int, ...]   = _STREAK_THRESHOLDS
+    gdd_labels:        Optional[tuple[str, ...]] = None  # None → every label
+    extra_t_bases:     tuple[float, ...] = ()
+    rain_10d:          bool = True
+    wetness_3d:        bool = True
+    vpd:               bool = True
+    pheno:             bool = True
+
+    @classmethod
+    def full(cls, extra_t_bases: set[float] | None = None) -> "FeaturePlan":
+        return cls(extra_t_bases=tuple(sorted(extra_t_bases or ())))
+
+    def t_bases(self) -> dict[str, float]:
+        """label → base temperature; labels collide on int(t_base), lowest wins."""
+        labels: dict[str, float] = {}
+        for t_base in sorted(set(_STANDARD_T_BASES) | set(self.extra_t_bases)):
+            labels.setdefault(f"{int(t_base)}b", t_base)
+        if self.gdd_labels is None:
+            return labels
+        return {lb: tb for lb, tb in labels.items() if lb in self.gdd_labels}
+
+    def describe(self) -> str:
+        parts = [
+            "windows=" + ",".join(f"{w}d" for w in self.windows),
+            "streaks=" + ",".join(str(t) for t in self.streak_thresholds),
+            "gdd=" + ",".join(self.t_bases()),
+        ]
+        parts += [
+            name for name, on in (
+                ("rain_10d", self.rain_10d), ("wetness_3d", self.wetness_3d),
+                ("vpd", self.vpd), ("gdd_pheno", self.pheno),
+            ) if on
+        ]
+        return " ".join(parts)
+
+
+def plan_features(threat_models: list[Any]) -> FeaturePlan:
+    """Smallest FeaturePlan that score_period needs for these compiled models."""
+    windows, streaks, labels = {3}, set(), set()
+    for tm in threat_models:
+        if tm.is_pathogen:
+            windows.add(7)
+            streaks.add(70)
+        else:
+            streaks.add(60)
+        bio = tm.bio_params
+        if (
+            (bio.get("pheno_frac_lo") is not None and bio.get("pheno_frac_hi") is not None)
+            or (bio.get("pheno_lo") is not None and bio.get("pheno_hi") is not None)
+        ):
+            labels.add(f"{int(tm.t_base)}b")
+    return FeaturePlan(
+        windows=tuple(sorted(windows)),
+        streak_thresholds=tuple(sorted(streaks)),
+        gdd_labels=tuple(sorted(labels)),
+        extra_t_bases=tuple(sorted({tm.t_base for tm in threat_models})),
+        rain_10d=False,
+        wetness_3d=False,
+        vpd=False,
+        pheno=False,
+    )
+
+
+def _run_lengths(mask: np.ndarray) -> np.ndarray:
+    """Length of the current run of True values, per row and column of mask."""
+    idx = np.arange(mask.shape[0]).reshape(-1, *([1] * (mask.ndim - 1)))
+    last_break = np.maximum.accumulate(np.where(mask, -1, idx), axis=0)
+    return idx - last_break
+
+
+def _season_bounds(season: np.ndarray) -> list[tuple[int, int]]:
+    """[start, end) row ranges of each season; season is sorted by date."""
+    if len(season) == 0:
+        return []
+    breaks = np.flatnonzero(season[1:] != season[:-1]) + 1
+    starts = np.concatenate(([0], breaks))
+    ends   = np.concatenate((breaks, [len(season)]))
+    return list(zip(starts.tolist(), ends.tolist()))
+
+
 def compute_features(
     df: pd.DataFrame,
     extra_t_bases: set[float] | None = None,
+    plan: Optional[FeaturePlan] = None,
+    gdd_seed: Optional[dict[str, float]] = None,
+    gdd_annual_ref: Optional[dict[str, float]] = None,
 ) -> pd.DataFrame:
     """Enrich a raw daily weather DataFrame with derived features.
 
     Required input columns: date, temp_max, temp_min, humidity, rainfall
     extra_t_bases: additional GDD base temperatures beyond {0, 5, 10}
+    plan: restrict the output to these features (see plan_features);
+          every feature is built when omitted. Recorded in attrs["feature_plan"].
+    gdd_seed: label ("5b", ...) → season-to-date GDD through the day before
+              the first row (see utils.gdd_snapshot); added to the first
+              season's cumulative GDD so a window need not start at season start.
+    gdd_annual_ref: label → annual GDD reference to use instead of the one
+                    estimated from this frame's seasons.
+
+    Derived float features are written into one preallocated block; GDD
+    bases and humidity streak thresholds are computed as matrix operations.
     """
     gdd_reset_month = settings.GDD_RESET_MONTH
+    if plan is None:
+        plan = FeaturePlan.full(extra_t_bases)
+    elif extra_t_bases:
+        plan = replace(
+            plan, extra_t_bases=tuple(sorted(set(plan.extra_t_bases) | set(extra_t_bases)))
+        )
 
-    df = df.copy().sort_values("date").reset_index(drop=True)
-    df["temp_avg"] = (df["temp_max"] + df["temp_min"]) / 2.0
-
-    for w in [3, 7, 14]:
-        df[f"temp_avg_{w}d"] = df["temp_avg"].rolling(w, min_periods=1).mean()
-        df[f"humidity_{w}d"] = df["humidity"].rolling(w, min_periods=1).mean()
-        df[f"rainfall_{w}d"] = df["rainfall"].rolling(w, min_periods=1).sum()
-
-    df["rain_3d"]  = df["rainfall_3d"]
-    df["rain_10d"] = df["rainfall"].rolling(10, min_periods=1).sum()
-
-    df["wetness_h"]  = _wetness_hours(df["humidity"], df["rainfall"])
-    df["wetness_3d"] = df["wetness_h"].rolling(3, min_periods=1).sum()
-
-    df["season_year"] = _gdd_season_key(pd.to_datetime(df["date"]), gdd_reset_month)
-
-    _all_bases = sorted({0.0, 5.0, 10.0} | (extra_t_bases or set()))
-    for t_base in _all_bases:
-        label = f"{int(t_base)}b"
-        if f"gdd_cum_{label}" not in df.columns:
-            daily = np.maximum(0.0, df["temp_avg"] - t_base)
-            df[f"gdd_daily_{label}"] = daily
-            df[f"gdd_cum_{label}"]   = (
-                df.groupby("season_year")[f"gdd_daily_{label}"].transform("cumsum")
-            )
+    df = df.sort_values("date").reset_index(drop=True)
+    n  = len(df)
 
-    df["gdd_daily_pheno"] = np.maximum(0.0, df["temp_avg"] - PHENOLOGY_T_BASE)
-    df["gdd_cum_pheno"]   = (
-        df.groupby("season_year")["gdd_daily_pheno"].transform("cumsum")
+    temp_avg = (
+        (df["temp_max"].to_numpy(dtype=float) + df["temp_min"].to_numpy(dtype=float)) / 2.0
+    )
+    humidity = df["humidity"].to_numpy(dtype=float)
+    rainfall = df["rainfall"].to_numpy(dtype=float)
+    season   = np.asarray(
+        _gdd_season_key(pd.to_datetime(df["date"], cache=False), gdd_reset_month)
     )
 
-    for t_base in _all_bases:
-        label      = f"{int(t_base)}b"
-        col        = f"gdd_daily_{label}"
-        seasons_b  = df.groupby("season_year")[col].agg(count="count", total="sum")
-        complete_b = seasons_b[seasons_b["count"] >= 350]
-        if len(complete_b) > 0:
-            ref_b = float(complete_b["total"].mean())
-        else:
-            last_b = seasons_b.iloc[-1]
-            ref_b  = float(last_b["total"]) * (365.0 / max(int(last_b["count"]), 1))
-        df[f"gdd_annual_ref_{label}"] = ref_b
-
-    df["gdd_annual_ref"] = df["gdd_annual_ref_5b"]
-
-    _e_sat     = 0.6108 * np.exp(17.27 * df["temp_avg"] / (df["temp_avg"] + 237.3))
-    df["vpd"]  = ((1.0 - df["humidity"] / 100.0) * _e_sat).clip(lower=0.0)
-    df["vpd_3d"] = df["vpd"].rolling(3, min_periods=1).mean()
-    df["vpd_7d"] = df["vpd"].rolling(7, min_periods=1).mean()
-
-    for thr in [60, 70, 80, 85, 90, 95]:
-        count, streak = 0, []
-        for h in df["humidity"]:
-            count = count + 1 if h >= thr else 0
-            streak.append(count)
-        df[f"streak_hum{thr}"] = streak
-
-    return df
+    # Precomputed gdd_cum_{label} input columns are kept as they are.
+    labels     = plan.t_bases()
+    new_labels = [lb for lb in labels if f"gdd_cum_{lb}" not in df.columns]
+
+    float_names = ["temp_avg"]
+    for w in plan.windows:
+        float_names += [f"temp_avg_{w}d", f"humidity_{w}d", f"rainfall_{w}d"]
+    if 3 in plan.windows:
+        float_names.append("rain_3d")
+    if plan.rain_10d:
+        float_names.append("rain_10d")
+    float_names.append("wetness_h")
+    if plan.wetness_3d:
+        float_names.append("wetness_3d")
+    for lb in new_labels:
+        float_names += [f"gdd_daily_{lb}", f"gdd_cum_{lb}"]
+    if plan.pheno:
+        float_names += ["gdd_daily_pheno", "gdd_cum_pheno"]
+    float_names += [f"gdd_annual_ref_{lb}" for lb in labels]
+    if "5b" in labels:
+        float_names.append("gdd_annual_ref")
+    if plan.vpd:
+        float_names += ["vpd", "vpd_3d", "vpd_7d"]
+
+    block = np.empty((n, len(float_names)))
+    col   = {name: i for i, name in enumerate(float_names)}
+
+    def put(name: str, values) -> None:
+        block[:, col[name]] = values
+
+    put("temp_avg", temp_avg)
+    th   = pd.DataFrame({"t": temp_avg, "h": humidity})
+    rain = pd.Series(rainfall)
+    for w in plan.windows:
+        means = th.rolling(w, min_periods=1).mean().to_numpy()
+        put(f"temp_avg_{w}d", means[:, 0])
+        put(f"humidity_{w}d", means[:, 1])
+        put(f"rainfall_{w}d", rain.rolling(w, min_periods=1).sum().to_numpy())
+    if 3 in plan.windows:
+        put("rain_3d", block[:, col["rainfall_3d"]])
+    if plan.rain_10d:
+        put("rain_10d", rain.rolling(10, min_periods=1).sum().to_numpy())
+
+    wetness = _wetness_hours(df["humidity"], df["rainfall"]).to_numpy()
+    put("wetness_h", wetness)
+    if plan.wetness_3d:
+        put("wetness_3d", pd.Series(wetness).rolling(3, min_periods=1).sum().to_numpy())
+
+    # One (n × bases) matrix: every planned base plus the phenology base.
+    bases = list(labels.values()) + ([PHENOLOGY_T_BASE] if plan.pheno else [])
+    if bases:
+        daily  = np.maximum(0.0, temp_avg[:, None] - np.array(bases)[None, :])
+        valid  = ~np.isnan(daily)
+        filled = np.where(valid, daily, 0.0)
+        cum    = np.empty_like(daily)
+        bounds = _season_bounds(season)
+        counts = np.empty((len(bounds), len(bases)))
+        totals = np.empty((len(bounds), len(bases)))
+        for s, (lo, hi) in enumerate(bounds):
+            cum[lo:hi] = np.cumsum(filled[lo:hi], axis=0)
+            counts[s]  = valid[lo:hi].sum(axis=0)
+            totals[s]  = filled[lo:hi].sum(axis=0)
+        if gdd_seed and bounds:
+            lo, hi = bounds[0]
+            seed_labels = list(labels) + ([f"{int(PHENOLOGY_T_BASE)}b"] if plan.pheno else [])
+            for j, lb in enumerate(seed_labels):
+                cum[lo:hi, j] += gdd_seed.get(lb, 0.0)
+        cum[~valid] = np.nan
+
+        label_idx = {lb: j for j, lb in enumerate(labels)}
+        for lb in new_labels:
+            put(f"gdd_daily_{lb}", daily[:, label_idx[lb]])
+            put(f"gdd_cum_{lb}",   cum[:, label_idx[lb]])
+        if plan.pheno:
+            put("gdd_daily_pheno", daily[:, -1])
+            put("gdd_cum_pheno",   cum[:, -1])
+
+        complete = counts[:, 0] >= 350 if bounds else np.zeros(0, dtype=bool)
+        for lb, j in label_idx.items():
+            if complete.any():
+                ref_b = float(totals[complete, j].mean())
+            elif bounds:
+                ref_b = float(totals[-1, j]) * (365.0 / max(int(counts[-1, j]), 1))
+            else:
+                ref_b = 0.0
+            if gdd_annual_ref and lb in gdd_annual_ref:
+                ref_b = float(gdd_annual_ref[lb])
+            put(f"gdd_annual_ref_{lb}", ref_b)
+        if "5b" in labels:
+            put("gdd_annual_ref", block[:, col["gdd_annual_ref_5b"]])
+
+    if plan.vpd:
+        e_sat = 0.6108 * np.exp(17.27 * temp_avg / (temp_avg + 237.3))
+        vpd   = np.clip((1.0 - humidity / 100.0) * e_sat, 0.0, None)
+        put("vpd", vpd)
+        vpd_s = pd.Series(vpd)
+        put("vpd_3d", vpd_s.rolling(3, min_periods=1).mean().to_numpy())
+        put("vpd_7d", vpd_s.rolling(7, min_periods=1).mean().to_numpy())
+
+    thresholds = np.array(plan.streak_thresholds, dtype=float)
+    streaks    = _run_lengths(humidity[:, None] >= thresholds[None, :])
+
+    features = pd.concat(
+        [
+            pd.DataFrame(block, columns=float_names),
+            pd.DataFrame({"season_year": season}),
+            pd.DataFrame(
+                streaks.reshape(n, len(thresholds)),
+                columns=[f"streak_hum{t}" for t in plan.streak_thresholds],
+            ),
+        ],
+        axis=1,
+    )
+    kept = df.drop(columns=[c for c in features.columns if c in df.columns])
+    enriched = pd.concat([kept, features], axis=1)
+    enriched.attrs["feature_plan"] = plan.describe()
+    return enriched
 
 
 # ─────────────────────────────────────────────────────────────────────────────
@@ -272,7 +469,7 @@ def score_day(
         mu_pheno = 1.0
 
     # Weather input selection: fungi/bacteria use 7d MA; insects use daily
-    is_pathogen = any(kw in pest_key for kw in _PATHOGEN_KEYWORDS)
+    is_pathogen = _is_pathogen(pest_key)
     if is_pathogen:
         t_eff      = weather_row.get("temp_avg_7d",  weather_row["temp_avg"])
         h_eff      = weather_row.get("humidity_7d",  weather_row["humidity"])
@@ -352,6 +549,242 @@ def score_day(
     }
 
 
+# ─────────────────────────────────────────────────────────────────────────────
+# WHOLE-PERIOD SCORING
+# ─────────────────────────────────────────────────────────────────────────────
+#
+# Array counterparts of the functions above. score_day stays the reference
+# implementation; every branch below mirrors it (including NaN handling and
+# Python min() ordering) so both paths produce identical output.
+
+def _trapezoid_array(x: np.ndarray, a, b, c, d) -> np.ndarray:
+    with np.errstate(divide="ignore", invalid="ignore"):
+        left  = (x - a) / (b - a)
+        right = (d - x) / (d - c)
+    return np.select(
+        [(x <= a) | (x >= d), (b <= x) & (x <= c), (a < x) & (x < b)],
+        [0.0, 1.0, left],
+        default=right,
+    )
+
+
+def _membership_humidity_array(h: np.ndarray, lo: float, hi: float) -> np.ndarray:
+    if lo == 0.0 and hi == 100.0:
+        return np.ones(len(h))
+    width      = max(hi - lo, 5.0)
+    transition = width * FUZZY_TRANSITION_FRACTION
+    return _trapezoid_array(h, lo - transition, lo, hi, hi + transition)
+
+
+def _membership_temp_array(t: np.ndarray, lo: float, hi: float) -> np.ndarray:
+    if lo <= -900 and hi >= 900:
+        return np.ones(len(t))
+    width      = max(hi - lo, 2.0)
+    transition = max(width * FUZZY_TRANSITION_FRACTION, 1.5)
+    return _trapezoid_array(t, lo - transition, lo, hi, hi + transition)
+
+
+def _membership_rainfall_array(r_cum_3d: np.ndarray, rain_min: float) -> np.ndarray:
+    if rain_min == 0.0:
+        return np.ones(len(r_cum_3d))
+    return _trapezoid_array(r_cum_3d, rain_min * 0.4, rain_min, rain_min * 3, rain_min * 6)
+
+
+def _membership_phenology_array(gdd_now: np.ndarray, lo: np.ndarray, hi: np.ndarray) -> np.ndarray:
+    margin = (hi - lo) * PHENO_FUZZY_MARGIN_FRAC
+    with np.errstate(divide="ignore", invalid="ignore"):
+        rising  = (gdd_now - (lo - margin)) / margin
+        falling = ((hi + margin) - gdd_now) / margin
+    return np.select(
+        [
+            (lo <= gdd_now) & (gdd_now <= hi),
+            ((lo - margin) < gdd_now) & (gdd_now < lo),
+            (hi < gdd_now) & (gdd_now < (hi + margin)),
+        ],
+        [1.0, rising, falling],
+        default=0.0,
+    )
+
+
+def _py_min(*arrays: np.ndarray) -> np.ndarray:
+    """Element-wise min() with Python semantics: a NaN only wins when it comes first."""
+    out = arrays[0]
+    for arr in arrays[1:]:
+        out = np.where(arr < out, arr, out)
+    return out
+
+
+def _column(df: pd.DataFrame, *names: str, default: float = 0.0) -> np.ndarray:
+    """First existing column among names as float64, else a constant array."""
+    for name in names:
+        if name in df.columns:
+            return df[name].to_numpy(dtype=float)
+    return np.full(len(df), default, dtype=float)
+
+
+def score_period(
+    enriched:    pd.DataFrame,
+    rules_pest:  list[dict],
+    pest_key:    str,
+    pest_params: dict,
+    is_pathogen: Optional[bool] = None,
+) -> pd.DataFrame:
+    """Mamdani fuzzy inference for one pest over every day of enriched.
+
+    Same inputs and semantics as score_day, evaluated as array operations.
+    is_pathogen: precomputed genus flag; derived from pest_key when None.
+    Returns a DataFrame (index aligned with enriched) with columns
+    score, risk_class, detail.
+    """
+    n = len(enriched)
+    t_raw = _column(enriched, "temp_avg")
+
+    # Lethal temperature gates
+    t_lethal_max_p = pest_params.get("t_lethal_max")
+    t_lethal_min_p = pest_params.get("t_lethal_min")
+    lethal_max = (
+        t_raw > float(t_lethal_max_p) if t_lethal_max_p is not None
+        else np.zeros(n, dtype=bool)
+    )
+    lethal_min = ~lethal_max & (
+        t_raw < float(t_lethal_min_p) if t_lethal_min_p is not None
+        else np.zeros(n, dtype=bool)
+    )
+    alive = ~(lethal_max | lethal_min)
+
+    # Phenological gating
+    pheno_lo = pest_params.get("pheno_lo")
+    pheno_hi = pest_params.get("pheno_hi")
+    frac_lo  = pest_params.get("pheno_frac_lo")
+    frac_hi  = pest_params.get("pheno_frac_hi")
+
+    _tb = pest_params.get("t_base")
+    t_base_pest = _tb if _tb is not None else PHENOLOGY_T_BASE
+    gdd_now = _column(enriched, f"gdd_cum_{int(t_base_pest)}b", "gdd_cum_pheno")
+    gdd_ref = _column(enriched, f"gdd_annual_ref_{int(t_base_pest)}b", "gdd_annual_ref")
+
+    use_frac = (
+        (gdd_ref > 0) if frac_lo is not None and frac_hi is not None
+        else np.zeros(n, dtype=bool)
+    )
+    has_abs  = pheno_lo is not None and pheno_hi is not None
+    has_pheno = use_frac | has_abs
+    lo_pheno = np.where(use_frac, _nf(frac_lo, 0.0) * gdd_ref, _nf(pheno_lo, np.nan))
+    hi_pheno = np.where(use_frac, _nf(frac_hi, 0.0) * gdd_ref, _nf(pheno_hi, np.nan))
+
+    mu_pheno = np.where(
+        hi_pheno >= 9000, 1.0,
+        _membership_phenology_array(gdd_now, lo_pheno, hi_pheno),
+    )
+    mu_pheno = np.where(has_pheno, mu_pheno, 1.0)
+    out_of_season = alive & has_pheno & (mu_pheno == 0.0)
+
+    # Weather input selection: fungi/bacteria use 7d MA; insects use daily
+    if is_pathogen is None:
+        is_pathogen = _is_pathogen(pest_key)
+    if is_pathogen:
+        t_eff      = _column(enriched, "temp_avg_7d", "temp_avg")
+        h_eff      = _column(enriched, "humidity_7d", "humidity")
+        streak_col = "streak_hum70"
+    else:
+        t_eff      = t_raw
+        h_eff      = _column(enriched, "humidity")
+        streak_col = "streak_hum60"
+    r_eff = _column(enriched, "rain_3d", "rainfall")
+
+    streak = (
+        enriched[streak_col].to_numpy().astype(int) if streak_col in enriched.columns
+        else np.zeros(n, dtype=int)
+    )
+
+    # Fuzzification + Mamdani AND aggregation, accumulated in rule order
+    total_mu  = np.zeros(n)
+    total_mus = np.zeros(n)
+    best_mu   = np.full(n, -np.inf)
+    best_idx  = np.zeros(n, dtype=int)
+    for i, rule in enumerate(rules_pest):
+        mu = _py_min(
+            _membership_temp_array(t_eff, rule["temp_lo"], rule["temp_hi"]),
+            _membership_humidity_array(h_eff, rule["hum_lo"], rule["hum_hi"]),
+            _membership_rainfall_array(r_eff, rule["rain_min"]),
+        )
+        active     = mu > FUZZY_MIN_MU
+        total_mu   = total_mu + np.where(active, mu, 0.0)
+        total_mus  = total_mus + np.where(active, mu * rule["risk_score"], 0.0)
+        better     = active & (mu > best_mu)
+        best_mu    = np.where(better, mu, best_mu)
+        best_idx   = np.where(better, i, best_idx)
+
+    any_active = best_mu > -np.inf
+    scored     = alive & ~out_of_season & any_active
+
+    # Weighted defuzzification
+    with np.errstate(divide="ignore", invalid="ignore"):
+        score = np.where(scored, total_mus / total_mu, 0.0)
+
+    # Streak penalty
+    min_streak = pest_params.get("min_streak") or 1
+    if min_streak >= 2:
+        streak_factor = streak / max(min_streak, 1)
+    else:
+        streak_factor = np.maximum(STREAK_MIN_FACTOR, streak / max(min_streak, 1))
+    score = np.where(streak < min_streak, score * streak_factor, score)
+
+    # Mills-type leaf-wetness gate
+    wh          = _column(enriched, "wetness_h")
+    min_wh_crit = pest_params.get("min_wetness_hours_critical")
+    min_wh_high = pest_params.get("min_wetness_hours_high")
+
+    if min_wh_crit is not None and isinstance(min_wh_crit, (int, float)):
+        capped = (score >= RISK_THRESHOLD_CRITICAL) & (wh < float(min_wh_crit))
+        score  = np.where(capped, np.minimum(score, float(RISK_THRESHOLD_CRITICAL) - 0.1), score)
+
+    if min_wh_high is not None and isinstance(min_wh_high, (int, float)):
+        capped = (score >= RISK_THRESHOLD_HIGH) & (wh < float(min_wh_high))
+        score  = np.where(capped, np.minimum(score, float(RISK_THRESHOLD_HIGH) - 0.1), score)
+
+    # Phenological scaling; Python round() keeps parity with score_day
+    scaled = (score * mu_pheno).tolist()
+    final  = np.array([
+        min(100.0, round(v, 1)) if s else 0.0
+        for v, s in zip(scaled, scored.tolist())
+    ], dtype=float)
+
+    risk_class = np.select(
+        [
+            lethal_max | lethal_min,
+            out_of_season,
+            final >= RISK_THRESHOLD_CRITICAL,
+            final >= RISK_THRESHOLD_HIGH,
+            final >= RISK_THRESHOLD_MODERATE,
+        ],
+        ["Low", "Out of season", "Critical", "High", "Moderate"],
+        default="Low",
+    )
+
+    # Detail strings are the only per-day Python work left
+    labels = [rule["risk"] for rule in rules_pest]
+    detail = np.full(n, "no active rules", dtype=object)
+    for i in np.flatnonzero(lethal_max):
+        detail[i] = f"T={t_raw[i]:.1f}°C > t_lethal_max={t_lethal_max_p}°C"
+    for i in np.flatnonzero(lethal_min):
+        detail[i] = f"T={t_raw[i]:.1f}°C < t_lethal_min={t_lethal_min_p}°C"
+    for i in np.flatnonzero(out_of_season):
+        lo_i = lo_pheno[i] if use_frac[i] else pheno_lo
+        hi_i = hi_pheno[i] if use_frac[i] else pheno_hi
+        detail[i] = f"GDD={gdd_now[i]:.0f} outside [{lo_i:.0f},{hi_i:.0f}]"
+    for i in np.flatnonzero(scored):
+        detail[i] = (
+            f"best_rule={labels[best_idx[i]]} mu={best_mu[i]:.2f} "
+            f"mu_pheno={mu_pheno[i]:.2f} streak={int(streak[i])}d wh={wh[i]:.0f}h"
+        )
+
+    return pd.DataFrame(
+        {"score": final, "risk_class": risk_class, "detail": detail},
+        index=enriched.index,
+    )
+
+
 # ─────────────────────────────────────────────────────────────────────────────
 # PUBLIC ENGINE ENTRY POINT
 # ─────────────────────────────────────────────────────────────────────────────
@@ -379,103 +812,233 @@ def _definition_to_rules(definition: dict) -> list[dict]:
     return rules
 
 
-def calculate_fuzzy_risk(
-    weather_df:    pd.DataFrame,
-    threat_models: list[Any],
-) -> pd.DataFrame:
-    """Run the fuzzy risk model for all threat models over the weather period.
+# ─────────────────────────────────────────────────────────────────────────────
+# COMPILED THREAT MODELS
+# ─────────────────────────────────────────────────────────────────────────────
 
-    threat_models: objects with .scientific_name, .common_name, .definition
-                   (.definition is a dict with 'bio_params' and 'fuzzy_rules')
+@dataclass(frozen=True)
+class CompiledThreatModel:
+    """ThreatModel with its JSONB definition parsed once into scoring inputs."""
+    id:              Optional[uuid.UUID]
+    scientific_name: str
+    common_name:     str
+    version:         Any
+    bio_params:      dict
+    rules:           list[dict]
+    t_base:          float
+    is_pathogen:     bool
+
+
+def compile_threat_model(tm: Any) -> CompiledThreatModel:
+    """Parse a ThreatModel (ORM row or any object with the same attributes)."""
+    definition = tm.definition if isinstance(tm.definition, dict) else {}
+    bio_params = dict(definition.get("bio_params") or {})
+    return CompiledThreatModel(
+        id=getattr(tm, "id", None),
+        scientific_name=tm.scientific_name,
+        common_name=tm.common_name,
+        version=getattr(tm, "updated_at", None),
+        bio_params=bio_params,
+        rules=_definition_to_rules(definition),
+        t_base=_nf(bio_params.get("t_base"), 5.0),
+        is_pathogen=_is_pathogen(tm.scientific_name),
+    )
 
-    Returns DataFrame with columns:
-      date, scientific_name, common_name, risk_score, risk_class, detail
+
+class ThreatModelCatalog:
+    """Per-process cache of CompiledThreatModel keyed by threat model id.
+
+    Every resolve() compares cached entries against threat_model.updated_at
+    (an id/timestamp query, no JSONB), so edits made through another worker
+    are picked up; only new or changed rows are loaded and compiled.
     """
-    extra_t_bases = {
-        float(v if (v := (tm.definition.get("bio_params") or {}).get("t_base")) is not None else 5.0)
-        for tm in threat_models
-    }
-    enriched = compute_features(weather_df, extra_t_bases=extra_t_bases)
 
-    results = []
-    for tm in threat_models:
-        definition  = tm.definition if isinstance(tm.definition, dict) else {}
-        bio_params  = definition.get("bio_params") or {}
-        rules       = _definition_to_rules(definition)
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._entries: dict[uuid.UUID, CompiledThreatModel] = {}
+
+    def invalidate(self, tm_id: Optional[uuid.UUID] = None) -> None:
+        with self._lock:
+            if tm_id is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(tm_id, None)
+
+    def resolve(
+        self, db: Session, ids: Optional[List[uuid.UUID]] = None
+    ) -> List[CompiledThreatModel]:
+        versions = crud.threat_model.get_versions(db=db, ids=ids)
+        with self._lock:
+            stale = [
+                tid for tid, version in versions
+                if (entry := self._entries.get(tid)) is None or entry.version != version
+            ]
+        if stale:
+            compiled = [
+                compile_threat_model(tm)
+                for tm in crud.threat_model.get_by_ids(db=db, ids=stale)
+            ]
+        else:
+            compiled = []
+        with self._lock:
+            for entry in compiled:
+                self._entries[entry.id] = entry
+            if ids is None:
+                live = {tid for tid, _ in versions}
+                for tid in [t for t in self._entries if t not in live]:
+                    del self._entries[tid]
+            return [self._entries[tid] for tid, _ in versions if tid in self._entries]
+
+
+threat_model_catalog = ThreatModelCatalog()
+
+
+def score_threat_models(
+    weather_df:     pd.DataFrame,
+    threat_models:  list[Any],
+    gdd_seed:       Optional[dict[str, float]] = None,
+    gdd_annual_ref: Optional[dict[str, float]] = None,
+) -> list[tuple[CompiledThreatModel, pd.DataFrame]]:
+    """Score every threat model with rules over the weather period.
+
+    Returns (compiled model, frame with date, score, risk_class, detail)
+    pairs in the order of threat_models; models without rules are skipped.
+    Large jobs go to the process pool when settings.FUZZY_PROCESS_WORKERS
+    is set (see utils.fuzzy_executor).
+    """
+    from utils import fuzzy_executor
 
-        if not rules:
+    compiled = [
+        tm if isinstance(tm, CompiledThreatModel) else compile_threat_model(tm)
+        for tm in threat_models
+    ]
+    if fuzzy_executor.should_partition(weather_df, compiled):
+        return fuzzy_executor.score_partitioned(weather_df, compiled, gdd_seed, gdd_annual_ref)
+    return _score_threat_models_inline(weather_df, compiled, gdd_seed, gdd_annual_ref)
+
+
+def _score_threat_models_inline(
+    weather_df:     pd.DataFrame,
+    compiled:       list[CompiledThreatModel],
+    gdd_seed:       Optional[dict[str, float]] = None,
+    gdd_annual_ref: Optional[dict[str, float]] = None,
+    plan:           Optional[FeaturePlan] = None,
+) -> list[tuple[CompiledThreatModel, pd.DataFrame]]:
+    """score_threat_models in the calling process."""
+    if plan is None:
+        plan = plan_features(compiled)
+    logger.debug("fuzzy feature plan: %s", plan.describe())
+    enriched = compute_features(
+        weather_df, plan=plan, gdd_seed=gdd_seed, gdd_annual_ref=gdd_annual_ref,
+    )
+
+    scored_models = []
+    for tm in compiled:
+        if not tm.rules or enriched.empty:
             continue
 
-        for _, row in enriched.iterrows():
-            res = score_day(row, rules, tm.scientific_name, bio_params)
-            results.append({
-                "date":           row["date"],
-                "scientific_name": tm.scientific_name,
-                "common_name":    tm.common_name,
-                "risk_score":     res["score"],
-                "risk_class":     res["risk_class"],
-                "detail":         res["detail"],
-            })
+        scored = score_period(
+            enriched, tm.rules, tm.scientific_name, tm.bio_params, tm.is_pathogen
+        )
+        scored.insert(0, "date", enriched["date"].to_numpy())
+        scored_models.append((tm, scored))
+    return scored_models
+
 
-    return pd.DataFrame(results)
+def calculate_fuzzy_risk(
+    weather_df:     pd.DataFrame,
+    threat_models:  list[Any],
+    gdd_seed:       Optional[dict[str, float]] = None,
+    gdd_annual_ref: Optional[dict[str, float]] = None,
+) -> pd.DataFrame:
+    """Run the fuzzy risk model for all threat models over the weather period.
+
+    threat_models:  CompiledThreatModel instances, or objects with
+                    .scientific_name, .common_name, .definition (a dict with
+                    'bio_params' and 'fuzzy_rules') which are compiled here
+    gdd_seed:       season-to-date GDD before the first day, per label
+                    (utils.gdd_snapshot.gdd_seed_for_window)
+    gdd_annual_ref: annual GDD reference per label, overriding the one
+                    estimated from the weather period (utils.gdd_snapshot)
+
+    Returns DataFrame with columns:
+      date, scientific_name, common_name, risk_score, risk_class, detail
+    """
+    results = [
+        pd.DataFrame({
+            "date":            scored["date"].to_numpy(),
+            "scientific_name": tm.scientific_name,
+            "common_name":     tm.common_name,
+            "risk_score":      scored["score"].to_numpy(),
+            "risk_class":      scored["risk_class"].to_numpy(),
+            "detail":          scored["detail"].to_numpy(),
+        })
+        for tm, scored in score_threat_models(
+            weather_df, threat_models, gdd_seed=gdd_seed, gdd_annual_ref=gdd_annual_ref,
+        )
+    ]
+    if not results:
+        return pd.DataFrame()
+    return pd.concat(results, ignore_index=True)
 
 
 # ─── endpoint helpers ────────────────────────────────────────────────────────
 
-def _weather_rows_to_daily_df(rows) -> pd.DataFrame:
-    """Aggregate DB hourly rows to one row per calendar day."""
+def _data_daily_to_daily_df(rows) -> pd.DataFrame:
+    """Daily frame from data_daily rollup rows; days without temperature are skipped."""
+    rows = [r for r in rows if r.temp_min is not None and r.temp_max is not None]
     if not rows:
         return pd.DataFrame(columns=["date", "temp_max", "temp_min", "humidity", "rainfall"])
-    records = [
-        {
-            "date":     r.date,
-            "temp":     r.atmospheric_temperature,
-            "humidity": r.atmospheric_relative_humidity,
-            "rainfall": r.precipitation or 0.0,
-        }
-        for r in rows
-        if r.atmospheric_temperature is not None
-    ]
-    if not records:
-        return pd.DataFrame(columns=["date", "temp_max", "temp_min", "humidity", "rainfall"])
-    df = pd.DataFrame(records)
-    daily = df.groupby("date").agg(
-        temp_max=("temp", "max"),
-        temp_min=("temp", "min"),
-        humidity=("humidity", "mean"),
-        rainfall=("rainfall", "sum"),
-    ).reset_index()
-    daily["date"] = pd.to_datetime(daily["date"])
-    return daily.sort_values("date").reset_index(drop=True)
+    return pd.DataFrame({
+        "date":     pd.to_datetime([r.date for r in rows]),
+        "temp_max": np.array([r.temp_max for r in rows], dtype=float),
+        "temp_min": np.array([r.temp_min for r in rows], dtype=float),
+        "humidity": np.array([r.humidity_mean for r in rows], dtype=float),
+        "rainfall": np.array([r.precipitation_sum or 0.0 for r in rows], dtype=float),
+    })
 
 
 def _openmeteo_to_daily_df(latitude: float, longitude: float, days_ahead: int) -> pd.DataFrame:
     """Fetch hourly forecast from OpenMeteo and aggregate to daily."""
+    return _openmeteo_to_daily_dfs([(latitude, longitude)], days_ahead)[0]
+
+
+def _openmeteo_to_daily_dfs(
+    locations: list[tuple[float, float]], days_ahead: int,
+) -> list[pd.DataFrame]:
+    """Daily forecast frames for several (lat, lon) pairs in one OpenMeteo call.
+
+    OpenMeteo answers latitude/longitude lists with one response per
+    location, in request order; the returned frames follow that order.
+    """
     if days_ahead < settings.OPEN_METEO_MIN_FORECAST_DAYS:
         days_ahead = settings.OPEN_METEO_MIN_FORECAST_DAYS
     if days_ahead > settings.OPEN_METEO_MAX_FORECAST_DAYS:
         days_ahead = settings.OPEN_METEO_MAX_FORECAST_DAYS
 
-    cache_sess = requests_cache.CachedSession(".cache", expire_after=3600)
-    retry_sess = retry(cache_sess, retries=3, backoff_factor=0.2)
-    client     = openmeteo_requests.Client(session=retry_sess)
-
     try:
-        responses = client.weather_api(
-            "https://api.open-meteo.com/v1/forecast",
+        responses = weather_api(
+            FORECAST_URL,
             params={
-                "latitude":      latitude,
-                "longitude":     longitude,
+                "latitude":      [lat for lat, _ in locations],
+                "longitude":     [lon for _, lon in locations],
                 "hourly":        ["temperature_2m", "relative_humidity_2m", "precipitation"],
                 "forecast_days": days_ahead,
             },
         )
     except Exception as e:
         raise HTTPException(status_code=502, detail=f"OpenMeteo error: {e}")
-    finally:
-        client.session.close()
 
-    hourly = responses[0].Hourly()
+    if len(responses) != len(locations):
+        raise HTTPException(
+            status_code=502,
+            detail=f"OpenMeteo returned {len(responses)} locations, expected {len(locations)}",
+        )
+    return [_openmeteo_response_to_daily(response) for response in responses]
+
+
+def _openmeteo_response_to_daily(response) -> pd.DataFrame:
+    hourly = response.Hourly()
     dates  = pd.date_range(
         start=pd.to_datetime(hourly.Time(),    unit="s", utc=True),
         end=pd.to_datetime(hourly.TimeEnd(),   unit="s", utc=True),
@@ -576,12 +1139,11 @@ def _format_results(results_df: pd.DataFrame, parcel, fmt: str) -> dict | list:
 
 def _resolve_threat_models(
     db: Session, threat_model_ids: Optional[List[uuid.UUID]]
-) -> List[ThreatModelDB]:
+) -> List[CompiledThreatModel]:
     if threat_model_ids:
-        models = [crud.threat_model.get(db=db, id=tid) for tid in threat_model_ids]
-        missing = [str(tid) for tm, tid in zip(models, threat_model_ids) if tm is None]
+        by_id = {tm.id: tm for tm in threat_model_catalog.resolve(db, threat_model_ids)}
+        missing = [str(tid) for tid in threat_model_ids if tid not in by_id]
         if missing:
             raise HTTPException(status_code=404, detail=f"ThreatModels not found: {missing}")
-    else:
-        models = crud.threat_model.get_multi(db=db, limit=10000)
-    return [ThreatModelDB.model_validate(tm) for tm in models]
+        return [by_id[tid] for tid in threat_model_ids]
+    return threat_model_catalog.resolve(db)
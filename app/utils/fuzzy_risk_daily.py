@@ -0,0 +1,224 @@
+"""
+Materialized daily fuzzy risk (fuzzy_risk_daily table)
+
+The nightly ingestion job scores the trailing window it touched and stores
+one row per (parcel, threat model, model version, day). /fuzzy-risk/calculate/
+serves those rows and scores live only the days a model has no row for.
+Every weather write goes through gdd_snapshot.refresh_after_ingest, which
+drops the rows from the first written day on; the backfill job
+(jobs.background_tasks.backfill_fuzzy_risk) materializes such gaps again.
+
+model_version is the threat model's updated_at, so editing a model makes
+its old rows invisible without deleting them.
+"""
+
+from __future__ import annotations
+
+import datetime
+from typing import Any, List, Optional, Tuple
+
+import pandas as pd
+from sqlalchemy.orm import Session
+
+import crud
+from utils.fuzzy_risk import (
+    CompiledThreatModel,
+    _data_daily_to_daily_df,
+    score_threat_models,
+    threat_model_catalog,
+)
+from utils.gdd_snapshot import gdd_annual_refs, gdd_seed_for_window
+
+# Longest rolling window compute_features uses; earlier days only feed the
+# cumulative GDD, which comes from gdd_snapshot instead.
+FUZZY_MATERIALIZE_LOOKBACK_DAYS = 14
+
+
+def materialize_fuzzy_risk(
+    db: Session,
+    parcel_id: int,
+    from_date: datetime.date,
+    to_date: Optional[datetime.date] = None,
+    threat_models: Optional[List[CompiledThreatModel]] = None,
+) -> int:
+    """Recompute and store fuzzy risk for days >= from_date.
+
+    Reads the data_daily rollup from FUZZY_MATERIALIZE_LOOKBACK_DAYS before
+    from_date, seeds cumulative GDD from the snapshots, and upserts one row
+    per model and day. Returns the number of rows written.
+    """
+    if threat_models is None:
+        threat_models = threat_model_catalog.resolve(db)
+    threat_models = [tm for tm in threat_models if tm.id is not None and tm.version is not None]
+    if not threat_models:
+        return 0
+
+    read_from = from_date - datetime.timedelta(days=FUZZY_MATERIALIZE_LOOKBACK_DAYS)
+    daily_df = _data_daily_to_daily_df(
+        crud.data_daily.get_range(db=db, parcel_id=parcel_id, start=read_from, end=to_date)
+    )
+    if daily_df.empty:
+        return 0
+
+    seed = gdd_seed_for_window(db, parcel_id, daily_df["date"].min(), threat_models)
+    refs = gdd_annual_refs(db, parcel_id, threat_models)
+
+    keep = (daily_df["date"] >= pd.Timestamp(from_date)).to_numpy()
+    out  = []
+    for tm, scored in score_threat_models(daily_df, threat_models, gdd_seed=seed, gdd_annual_ref=refs):
+        scored = scored[keep]
+        out.extend(
+            {
+                "parcel_id":       parcel_id,
+                "threat_model_id": tm.id,
+                "model_version":   tm.version,
+                "date":            day.date(),
+                "risk_score":      float(score),
+                "risk_class":      risk_class,
+                "detail":          detail,
+            }
+            for day, score, risk_class, detail in zip(
+                pd.to_datetime(scored["date"]), scored["score"],
+                scored["risk_class"], scored["detail"],
+            )
+        )
+    return crud.fuzzy_risk_daily.upsert(db=db, rows=out)
+
+
+def materialize_missing_fuzzy_risk(
+    db: Session,
+    parcel_id: int,
+    start: datetime.date,
+    end: datetime.date,
+    threat_models: Optional[List[CompiledThreatModel]] = None,
+) -> int:
+    """Materialize the days of [start, end] with stored weather but no row of
+    the model's current version: gaps left by ingests, weather backfills and
+    threat model edits. Rescores from the first missing day on, only for the
+    models missing something. Returns the number of rows written.
+    """
+    if threat_models is None:
+        threat_models = threat_model_catalog.resolve(db)
+    threat_models = [tm for tm in threat_models if tm.id is not None and tm.version is not None]
+    _, missing = _split_stored(db, parcel_id, threat_models, start, end)
+    if not missing:
+        return 0
+    return materialize_fuzzy_risk(
+        db, parcel_id, min(days[0] for _, days in missing), to_date=end,
+        threat_models=[tm for tm, _ in missing],
+    )
+
+
+def load_materialized_risk(
+    db: Session,
+    parcel_id: int,
+    threat_models: List[CompiledThreatModel],
+    start: datetime.date,
+    end: datetime.date,
+) -> Tuple[pd.DataFrame, List[Tuple[CompiledThreatModel, List[datetime.date]]]]:
+    """Stored results of [start, end] and the days still to be scored live.
+
+    Rows of a model's current version are served as they are; the days with
+    stored weather but no such row are returned per model, for
+    score_missing_days. Returns (results frame in calculate_fuzzy_risk
+    layout, [(model, missing days)]); both are empty without stored weather.
+    """
+    by_model, missing = _split_stored(db, parcel_id, threat_models, start, end)
+    frames = []
+    for tm in threat_models:
+        stored = by_model.get(tm.id) if tm.id is not None else None
+        if stored:
+            frames.append(_results_frame(
+                tm, [r.date for r in stored], [r.risk_score for r in stored],
+                [r.risk_class for r in stored], [r.detail for r in stored],
+            ))
+    results = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+    return results, missing
+
+
+def score_missing_days(
+    db: Session,
+    parcel_id: int,
+    missing: List[Tuple[CompiledThreatModel, List[datetime.date]]],
+) -> pd.DataFrame:
+    """Score the missing days of load_materialized_risk live.
+
+    Missing days closer than FUZZY_MATERIALIZE_LOOKBACK_DAYS are read as one
+    span; each span is read with the same lookback and GDD seeding as
+    materialize_fuzzy_risk, so live days match the stored ones next to them.
+    Returns the scored days only, in calculate_fuzzy_risk layout.
+    """
+    spans: list[list[datetime.date]] = []
+    for day in sorted({day for _, days in missing for day in days}):
+        if spans and (day - spans[-1][1]).days <= FUZZY_MATERIALIZE_LOOKBACK_DAYS:
+            spans[-1][1] = day
+        else:
+            spans.append([day, day])
+
+    frames = []
+    for span_start, span_end in spans:
+        wanted = [
+            (tm, {day for day in days if span_start <= day <= span_end})
+            for tm, days in missing
+        ]
+        wanted = [(tm, days) for tm, days in wanted if days]
+        read_from = span_start - datetime.timedelta(days=FUZZY_MATERIALIZE_LOOKBACK_DAYS)
+        daily_df = _data_daily_to_daily_df(
+            crud.data_daily.get_range(db=db, parcel_id=parcel_id, start=read_from, end=span_end)
+        )
+        if daily_df.empty:
+            continue
+
+        models = [tm for tm, _ in wanted]
+        seed = gdd_seed_for_window(db, parcel_id, daily_df["date"].min(), models)
+        refs = gdd_annual_refs(db, parcel_id, models)
+        # score_threat_models keeps the order of its input and skips models without rules
+        scored_models = score_threat_models(daily_df, models, gdd_seed=seed, gdd_annual_ref=refs)
+        for (tm, days), (_, scored) in zip([w for w in wanted if w[0].rules], scored_models):
+            scored = scored[pd.to_datetime(scored["date"]).dt.date.isin(days).to_numpy()]
+            frames.append(_results_frame(
+                tm, scored["date"], scored["score"], scored["risk_class"], scored["detail"],
+            ))
+
+    return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+
+
+def _split_stored(
+    db: Session,
+    parcel_id: int,
+    threat_models: List[CompiledThreatModel],
+    start: datetime.date,
+    end: datetime.date,
+) -> Tuple[dict[Any, list], List[Tuple[CompiledThreatModel, List[datetime.date]]]]:
+    """(current-version rows per model id, [(model, days with weather but no row)])."""
+    dates = set(crud.data_daily.get_dates(db=db, parcel_id=parcel_id, start=start, end=end))
+    if not dates:
+        return {}, []
+
+    by_model: dict[Any, list] = {}
+    versions = {tm.id: tm.version for tm in threat_models if tm.id is not None and tm.version is not None}
+    if versions:
+        for row in crud.fuzzy_risk_daily.get_range(
+            db=db, parcel_id=parcel_id, threat_model_ids=versions.keys(), start=start, end=end,
+        ):
+            if row.model_version == versions[row.threat_model_id]:
+                by_model.setdefault(row.threat_model_id, []).append(row)
+
+    missing = []
+    for tm in threat_models:
+        stored = by_model.get(tm.id, []) if tm.id in versions else []
+        days = sorted(dates - {r.date for r in stored})
+        if days:
+            missing.append((tm, days))
+    return by_model, missing
+
+
+def _results_frame(tm: CompiledThreatModel, dates, scores, classes, details) -> pd.DataFrame:
+    return pd.DataFrame({
+        "date":            pd.to_datetime(list(dates)),
+        "scientific_name": tm.scientific_name,
+        "common_name":     tm.common_name,
+        "risk_score":      list(scores),
+        "risk_class":      list(classes),
+        "detail":          list(details),
+    })
@@ -18,35 +18,15 @@ logger = get_logger(api_path_name=__name__)
 
 def calculate_gdd(db: Session, parcel: Parcel, disease_models: List[Disease],
                   start: datetime.date, end: datetime.date):
-    # SQL query for the data
-    data_db = crud.data.get_data_query_by_parcel_id_and_date_interval(db=db, parcel_id=parcel.id,
-                                                                      date_from=start, date_to=end)
-
-    df = pd.read_sql(sql=data_db.statement, con=db.bind, parse_dates={"date": "%Y-%m-%d"})
-
-    df['datetime'] = pd.to_datetime(df['date'].astype(str) + ' ' + df['time'].astype(str))
-
-    # swap cols
-    cols = df.columns.tolist()
-    cols = cols[-1:] + cols[:-1]
-    df = df[cols]
-
-    df = df.drop(["date", "time", "id"], axis=1)
-    df = df.drop(["atmospheric_temperature_daily_min", "atmospheric_temperature_daily_max",
-                  "atmospheric_temperature_daily_average",
-                  "atmospheric_relative_humidity", "atmospheric_pressure", "precipitation", "average_wind_speed",
-                  "wind_direction",
-                  "wind_gust", "leaf_relative_humidity", "leaf_temperature", "leaf_wetness", "soil_temperature_10cm",
-                  "soil_temperature_20cm",
-                  "soil_temperature_30cm", "soil_temperature_40cm", "soil_temperature_50cm", "soil_temperature_60cm",
-                  "solar_irradiance_copernicus",
-                  "parcel_id"], axis=1)
-
-    try:
-        df = df.resample("1D", on="datetime").mean()
-    except AttributeError as ae:
-        logger.warning(ae)
-        return None
+    days = crud.data_daily.get_range(db=db, parcel_id=parcel.id, start=start, end=end)
+
+    # Daily mean temperature from the rollup, one row per day from the first to the last stored day
+    df = pd.DataFrame(
+        {"atmospheric_temperature": np.array([d.temp_mean for d in days], dtype=float)},
+        index=pd.DatetimeIndex([d.date for d in days]),
+    )
+    if not df.empty:
+        df = df.reindex(pd.date_range(df.index.min(), df.index.max(), freq="1D"))
 
     df["atmospheric_temperature"] = df["atmospheric_temperature"].apply(np.ceil)
 
@@ -0,0 +1,195 @@
+"""
+Persisted season-to-date GDD per parcel (gdd_snapshot table)
+
+One row per (parcel, t_base, day) holding the cumulative GDD of the season
+up to and including that day, using the same daily definition as
+fuzzy_risk.compute_features: max(0, (T_max + T_min) / 2 - t_base), reset at
+settings.GDD_RESET_MONTH. A query window starting at day D seeds its
+accumulator from the snapshot of the last day before D instead of reading
+the season's hourly rows.
+"""
+
+from __future__ import annotations
+
+import datetime
+from typing import Any, Iterable, Optional
+
+import pandas as pd
+from sqlalchemy.orm import Session
+
+import crud
+from core.config import settings
+from utils.fuzzy_risk import plan_features, threat_model_catalog
+
+GDD_SNAPSHOT_T_BASES = (0.0, 5.0, 10.0)
+
+
+def season_of(day: datetime.date, reset_month: Optional[int] = None) -> int:
+    """Season key of a day; mirrors fuzzy_risk._gdd_season_key."""
+    reset_month = settings.GDD_RESET_MONTH if reset_month is None else reset_month
+    if reset_month == 1 or day.month >= reset_month:
+        return day.year
+    return day.year - 1
+
+
+def refresh_gdd_snapshots(
+    db: Session,
+    parcel_id: int,
+    t_bases: Optional[Iterable[float]] = None,
+    from_date: Optional[datetime.date] = None,
+) -> int:
+    """Bring the parcel's snapshots up to date with its stored Data rows.
+
+    Each base is recomputed from its last snapshot day (that day may have
+    been partial), or from from_date when older rows were just backfilled.
+    Bases without any snapshot are built from the parcel's full history.
+    Returns the number of snapshot rows written.
+    """
+    bases = sorted(set(t_bases) if t_bases is not None else set(GDD_SNAPSHOT_T_BASES))
+    if not bases:
+        return 0
+
+    starts: dict[float, Optional[datetime.date]] = {}
+    for t_base in bases:
+        last = crud.gdd_snapshot.get_last(db=db, parcel_id=parcel_id, t_base=t_base)
+        if last is None:
+            starts[t_base] = None
+        elif from_date is not None:
+            starts[t_base] = min(from_date, last.date)
+        else:
+            starts[t_base] = last.date
+
+    read_from = (
+        None if any(s is None for s in starts.values()) else min(starts.values())
+    )
+    days = [
+        d for d in crud.data_daily.get_range(db=db, parcel_id=parcel_id, start=read_from)
+        if d.temp_min is not None and d.temp_max is not None
+    ]
+
+    rows = []
+    for t_base in bases:
+        start = starts[t_base]
+        seed  = (
+            crud.gdd_snapshot.get_before(db=db, parcel_id=parcel_id, t_base=t_base, date=start)
+            if start is not None else None
+        )
+        rows.extend(
+            {"parcel_id": parcel_id, "t_base": t_base, "season_year": season, "date": day, "gdd_cum": cum}
+            for day, season, cum in _accumulate(days, t_base, start, seed)
+        )
+
+    return crud.gdd_snapshot.upsert(db=db, rows=rows)
+
+
+def _accumulate(days: list, t_base: float, start: Optional[datetime.date], seed: Any):
+    """(date, season_year, gdd_cum) of the rollup days from start on, continuing from the
+    seed snapshot (None: from zero) and resetting at each new season."""
+    season, cum = (seed.season_year, seed.gdd_cum) if seed is not None else (None, 0.0)
+    for d in days:
+        if start is not None and d.date < start:
+            continue
+        day_season = season_of(d.date)
+        if day_season != season:
+            season, cum = day_season, 0.0
+        cum += max(0.0, (d.temp_max + d.temp_min) / 2.0 - t_base)
+        yield d.date, day_season, cum
+
+
+def refresh_after_ingest(db: Session, parcel_id: int, from_date: datetime.date) -> int:
+    """Post-ingest hook: rewrite from the first new day every snapshotted base
+    and every base the stored threat models read, so their seeds and annual
+    references come from snapshots.
+
+    The materialized fuzzy risk from that day on is dropped too, since it was
+    scored from the weather just written; /fuzzy-risk/calculate/ scores those
+    days live until they are materialized again.
+    """
+    crud.fuzzy_risk_daily.remove_from(db=db, parcel_id=parcel_id, start=from_date)
+    bases = (
+        set(GDD_SNAPSHOT_T_BASES)
+        | set(crud.gdd_snapshot.get_t_bases(db=db, parcel_id=parcel_id))
+        | set(plan_features(threat_model_catalog.resolve(db)).t_bases().values())
+    )
+    return refresh_gdd_snapshots(db, parcel_id, t_bases=bases, from_date=from_date)
+
+
+def gdd_seed_for_window(
+    db: Session,
+    parcel_id: int,
+    first_date: Any,
+    threat_models: list[Any],
+) -> dict[str, float]:
+    """Season-to-date GDD through the day before first_date, per GDD label.
+
+    Only the labels the compiled threat models read are seeded; the result
+    is meant for calculate_fuzzy_risk(..., gdd_seed=...). Read-only: days
+    after a base's last snapshot are accumulated in memory, the snapshots
+    themselves are only written by the ingest paths and the nightly job.
+    """
+    first_date = pd.Timestamp(first_date).date()
+    labels = plan_features(threat_models).t_bases()
+    if not labels:
+        return {}
+
+    season = season_of(first_date)
+    season_start = datetime.date(season, settings.GDD_RESET_MONTH, 1)
+    # per base: the snapshot to continue from, the first rollup day to add to it (the last
+    # snapshot day, which may have been partial) and whether the snapshots already cover
+    # the day before first_date; earlier seasons never matter to the seed
+    plans: dict[float, tuple[Any, datetime.date, bool]] = {}
+    for t_base in set(labels.values()):
+        last = crud.gdd_snapshot.get_last(db=db, parcel_id=parcel_id, t_base=t_base)
+        if last is not None and last.date >= first_date:
+            row = crud.gdd_snapshot.get_before(db=db, parcel_id=parcel_id, t_base=t_base, date=first_date)
+            plans[t_base] = (row, first_date, True)
+        elif last is not None and last.date > season_start:
+            row = crud.gdd_snapshot.get_before(db=db, parcel_id=parcel_id, t_base=t_base, date=last.date)
+            plans[t_base] = (row, last.date, False)
+        else:
+            plans[t_base] = (None, season_start, False)
+
+    starts = [start for _, start, covered in plans.values() if not covered]
+    days = []
+    if starts:
+        days = [
+            d for d in crud.data_daily.get_range(
+                db=db, parcel_id=parcel_id, start=min(starts), end=first_date - datetime.timedelta(days=1),
+            )
+            if d.temp_min is not None and d.temp_max is not None
+        ]
+
+    totals = {}
+    for t_base, (row, start, covered) in plans.items():
+        totals[t_base] = (row.season_year, row.gdd_cum) if row is not None else None
+        if not covered:
+            for _, day_season, cum in _accumulate(days, t_base, start, row):
+                totals[t_base] = (day_season, cum)
+
+    seed = {}
+    for label, t_base in labels.items():
+        if totals[t_base] is not None and totals[t_base][0] == season:
+            seed[label] = totals[t_base][1]
+    return seed
+
+
+def gdd_annual_refs(db: Session, parcel_id: int, threat_models: list[Any]) -> dict[str, float]:
+    """Annual GDD reference per label from the parcel's stored seasons.
+
+    Same rule as compute_features (mean of seasons with >= 350 days, else the
+    latest season extrapolated to 365 days), but over the whole stored
+    history rather than the request window. Reads the stored snapshots only,
+    as kept up to date by the ingest paths.
+    """
+    refs = {}
+    for label, t_base in plan_features(threat_models).t_bases().items():
+        seasons = crud.gdd_snapshot.get_season_totals(db=db, parcel_id=parcel_id, t_base=t_base)
+        if not seasons:
+            continue
+        complete = [s.total for s in seasons if s.days >= 350]
+        if complete:
+            refs[label] = float(sum(complete) / len(complete))
+        else:
+            last = seasons[-1]
+            refs[label] = float(last.total) * (365.0 / max(int(last.days), 1))
+    return refs
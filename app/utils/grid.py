@@ -0,0 +1,29 @@
+"""
+Forecast grid snapping
+
+Weather models deliver one series per grid cell, so parcels closer together
+than the grid resolution get the same forecast. Snapping coordinates to a
+cell lets callers fetch and score each cell once.
+"""
+
+from __future__ import annotations
+
+from typing import Optional, Tuple
+
+from core.config import settings
+
+
+def snap_to_grid(
+    latitude: float, longitude: float, resolution: Optional[float] = None,
+) -> Tuple[float, float]:
+    """Nearest grid point to (latitude, longitude), in degrees."""
+    resolution = settings.OPEN_METEO_GRID_RESOLUTION if resolution is None else resolution
+    if resolution <= 0:
+        return float(latitude), float(longitude)
+
+    def _snap(value: float) -> float:
+        # Round to the cell index first so floating noise in the input does
+        # not flip neighbouring parcels into different cells.
+        return round(round(float(value) / resolution) * resolution, 6)
+
+    return _snap(latitude), _snap(longitude)
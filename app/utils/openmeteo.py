@@ -0,0 +1,189 @@
+"""
+Process-wide Open-Meteo client
+
+Every fetch goes through one long-lived requests_cache session per process:
+pooled connections, retries, and an HTTP cache whose backend
+(OPEN_METEO_CACHE_BACKEND: sqlite, filesystem, redis or memory) and per-API
+TTLs come from settings. Decoded responses are also kept in a small in-memory
+LRU keyed by request, so a warm hit skips both the HTTP cache lookup and the
+flatbuffer decoding.
+"""
+
+from __future__ import annotations
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, List, Optional
+
+import numpy as np
+import requests_cache
+from openmeteo_requests.Client import OpenMeteoRequestsError
+from openmeteo_sdk.WeatherApiResponse import WeatherApiResponse
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from core.config import settings
+
+ARCHIVE_URL = "https://archive-api.open-meteo.com/v1/archive"
+FORECAST_URL = "https://api.open-meteo.com/v1/forecast"
+
+
+class DecodedHourly:
+    """The hourly block of a weather API response with its variables already decoded,
+    answering the same calls as the flatbuffer object (Time, TimeEnd, Interval,
+    Variables(i).ValuesAsNumpy())."""
+
+    def __init__(self, hourly) -> None:
+        self._time = hourly.Time()
+        self._time_end = hourly.TimeEnd()
+        self._interval = hourly.Interval()
+        self._variables = [_DecodedVariable(hourly.Variables(i)) for i in range(hourly.VariablesLength())]
+
+    def Time(self) -> int:
+        return self._time
+
+    def TimeEnd(self) -> int:
+        return self._time_end
+
+    def Interval(self) -> int:
+        return self._interval
+
+    def Variables(self, i: int) -> "_DecodedVariable":
+        return self._variables[i]
+
+    def VariablesLength(self) -> int:
+        return len(self._variables)
+
+
+class _DecodedVariable:
+    def __init__(self, variable) -> None:
+        self._values = variable.ValuesAsNumpy()
+        # shared by every hit, so nobody may write into it
+        self._values.setflags(write=False)
+
+    def ValuesAsNumpy(self) -> np.ndarray:
+        return self._values
+
+
+class DecodedResponse:
+    def __init__(self, response) -> None:
+        self._hourly = DecodedHourly(response.Hourly())
+
+    def Hourly(self) -> DecodedHourly:
+        return self._hourly
+
+
+_lock = threading.Lock()
+_session: Optional[requests_cache.CachedSession] = None
+_frames: "OrderedDict[tuple, tuple]" = OrderedDict()
+
+
+def weather_api(url: str, params: dict, expire_after: Optional[int] = None) -> List[DecodedResponse]:
+    """Hourly weather API responses for params (one per location, in request order), decoded.
+
+    expire_after (seconds, -1 = never) overrides the API's configured TTL for this call,
+    both in the HTTP cache and in the decoded LRU."""
+    ttl = _ttl(url) if expire_after is None else expire_after
+    key = _key(url, params)
+    with _lock:
+        entry = _frames.get(key)
+        if entry is not None:
+            expires, responses = entry
+            if expires is None or expires > time.monotonic():
+                _frames.move_to_end(key)
+                return responses
+            del _frames[key]
+
+    response = get_session().request(
+        "GET", url, params={**params, "format": "flatbuffers"}, expire_after=ttl
+    )
+    if response.status_code in (400, 429):
+        raise OpenMeteoRequestsError(response.json())
+    response.raise_for_status()
+    responses = [DecodedResponse(message) for message in _messages(response.content)]
+
+    if settings.OPEN_METEO_FRAME_CACHE_SIZE > 0:
+        with _lock:
+            _frames[key] = (None if ttl < 0 else time.monotonic() + ttl, responses)
+            _frames.move_to_end(key)
+            while len(_frames) > settings.OPEN_METEO_FRAME_CACHE_SIZE:
+                _frames.popitem(last=False)
+    return responses
+
+
+def get_session() -> requests_cache.CachedSession:
+    """The process's cached, pooled and retrying session, built on first use."""
+    global _session
+    with _lock:
+        if _session is None:
+            _session = _build_session()
+        return _session
+
+
+def reset() -> None:
+    """Drop the session and the decoded LRU, e.g. after changing the cache settings."""
+    global _session
+    with _lock:
+        if _session is not None:
+            _session.close()
+        _session = None
+        _frames.clear()
+
+
+def _build_session() -> requests_cache.CachedSession:
+    session = requests_cache.CachedSession(
+        backend=_backend(),
+        expire_after=settings.OPEN_METEO_FORECAST_CACHE_SECONDS,
+        urls_expire_after={
+            "archive-api.open-meteo.com": settings.OPEN_METEO_ARCHIVE_CACHE_SECONDS,
+            "api.open-meteo.com": settings.OPEN_METEO_FORECAST_CACHE_SECONDS,
+        },
+    )
+    retries = Retry(total=5, read=5, connect=5, backoff_factor=0.2,
+                    status_forcelist=(500, 502, 504), allowed_methods=None)
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=settings.OPEN_METEO_POOL_SIZE, max_retries=retries)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+def _backend():
+    backend = settings.OPEN_METEO_CACHE_BACKEND
+    name = settings.OPEN_METEO_CACHE_NAME
+    if backend == "sqlite":
+        # WAL lets readers in other workers proceed while one writes
+        return requests_cache.SQLiteCache(name, wal=True)
+    if backend == "filesystem":
+        return requests_cache.FileCache(name)
+    if backend == "redis":
+        try:
+            from redis import Redis
+        except ImportError:
+            raise ImportError("OPEN_METEO_CACHE_BACKEND=redis needs the redis package installed")
+        return requests_cache.RedisCache(name, connection=Redis.from_url(settings.OPEN_METEO_REDIS_URL))
+    if backend == "memory":
+        return requests_cache.BaseCache()
+    raise ValueError("Unknown OPEN_METEO_CACHE_BACKEND: {}".format(backend))
+
+
+def _ttl(url: str) -> int:
+    if url.startswith(ARCHIVE_URL):
+        return settings.OPEN_METEO_ARCHIVE_CACHE_SECONDS
+    return settings.OPEN_METEO_FORECAST_CACHE_SECONDS
+
+
+def _key(url: str, params: dict) -> tuple:
+    def freeze(value: Any):
+        return tuple(freeze(v) for v in value) if isinstance(value, (list, tuple)) else str(value)
+    return url, tuple(sorted((name, freeze(value)) for name, value in params.items()))
+
+
+def _messages(data: bytes) -> List[WeatherApiResponse]:
+    """Length-prefixed flatbuffer messages of a response body, as openmeteo_requests.Client reads them."""
+    messages, pos = [], 0
+    while pos < len(data):
+        length = int.from_bytes(data[pos:pos + 4], byteorder="little")
+        messages.append(WeatherApiResponse.GetRootAs(data, pos + 4))
+        pos += length + 4
+    return messages
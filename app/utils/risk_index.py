@@ -1,6 +1,7 @@
 import datetime
 from typing import List, Optional
 
+import numpy as np
 from pandas import DataFrame
 from sqlalchemy.orm import Session
 import pandas as pd
@@ -9,8 +10,10 @@ import crud
 import utils
 import uuid
 
-from models import PestModel, Parcel
-from .wdutils import openmeteo_friendly_variables
+from core.config import settings
+from models import Data, PestModel, Parcel
+from .rule_compiler import pest_rule_cache
+from .wdutils import convert_weather_service_hourly_weather_data_to_dataframe, openmeteo_friendly_variables
 
 prob_values = {
     "low": 1,
@@ -18,41 +21,52 @@ prob_values = {
     "high": 3
 }
 
-def calculate_risk_index_probability(db: Session, parcel: Parcel, pest_models: List[PestModel],
-                                     from_date: datetime.date, to_date:datetime.date,
-                                     parameter: Optional[str] = None):
-    # SQL query for the data
-    data_db = crud.data.get_data_query_by_parcel_id_and_date_interval(db=db, parcel_id=parcel.id,
-                                                                      date_from=from_date, date_to=to_date)
-
-    df = pd.read_sql(sql=data_db.statement, con=db.bind, parse_dates={"date": "%Y-%m-%d"})
-
-    # Calculate the risks associated with each pest_model
-    for pm in pest_models:
-        risks_for_current_pm = ["Low"] * df.shape[0]
 
-        for rule in pm.rules:
-            final_str = "(x['{}'] {} {})".format(rule.conditions[0].unit.name, rule.conditions[0].operator.symbol, float(rule.conditions[0].value))
-            for cond in rule.conditions[1:]:
-                final_str = final_str + " & " + "(x['{}'] {} {})".format(cond.unit.name, cond.operator.symbol, float(cond.value))
+def _format_time(seconds: np.timedelta64) -> str:
+    """HH:MM:SS of a time-of-day offset, as str(datetime.time) prints it."""
+    if np.isnat(seconds):
+        return "None"
+    hours, rest = divmod(int(seconds / np.timedelta64(1, "s")), 3600)
+    return "{:02d}:{:02d}:{:02d}".format(hours, *divmod(rest, 60))
 
-            df_with_risk = df.assign(risk=eval("lambda x: {}".format(final_str)))
 
-            # With this, only one rule should only ever fire for one singular date/time weather data point.
-            # If multiple rules turn up as valid (both are true), then the last one from the db is going to have its
-            # prob. value written as a final response for this pest model
-            risks_for_current_pm = [rule.probability_value if x else y for x, y in zip(df_with_risk["risk"], risks_for_current_pm)]
-
-        df["{}".format(pm.name)] = risks_for_current_pm
+def calculate_risk_index_probability(db: Session, parcel: Parcel, pest_models: List[PestModel],
+                                     from_date: datetime.date, to_date:datetime.date,
+                                     parameter: Optional[str] = None, pushdown: Optional[bool] = None):
+    if pushdown is None:
+        pushdown = settings.RISK_INDEX_SQL_PUSHDOWN
+
+    compiled_models = [pest_rule_cache.get(pm) for pm in pest_models]
+    data_columns = Data.__table__.c
+
+    if pushdown and all(unit in data_columns for cm in compiled_models for unit in cm.units()):
+        # Postgres evaluates the rules as one CASE per model and returns (date, time, risk) only
+        risks_per_model = [
+            crud.data.get_risk_rows(db=db, parcel_id=parcel.id, date_from=from_date, date_to=to_date,
+                                    risk=cm.sql_case, only=parameter)
+            for cm in compiled_models
+        ]
+    else:
+        columns = crud.data.get_weather_columns(
+            db=db, parcel_id=parcel.id, date_from=from_date, date_to=to_date,
+            columns=sorted(set().union(*(cm.units() for cm in compiled_models))),
+        )
+        n = columns["date"].shape[0]
+        dates = np.datetime_as_string(columns["date"], unit="D")
+        times = [_format_time(t) for t in columns["time"]]
+
+        # Calculate the risks associated with each pest_model
+        # If multiple rules are valid for one date/time weather data point, the last one from the db wins
+        risks_per_model = [zip(dates, times, cm.last_match(columns, n=n)) for cm in compiled_models]
 
     context = utils.context
 
     graph = []
 
-    for pm in pest_models:
+    for pm, risks in zip(pest_models, risks_per_model):
 
         calculated_risks = []
-        for date, time, risk in zip(df["date"], df["time"], df["{}".format(pm.name)]):
+        for date, time, risk in risks:
 
             if parameter and risk != parameter:
                 continue
@@ -119,55 +133,30 @@ def calculate_risk_index_probability_wd(
         lon: float,
         parameter: Optional[str] = None
 ):
+    compiled_models = [pest_rule_cache.get(pm) for pm in pest_models]
+    hourly = convert_weather_service_hourly_weather_data_to_dataframe(
+        weather_data, units=set().union(*(cm.units() for cm in compiled_models)),
+    )
+
     graph = []
 
-    for pm in pest_models:
-        calculated_risks = []
+    for pm, compiled in zip(pest_models, compiled_models):
+        # The highest probability among the rules that apply wins
+        risks = compiled.highest_match(hourly, n=hourly.shape[0], ranks=prob_values, min_value=parameter)
 
-        for hour in weather_data["data"]:
-
-            current_rule_risk_index = "low"
-            for rule in pm.rules:
-
-                # Filter, if parameter set to "high", skip low and medium ones
-                if parameter and prob_values[rule.probability_value] < prob_values[parameter]:
-                    continue
-
-                # Skip these since their calculation wouldn't meaningfully add to the current model limits
-                if rule.probability_value and prob_values[rule.probability_value] <= prob_values[current_rule_risk_index]:
-                    continue
-
-                current_rule_applies = True
-                for cond in rule.conditions:
-                    condition_applies = eval("{} {} {}".format(hour["values"][openmeteo_friendly_variables[cond.unit.name]], cond.operator.symbol, cond.value))
-                    if not condition_applies:
-                        current_rule_applies = False
-                        break
-
-                if current_rule_applies:
-                    current_rule_risk_index = rule.probability_value
-
-            if not parameter:
-                calculated_risks.append(
-                    {
-                        "@id": "urn:openagri:pestInfectationRisk:obs2:{}".format(uuid.uuid4()),
-                        "@type": ["Observation", "PestInfestationRisk"],
-                        "phenomenonTime": "{}".format(hour["timestamp"]),
-                        "hasSimpleResult": "{}".format(current_rule_risk_index)
-                    }
-                )
-                continue
+        keep = np.ones(len(risks), dtype=bool)
+        if parameter:
+            keep = pd.Series(risks).map(prob_values).to_numpy() >= prob_values[parameter]
 
-            if parameter and prob_values[current_rule_risk_index] >= prob_values[parameter]:
-                calculated_risks.append(
-                    {
-                        "@id": "urn:openagri:pestInfectationRisk:obs2:{}".format(uuid.uuid4()),
-                        "@type": ["Observation", "PestInfestationRisk"],
-                        "phenomenonTime": "{}".format(hour["timestamp"]),
-                        "hasSimpleResult": "{}".format(current_rule_risk_index)
-                    }
-                )
-                continue
+        calculated_risks = [
+            {
+                "@id": "urn:openagri:pestInfectationRisk:obs2:{}".format(uuid.uuid4()),
+                "@type": ["Observation", "PestInfestationRisk"],
+                "phenomenonTime": "{}".format(timestamp),
+                "hasSimpleResult": "{}".format(risk)
+            }
+            for timestamp, risk in zip(hourly["timestamp"][keep], risks[keep])
+        ]
 
         graph_element = {
             "@id": "urn:openagri:pestInfectationRisk:{}".format(uuid.uuid4()),
@@ -219,32 +208,9 @@ def calculate_forecast_risk_index(
     weather_data.rename(columns=reverse_dict, inplace=True)
 
     for pm in pest_models:
-        risks_for_current_pm = ["Low"] * weather_data.shape[0]
-
-        for rule in pm.rules:
-            if len(rule.conditions) == 0:
-                continue
-            final_str = "(x['{}'] {} {})".format(
-                rule.conditions[0].unit.name,
-                rule.conditions[0].operator.symbol,
-                rule.conditions[0].value,
-            )
-            for cond in rule.conditions[1:]:
-                final_str = (final_str + " & " + "(x['{}'] {} {})".format(
-                        cond.unit.name, cond.operator.symbol, cond.value
-                    )
-                )
-
-            df_with_risk = weather_data.assign(
-                risk=eval("lambda x: {}".format(final_str))
-            )
-
-            risks_for_current_pm = [
-                rule.probability_value if x else y
-                for x, y in zip(df_with_risk["risk"], risks_for_current_pm)
-            ]
-
-        weather_data["{}".format(pm.name)] = risks_for_current_pm
+        weather_data["{}".format(pm.name)] = pest_rule_cache.get(pm).last_match(
+            weather_data, n=weather_data.shape[0]
+        )
 
     context = utils.context
 
@@ -0,0 +1,300 @@
+"""
+Compiled pest model rules for the risk-index paths
+
+A Rule fires when all of its conditions (unit, operator symbol, value) hold.
+compile_pest_model turns a PestModel's rules into operator-module predicates
+so a whole weather frame is evaluated as NumPy masks, and overlapping rules
+are resolved with one np.select instead of eval'ing a lambda per rule.
+
+The endpoints resolve ids through pest_model_catalog: an LRU of compiled
+models, filled from one eager-loaded query for all misses and invalidated
+by after_flush and after_commit hooks whenever pest, rule, condition, unit
+or operator rows change in this process. pest_rule_cache serves callers that already hold
+ORM objects; its entries remember the rule signature they were built from.
+"""
+
+from __future__ import annotations
+
+import itertools
+import operator
+import threading
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Callable, Iterable, List, Mapping, Optional, Tuple
+
+import numpy as np
+from sqlalchemy import and_, case, event, literal, or_
+from sqlalchemy.sql.elements import ColumnElement
+from sqlalchemy.orm import Session
+
+import crud
+from core.config import settings
+from models import Condition, Operator, PestModel, Rule, Unit
+
+_OPERATORS: dict[str, Callable[[np.ndarray, float], np.ndarray]] = {
+    ">":  operator.gt,
+    "<":  operator.lt,
+    ">=": operator.ge,
+    "<=": operator.le,
+    "==": operator.eq,
+    "!=": operator.ne,
+}
+
+
+@dataclass(frozen=True)
+class CompiledCondition:
+    unit:   str
+    symbol: str
+    value:  float
+
+    def mask(self, columns: Mapping[str, Any]) -> np.ndarray:
+        # NaN compares False for every operator except !=, as in pandas
+        return _OPERATORS[self.symbol](np.asarray(columns[self.unit], dtype=float), self.value)
+
+
+@dataclass(frozen=True)
+class CompiledRule:
+    probability_value: Optional[str]
+    conditions:        tuple[CompiledCondition, ...]
+
+    def mask(self, columns: Mapping[str, Any]) -> np.ndarray:
+        result = self.conditions[0].mask(columns)
+        for cond in self.conditions[1:]:
+            result = result & cond.mask(columns)
+        return result
+
+
+@dataclass(frozen=True)
+class CompiledPestModel:
+    id:        Optional[uuid.UUID]
+    name:      str
+    rules:     tuple[CompiledRule, ...]
+    signature: tuple
+
+    def units(self) -> set[str]:
+        return {cond.unit for rule in self.rules for cond in rule.conditions}
+
+    def last_match(self, columns: Mapping[str, Any], n: int, default: str = "Low") -> np.ndarray:
+        """Probability per row; when several rules fire the last one wins."""
+        return _select(list(reversed(self.rules)), columns, n, default)
+
+    def sql_case(self, columns: Mapping[str, Any], default: str = "Low") -> ColumnElement:
+        """SQL CASE with the same result as last_match over table columns."""
+        whens = [
+            (and_(*(_sql_condition(columns[c.unit], c) for c in rule.conditions)),
+             literal(rule.probability_value))
+            for rule in reversed(self.rules)
+        ]
+        if not whens:
+            return literal(default)
+        return case(*whens, else_=literal(default))
+
+    def highest_match(
+        self,
+        columns: Mapping[str, Any],
+        n: int,
+        ranks: Mapping[str, int],
+        default: str = "low",
+        min_value: Optional[str] = None,
+    ) -> np.ndarray:
+        """Probability per row; the highest-ranked firing rule wins.
+
+        Rules ranked below min_value, or not above default, are ignored.
+        """
+        floor = max(ranks[default], ranks[min_value] - 1 if min_value else ranks[default])
+        rules = [r for r in self.rules if ranks.get(r.probability_value, 0) > floor]
+        rules.sort(key=lambda r: ranks[r.probability_value], reverse=True)
+        return _select(rules, columns, n, default)
+
+
+def _sql_condition(column: Any, cond: CompiledCondition) -> ColumnElement:
+    clause = _OPERATORS[cond.symbol](column, cond.value)
+    if cond.symbol == "!=":
+        # pandas: NaN != v is True; SQL: NULL <> v is NULL
+        clause = or_(clause, column.is_(None))
+    return clause
+
+
+def _select(
+    rules: list[CompiledRule], columns: Mapping[str, Any], n: int, default: str,
+) -> np.ndarray:
+    """Object array of the first firing rule's probability per row."""
+    if not rules:
+        return np.full(n, default, dtype=object)
+    labels = np.array([r.probability_value for r in rules] + [default], dtype=object)
+    idx = np.select([r.mask(columns) for r in rules], np.arange(len(rules)), default=len(rules))
+    return labels[idx]
+
+
+def _rule_signature(pest_model: Any) -> tuple:
+    return tuple(
+        (
+            rule.id,
+            rule.probability_value,
+            tuple(
+                (cond.unit.name, cond.operator.symbol, float(cond.value))
+                for cond in rule.conditions
+            ),
+        )
+        for rule in pest_model.rules
+    )
+
+
+def compile_pest_model(pest_model: Any, signature: Optional[tuple] = None) -> CompiledPestModel:
+    """Compile a PestModel's rules; rules without conditions never fire."""
+    if signature is None:
+        signature = _rule_signature(pest_model)
+    rules = []
+    for _, probability_value, conditions in signature:
+        if not conditions:
+            continue
+        for _, symbol, _ in conditions:
+            if symbol not in _OPERATORS:
+                raise ValueError(f"Unsupported operator in pest model rule: {symbol!r}")
+        rules.append(CompiledRule(
+            probability_value=probability_value,
+            conditions=tuple(CompiledCondition(*cond) for cond in conditions),
+        ))
+    return CompiledPestModel(
+        id=getattr(pest_model, "id", None),
+        name=pest_model.name,
+        rules=tuple(rules),
+        signature=signature,
+    )
+
+
+class PestRuleCache:
+    """Per-process cache of CompiledPestModel keyed by pest model id."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._entries: dict[uuid.UUID, CompiledPestModel] = {}
+
+    def get(self, pest_model: Any) -> CompiledPestModel:
+        if isinstance(pest_model, CompiledPestModel):
+            return pest_model
+        signature = _rule_signature(pest_model)
+        key = getattr(pest_model, "id", None)
+        with self._lock:
+            entry = self._entries.get(key) if key is not None else None
+        if entry is not None and entry.signature == signature:
+            return entry
+        entry = compile_pest_model(pest_model, signature)
+        if key is not None:
+            with self._lock:
+                self._entries[key] = entry
+        return entry
+
+
+pest_rule_cache = PestRuleCache()
+
+
+class PestModelCatalog:
+    """LRU of CompiledPestModel keyed by pest model id."""
+
+    def __init__(self, maxsize: Optional[int] = None) -> None:
+        self._lock = threading.Lock()
+        self._maxsize = maxsize
+        self._entries: OrderedDict[uuid.UUID, CompiledPestModel] = OrderedDict()
+
+    @property
+    def maxsize(self) -> int:
+        return self._maxsize if self._maxsize is not None else settings.PEST_MODEL_CACHE_SIZE
+
+    def invalidate(
+        self,
+        pest_model_ids: Optional[Iterable[Any]] = None,
+        rule_ids: Iterable[Any] = (),
+    ) -> None:
+        """Drop the given pest models and any model holding one of rule_ids;
+        everything when pest_model_ids is None."""
+        with self._lock:
+            if pest_model_ids is None:
+                self._entries.clear()
+                return
+            pest_model_ids, rule_ids = set(pest_model_ids), set(rule_ids)
+            for pm_id, entry in list(self._entries.items()):
+                if pm_id in pest_model_ids or any(r[0] in rule_ids for r in entry.signature):
+                    del self._entries[pm_id]
+
+    def resolve(
+        self, db: Session, ids: List[uuid.UUID]
+    ) -> Tuple[List[CompiledPestModel], List[uuid.UUID]]:
+        """Compiled models in the order of ids, plus the ids that don't exist."""
+        with self._lock:
+            found = {}
+            for pm_id in ids:
+                if pm_id in self._entries:
+                    self._entries.move_to_end(pm_id)
+                    found[pm_id] = self._entries[pm_id]
+        misses = [pm_id for pm_id in dict.fromkeys(ids) if pm_id not in found]
+        if misses:
+            loaded = [
+                compile_pest_model(pm)
+                for pm in crud.pest_model.get_with_rules(db=db, ids=misses)
+            ]
+            with self._lock:
+                for entry in loaded:
+                    found[entry.id] = entry
+                    self._entries[entry.id] = entry
+                    self._entries.move_to_end(entry.id)
+                while len(self._entries) > self.maxsize:
+                    self._entries.popitem(last=False)
+        missing = [pm_id for pm_id in ids if pm_id not in found]
+        return [found[pm_id] for pm_id in ids if pm_id in found], missing
+
+
+pest_model_catalog = PestModelCatalog()
+
+
+# session.info key of the (pest_model_ids, rule_ids) flushed but not committed yet;
+# pest_model_ids None when every model is affected
+_PENDING_CHANGES = "pest_model_catalog_changes"
+
+
+@event.listens_for(Session, "after_flush")
+def _invalidate_changed_pest_models(session: Session, flush_context: Any) -> None:
+    """Drop the flushed models right away, for this session's own reads, and remember
+    them for _invalidate_committed_pest_models."""
+    pest_model_ids, rule_ids = set(), set()
+    for obj in itertools.chain(session.new, session.dirty, session.deleted):
+        if isinstance(obj, PestModel):
+            pest_model_ids.add(obj.id)
+        elif isinstance(obj, Rule):
+            rule_ids.add(obj.id)
+            pest_model_ids.add(obj.pest_model_id)
+        elif isinstance(obj, Condition):
+            rule_ids.add(obj.rule_id)
+        elif isinstance(obj, (Unit, Operator)):
+            pest_model_ids = None
+            break
+    if pest_model_ids is not None and not (pest_model_ids or rule_ids):
+        return
+
+    pending_models, pending_rules = session.info.get(_PENDING_CHANGES, (set(), set()))
+    if pest_model_ids is None or pending_models is None:
+        session.info[_PENDING_CHANGES] = (None, set())
+        pest_model_catalog.invalidate()
+        return
+    session.info[_PENDING_CHANGES] = (pending_models | pest_model_ids, pending_rules | rule_ids)
+    pest_model_catalog.invalidate(pest_model_ids, rule_ids)
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_committed_pest_models(session: Session) -> None:
+    """Drop the committed models again: a request resolving between the flush and the
+    commit read the old committed rules and may have put them back in the catalog."""
+    pending = session.info.pop(_PENDING_CHANGES, None)
+    if pending is None:
+        return
+    pest_model_ids, rule_ids = pending
+    if pest_model_ids is None:
+        pest_model_catalog.invalidate()
+    else:
+        pest_model_catalog.invalidate(pest_model_ids, rule_ids)
+
+
+@event.listens_for(Session, "after_rollback")
+def _forget_rolled_back_pest_models(session: Session) -> None:
+    session.info.pop(_PENDING_CHANGES, None)
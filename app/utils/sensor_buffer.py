@@ -0,0 +1,140 @@
+"""
+Write-behind buffer for in-field sensor readings.
+
+POST /data/{parcel_id}/sensor/ only folds a batch of readings into the running
+per-hour sums kept here, without touching the database. The flush_sensor_buffer
+job writes the hourly means as Data rows through crud.data.bulk_write once
+SENSOR_BUFFER_FLUSH_SIZE readings are pending or SENSOR_BUFFER_FLUSH_SECONDS
+have passed. An hour stays open for SENSOR_BUFFER_HOUR_SECONDS after its last
+reading, so readings of the same hour arriving over several flushes still
+average together; each flush overwrites the hour with the mean so far.
+"""
+
+import datetime
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import pandas as pd
+from sqlalchemy.orm import Session
+
+import crud
+from core.config import settings
+from utils.gdd_snapshot import refresh_after_ingest
+
+
+@dataclass
+class _Hour:
+    """Running sums of one parcel hour. Precipitation is summed per node over the
+    hour and averaged over the nodes; every other column is averaged."""
+    sums: Dict[str, float] = field(default_factory=dict)
+    counts: Dict[str, int] = field(default_factory=dict)
+    rain: Dict[Optional[str], float] = field(default_factory=dict)
+    touched: float = 0.0
+    dirty: bool = False
+
+    def add(self, node_id: Optional[str], values: Dict[str, float]) -> None:
+        for name, value in values.items():
+            if name == "precipitation":
+                self.rain[node_id] = self.rain.get(node_id, 0.0) + value
+            else:
+                self.sums[name] = self.sums.get(name, 0.0) + value
+                self.counts[name] = self.counts.get(name, 0) + 1
+
+    def means(self) -> Dict[str, float]:
+        means = {name: total / self.counts[name] for name, total in self.sums.items()}
+        if self.rain:
+            means["precipitation"] = sum(self.rain.values()) / len(self.rain)
+        return means
+
+
+class SensorBuffer:
+    """Per-process buffer of sensor readings aggregated to the hourly Data grain."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._hours: Dict[Tuple[int, datetime.datetime], _Hour] = {}
+        self._depth = 0
+        self._last_flush = time.monotonic()
+        self._stats = {"flushes": 0, "last_flush_seconds": None, "max_flush_seconds": None,
+                       "written_hours": 0, "failed_hours": 0, "rejected_readings": 0}
+
+    def append(self, parcel_id: int,
+               readings: Iterable[Tuple[datetime.datetime, Optional[str], Dict[str, float]]]) -> bool:
+        """Fold (timestamp, node_id, values) readings into their hours, the hour taken in the
+        timestamp's own offset. Returns False, keeping nothing, when the batch would take the
+        buffer past SENSOR_BUFFER_MAX_DEPTH pending readings."""
+        readings = list(readings)
+        now = time.monotonic()
+        with self._lock:
+            if self._depth + len(readings) > settings.SENSOR_BUFFER_MAX_DEPTH:
+                self._stats["rejected_readings"] += len(readings)
+                return False
+            for timestamp, node_id, values in readings:
+                key = (parcel_id, timestamp.replace(minute=0, second=0, microsecond=0, tzinfo=None))
+                hour = self._hours.get(key)
+                if hour is None:
+                    hour = self._hours[key] = _Hour()
+                hour.add(node_id, values)
+                hour.touched, hour.dirty = now, True
+            self._depth += len(readings)
+        return True
+
+    def due(self) -> bool:
+        """Whether enough readings are pending, or they have waited long enough, to flush."""
+        with self._lock:
+            return self._depth >= settings.SENSOR_BUFFER_FLUSH_SIZE or (
+                self._depth > 0 and time.monotonic() - self._last_flush >= settings.SENSOR_BUFFER_FLUSH_SECONDS
+            )
+
+    def flush(self, db: Session) -> int:
+        """Write the hours changed since the last flush and forget the hours closed since.
+        Hours whose write fails (e.g. a parcel that does not exist) are dropped and counted.
+        Returns the number of Data rows written."""
+        started = time.monotonic()
+        with self._lock:
+            changed = [(key, hour.means()) for key, hour in self._hours.items() if hour.dirty]
+            for hour in self._hours.values():
+                hour.dirty = False
+            cutoff = started - settings.SENSOR_BUFFER_HOUR_SECONDS
+            self._hours = {key: hour for key, hour in self._hours.items() if hour.touched >= cutoff}
+            self._depth = 0
+            self._last_flush = started
+
+        written, failed = 0, 0
+        for (parcel_id, _), rows in _group_writes(changed).items():
+            frame = pd.DataFrame([{"date": pd.Timestamp(stamp), **values} for stamp, values in rows])
+            # overwrite, the mean now covers the readings of earlier flushes too
+            count = crud.data.bulk_write(db=db, frame=frame, parcel_id=parcel_id, on_conflict="update")
+            if count is None:
+                failed += len(rows)
+                continue
+            written += count
+            refresh_after_ingest(db, parcel_id, min(stamp for stamp, _ in rows).date())
+
+        elapsed = time.monotonic() - started
+        with self._lock:
+            self._stats["flushes"] += 1
+            self._stats["last_flush_seconds"] = elapsed
+            self._stats["max_flush_seconds"] = max(elapsed, self._stats["max_flush_seconds"] or 0.0)
+            self._stats["written_hours"] += written
+            self._stats["failed_hours"] += failed
+        return written
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"depth": self._depth, "open_hours": len(self._hours),
+                    "seconds_since_flush": time.monotonic() - self._last_flush, **self._stats}
+
+
+def _group_writes(changed) -> Dict[Tuple[int, frozenset], List[Tuple[datetime.datetime, Dict[str, float]]]]:
+    """Changed hours by parcel and set of columns read, so a write never nulls a column
+    the parcel's sensors did not report in that hour."""
+    groups: Dict[Tuple[int, frozenset], list] = {}
+    for (parcel_id, stamp), values in changed:
+        groups.setdefault((parcel_id, frozenset(values)), []).append((stamp, values))
+    return groups
+
+
+sensor_buffer = SensorBuffer()
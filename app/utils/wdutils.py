@@ -10,8 +10,10 @@ from requests import RequestException
 import utils
 
 from core import settings
+from .rule_compiler import pest_rule_cache
 from enum import Enum
 
+import numpy as np
 import pandas as pd
 
 WEATHER_DATA_API_CALL_URL = str(settings.GATEKEEPER_BASE_URL).strip("/") + "/api/proxy/weather_data"
@@ -182,6 +184,22 @@ def fetch_weather_service_forecast_weather_data_offline(
     return convert_weather_service_forecast_weather_data_to_dataframe(response.json())
 
 
+def convert_weather_service_hourly_weather_data_to_dataframe(
+    weather_data: dict, units
+):
+    """Columnar frame of a weather-service history response.
+
+    One column per requested unit name (missing values become NaN) plus the
+    raw timestamp strings, in response order.
+    """
+    hours = weather_data["data"]
+    columns = {"timestamp": [hour["timestamp"] for hour in hours]}
+    for unit in units:
+        key = openmeteo_friendly_variables[unit]
+        columns[unit] = np.array([hour["values"].get(key) for hour in hours], dtype=float)
+    return pd.DataFrame(columns)
+
+
 def convert_weather_service_forecast_weather_data_to_dataframe(
     json_data: list
 ):
@@ -211,30 +229,7 @@ def calculate_risk_index_forecast_wd(
     df = df[valid_columns].rename(columns=openweathermap_friendly_variables)
 
     for pm in pest_models:
-        risks_for_current_pm = ["Low"] * df.shape[0]
-
-        for rule in pm.rules:
-            final_str = "(x['{}'] {} {})".format(
-                rule.conditions[0].unit.name,
-                rule.conditions[0].operator.symbol,
-                rule.conditions[0].value,
-            )
-            for cond in rule.conditions[1:]:
-                final_str = (final_str + " & " + "(x['{}'] {} {})".format(
-                    cond.unit.name, cond.operator.symbol, cond.value
-                )
-                             )
-
-            df_with_risk = df.assign(
-                risk=eval("lambda x: {}".format(final_str))
-            )
-
-            risks_for_current_pm = [
-                rule.probability_value if x else y
-                for x, y in zip(df_with_risk["risk"], risks_for_current_pm)
-            ]
-
-        df["{}".format(pm.name)] = risks_for_current_pm
+        df["{}".format(pm.name)] = pest_rule_cache.get(pm).last_match(df, n=df.shape[0])
 
     if formatting == "JSON":
         models = []
@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+benchmark_ingest.py
+
+Measure hourly weather ingestion throughput (rows/second) against the
+service's PostgreSQL database for:
+  - batch_insert   pydantic NewCreateData per hour, multi-row INSERT ... ON CONFLICT
+  - executemany    crud.data.bulk_write(method="executemany") from a DataFrame
+  - copy           crud.data.bulk_write(method="copy"), COPY into a staging table
+  - arrays         crud.data.bulk_write with DATA_STORE_DAILY_ARRAYS, per-day arrays in data_compact
+
+Everything runs inside one outer transaction that is rolled back at the end,
+so the database is left untouched (a throwaway parcel is created inside it).
+
+Requirements:
+  the service's environment variables (POSTGRES_*), as for the API itself
+
+Examples:
+  python scripts/benchmark_ingest.py --days 365
+  python scripts/benchmark_ingest.py --days 730 --repeat 3 --methods copy executemany
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "app"))
+
+from sqlalchemy.orm import Session  # noqa: E402
+
+import crud  # noqa: E402
+from core.config import settings  # noqa: E402
+from db.session import engine  # noqa: E402
+from models import Parcel  # noqa: E402
+from schemas import NewCreateData  # noqa: E402
+
+METHODS = ("batch_insert", "executemany", "copy", "arrays")
+
+
+def synthetic_hours(days: int, start: str) -> pd.DataFrame:
+    """Hourly frame in _openmeteo_response_to_dataframe layout (DB column names, float32)."""
+    rng = np.random.default_rng(0)
+    n = days * 24
+    columns = [
+        "atmospheric_temperature", "atmospheric_relative_humidity", "precipitation",
+        "atmospheric_pressure", "average_wind_speed", "soil_temperature_10cm",
+        "soil_temperature_20cm", "soil_temperature_30cm", "soil_temperature_40cm",
+    ]
+    frame = pd.DataFrame({name: rng.uniform(0, 100, n).astype(np.float32) for name in columns})
+    frame.insert(0, "date", pd.date_range(start, periods=n, freq="h", tz="UTC"))
+    return frame
+
+
+def write(db: Session, method: str, frame: pd.DataFrame, parcel_id: int):
+    if method == "batch_insert":
+        records = [
+            NewCreateData(date=row.date.date(), time=row.date.time(),
+                          **{name: float(getattr(row, name)) for name in frame.columns[1:]})
+            for row in frame.itertuples(index=False)
+        ]
+        return crud.data.batch_insert(db=db, list_of_data=records, parcel_id=parcel_id)
+    if method == "arrays":
+        settings.DATA_STORE_DAILY_ARRAYS = True
+        try:
+            return crud.data.bulk_write(db=db, frame=frame, parcel_id=parcel_id)
+        finally:
+            settings.DATA_STORE_DAILY_ARRAYS = False
+    return crud.data.bulk_write(db=db, frame=frame, parcel_id=parcel_id, method=method)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--days", type=int, default=365, help="days of hourly rows per run (default 365)")
+    parser.add_argument("--repeat", type=int, default=1, help="runs per method; the best is reported")
+    parser.add_argument("--methods", nargs="+", choices=METHODS, default=list(METHODS))
+    args = parser.parse_args()
+
+    with engine.connect() as connection:
+        outer = connection.begin()
+        # commits inside crud only release savepoints; the outer rollback discards everything
+        db = Session(bind=connection, join_transaction_mode="create_savepoint")
+        try:
+            parcel = Parcel(name="ingest-benchmark", latitude=0.0, longitude=0.0)
+            db.add(parcel)
+            db.flush()
+
+            print("{:<14}{:>10}{:>12}{:>14}".format("method", "rows", "seconds", "rows/second"))
+            for offset, method in enumerate(args.methods):
+                best = None
+                for run in range(args.repeat):
+                    # a fresh date range per run, so every row is a real insert
+                    start = pd.Timestamp("1900-01-01") + pd.DateOffset(years=10 * (offset * args.repeat + run))
+                    frame = synthetic_hours(args.days, start.strftime("%Y-%m-%d"))
+                    began = time.perf_counter()
+                    written = write(db, method, frame, parcel.id)
+                    elapsed = time.perf_counter() - began
+                    if written != len(frame):
+                        print("{}: wrote {} of {} rows".format(method, written, len(frame)), file=sys.stderr)
+                        return 1
+                    best = elapsed if best is None else min(best, elapsed)
+                print("{:<14}{:>10}{:>12.3f}{:>14,.0f}".format(method, len(frame), best, len(frame) / best))
+        finally:
+            db.close()
+            outer.rollback()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,296 @@
+"""
+API-level tests for the /data/ endpoints: keyset pagination, the NDJSON / CSV
+streaming modes, JSON and file uploads, sensor batches and deletes, against an in-memory SQLite database.
+"""
+
+from __future__ import annotations
+
+import csv
+import datetime
+import io
+import json
+import sys
+import uuid
+
+import numpy as np
+import pandas as pd
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, text
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app.api.api_v1.endpoints.data import router as data_router
+from api import deps
+import crud
+from models import Data, DataDaily, FuzzyRiskDaily, GDDSnapshot, Parcel, WeatherCell
+from schemas import CreateData
+from utils.sensor_buffer import SensorBuffer
+
+
+@pytest.fixture
+def db():
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    for model in (Parcel, Data, DataDaily, GDDSnapshot, FuzzyRiskDaily):
+        model.__table__.create(engine)
+    session = sessionmaker(bind=engine)()
+    session.add_all([Parcel(id=1, name="a", latitude=0.0, longitude=0.0),
+                     Parcel(id=2, name="b", latitude=0.0, longitude=0.0)])
+    rows = [
+        (1, datetime.date(2024, 6, 1), None),
+        (1, datetime.date(2024, 6, 1), datetime.time(0)),
+        (1, datetime.date(2024, 6, 1), datetime.time(1)),
+        (1, datetime.date(2024, 6, 2), None),
+        (1, datetime.date(2024, 6, 2), datetime.time(5)),
+        (2, datetime.date(2024, 5, 1), datetime.time(3)),
+    ]
+    # inserted out of order, so the ordering comes from the query
+    for i, (parcel_id, date, time) in reversed(list(enumerate(rows, start=1))):
+        session.add(Data(id=i, parcel_id=parcel_id, date=date, time=time, precipitation=float(i)))
+    session.commit()
+    yield session
+    session.close()
+
+
+@pytest.fixture
+def derived(db):
+    for i, day in enumerate([datetime.date(2024, 6, 1), datetime.date(2024, 6, 2)], start=1):
+        db.add(DataDaily(id=i, parcel_id=1, date=day, hours=2, complete=False))
+        db.add(GDDSnapshot(id=i, parcel_id=1, t_base=10.0, season_year=2024, date=day, gdd_cum=float(i)))
+        db.add(FuzzyRiskDaily(id=i, parcel_id=1, threat_model_id=uuid.uuid4(),
+                              model_version=datetime.datetime(2024, 1, 1), date=day,
+                              risk_score=0.5, risk_class="low"))
+    db.commit()
+
+
+@pytest.fixture
+def client(db) -> TestClient:
+    app = FastAPI()
+    app.include_router(data_router)
+    app.dependency_overrides[deps.get_db] = lambda: db
+    app.dependency_overrides[deps.get_jwt] = lambda: {"user_id": 1}
+    with TestClient(app) as test_client:
+        yield test_client
+
+
+class TestDataPagination:
+    def test_unlimited_returns_everything(self, client):
+        body = client.get("/").json()
+        assert [row["id"] for row in body["list_of_data"]] == [1, 2, 3, 4, 5, 6]
+        assert body["next_cursor"] is None
+
+    def test_pages_follow_the_cursor(self, client):
+        ids, cursor = [], None
+        for _ in range(10):
+            params = {"limit": 2, **({"cursor": cursor} if cursor else {})}
+            body = client.get("/", params=params).json()
+            ids.extend(row["id"] for row in body["list_of_data"])
+            cursor = body["next_cursor"]
+            if cursor is None:
+                break
+        assert ids == [1, 2, 3, 4, 5, 6]
+
+    def test_cursor_after_a_row_without_time(self, client):
+        first = client.get("/parcel/1/from/2024-06-01/to/2024-06-30/", params={"limit": 1}).json()
+        assert [row["id"] for row in first["list_of_data"]] == [1]
+        rest = client.get("/parcel/1/from/2024-06-01/to/2024-06-30/",
+                          params={"limit": 10, "cursor": first["next_cursor"]}).json()
+        assert [row["id"] for row in rest["list_of_data"]] == [2, 3, 4, 5]
+
+    def test_invalid_cursor(self, client):
+        response = client.get("/", params={"cursor": "not-a-cursor"})
+        assert response.status_code == 400
+
+    def test_limit_out_of_bounds(self, client):
+        assert client.get("/", params={"limit": 0}).status_code == 400
+
+
+class TestDataStreaming:
+    def test_ndjson(self, client):
+        response = client.get("/parcel/1/from/2024-06-02/to/2024-06-02/", params={"formatting": "NDJSON"})
+        assert response.headers["content-type"] == "application/x-ndjson"
+        rows = [json.loads(line) for line in response.text.splitlines()]
+        assert [(r["id"], r["date"], r["time"], r["precipitation"]) for r in rows] == [
+            (4, "2024-06-02", None, 4.0),
+            (5, "2024-06-02", "05:00:00", 5.0),
+        ]
+
+    def test_csv(self, client):
+        response = client.get("/", params={"formatting": "CSV", "limit": 3})
+        assert response.headers["content-type"].startswith("text/csv")
+        rows = list(csv.DictReader(io.StringIO(response.text)))
+        assert [r["id"] for r in rows] == ["1", "2", "3"]
+        assert rows[0]["time"] == "" and rows[1]["time"] == "00:00:00"
+
+
+class TestDataJsonUpload:
+    # every reading field is required, if only as null
+    BODY = [{**dict.fromkeys(CreateData.model_fields), "date": day, "time": time}
+            for day, time in (("2024-06-02", "05:00:00"), ("2024-05-30", "23:00:00"))]
+
+    def test_gdd_history_is_refreshed_from_the_first_day(self, client, mocker):
+        batch_insert = mocker.patch.object(crud.data, "batch_insert", return_value=2)
+        refresh = mocker.patch("app.api.api_v1.endpoints.data.refresh_after_ingest")
+        response = client.post("/1/", json=self.BODY)
+        assert response.status_code == 200
+        assert batch_insert.call_args.kwargs["on_conflict"] == "update"
+        assert refresh.call_args.args[1:] == (1, datetime.date(2024, 5, 30))
+
+    def test_failed_write(self, client, mocker):
+        mocker.patch.object(crud.data, "batch_insert", return_value=None)
+        refresh = mocker.patch("app.api.api_v1.endpoints.data.refresh_after_ingest")
+        assert client.post("/1/", json=self.BODY).status_code == 400
+        refresh.assert_not_called()
+
+
+class TestDataFileUpload:
+    @pytest.fixture
+    def written(self, mocker):
+        frames = []
+
+        def bulk_write(db, frame, parcel_id, on_conflict):
+            frames.append(frame)
+            # the second row repeats the first one's hour
+            return len(frame.drop_duplicates(subset=["date"]))
+
+        mocker.patch.object(crud.data, "bulk_write", side_effect=bulk_write)
+        mocker.patch("utils.data.refresh_after_ingest")
+        return frames
+
+    CSV = (
+        "date,time,atmospheric_temperature,wind_direction,parcel_location\n"
+        "2024-06-01,00:00:00,12.5,N,x\n"
+        "2024-06-01,00:00:00,13.0,,x\n"
+        "2024-06-01,01:00:00,warm,N,x\n"
+        "2024-06-31,02:00:00,12.0,N,x\n"
+        "2024-06-01,03:00:00,,S,x\n"
+    )
+
+    def test_csv_is_validated_column_by_column(self, client, written, mocker):
+        mocker.patch("core.config.settings.DATA_UPLOAD_CHUNK_SIZE", 3)
+        response = client.post("/1/upload/", files={"file": ("w.csv", self.CSV)})
+        assert response.json() == {"inserted": 2, "skipped": 3}
+
+        first, second = written
+        assert list(first.columns) == ["date", "atmospheric_temperature", "wind_direction"]
+        assert first["date"].tolist() == [pd.Timestamp("2024-06-01 00:00")] * 2
+        assert first["wind_direction"].tolist() == ["N", None]
+        # the invalid date and the unreadable temperature are dropped, a missing reading is kept
+        assert second["date"].tolist() == [pd.Timestamp("2024-06-01 03:00")]
+        assert np.isnan(second["atmospheric_temperature"][0])
+
+    def test_missing_time_column(self, client, written):
+        response = client.post("/1/upload/", files={"file": ("w.csv", "date,precipitation\n2024-06-01,1\n")})
+        assert response.status_code == 400
+        assert response.json()["detail"] == "Error, missing column(s): time"
+
+    def test_failed_write(self, client, written):
+        crud.data.bulk_write.side_effect = None
+        crud.data.bulk_write.return_value = None
+        response = client.post("/1/upload/", files={"file": ("w.csv", self.CSV)})
+        assert response.status_code == 400
+
+    def test_parquet_without_pyarrow(self, client, written, monkeypatch):
+        monkeypatch.setitem(sys.modules, "pyarrow", None)
+        monkeypatch.setitem(sys.modules, "pyarrow.parquet", None)
+        response = client.post("/1/upload/", params={"formatting": "PARQUET"}, files={"file": ("w.parquet", b"PAR1")})
+        assert response.status_code == 400
+        assert "pyarrow" in response.json()["detail"]
+
+    def test_unknown_parcel(self, client, written):
+        assert client.post("/3/upload/", files={"file": ("w.csv", self.CSV)}).status_code == 400
+
+
+class TestSensorReadings:
+    @pytest.fixture
+    def buffer(self, mocker):
+        buffer = SensorBuffer()
+        mocker.patch("app.api.api_v1.endpoints.data.sensor_buffer", buffer)
+        return buffer
+
+    def test_batch_is_buffered(self, client, buffer):
+        response = client.post("/1/sensor/", json=[
+            {"timestamp": "2024-06-01T06:01:00", "node_id": "a", "leaf_wetness": 1.0},
+            {"timestamp": "2024-06-01T06:02:00", "node_id": "a", "leaf_wetness": 0.0},
+        ])
+        assert response.status_code == 202
+        stats = client.get("/sensor/buffer/").json()
+        assert stats["depth"] == 2 and stats["open_hours"] == 1
+
+    def test_batch_too_large(self, client, buffer, mocker):
+        mocker.patch("core.config.settings.SENSOR_BATCH_MAX_SIZE", 1)
+        reading = {"timestamp": "2024-06-01T06:01:00", "leaf_wetness": 1.0}
+        assert client.post("/1/sensor/", json=[reading, reading]).status_code == 400
+
+    def test_full_buffer(self, client, buffer, mocker):
+        mocker.patch("core.config.settings.SENSOR_BUFFER_MAX_DEPTH", 1)
+        reading = {"timestamp": "2024-06-01T06:01:00", "leaf_wetness": 1.0}
+        assert client.post("/1/sensor/", json=[reading, reading]).status_code == 503
+
+
+class TestDataRangeDelete:
+    def test_removes_the_interval_and_what_derives_from_it(self, client, db, derived):
+        response = client.delete("/parcel/1/from/2024-06-02/to/2024-06-30/")
+        assert response.status_code == 200
+        assert response.json()["message"] == "Successfully removed 2 datapoints of parcel with ID:1"
+        assert sorted(row.id for row in db.query(Data)) == [1, 2, 3, 6]
+        for model in (DataDaily, GDDSnapshot, FuzzyRiskDaily):
+            assert [row.date for row in db.query(model)] == [datetime.date(2024, 6, 1)]
+
+    def test_other_parcels_are_untouched(self, client, db):
+        client.delete("/parcel/1/from/2024-01-01/to/2024-12-31/")
+        assert [row.id for row in db.query(Data)] == [6]
+
+    def test_unknown_parcel(self, client):
+        assert client.delete("/parcel/3/from/2024-06-01/to/2024-06-30/").status_code == 400
+
+    def test_start_after_end(self, client):
+        assert client.delete("/parcel/1/from/2024-06-30/to/2024-06-01/").status_code == 400
+
+
+class TestDataPointDelete:
+    @pytest.fixture(autouse=True)
+    def refresh(self, mocker):
+        # the rollup upsert is PostgreSQL-only
+        return mocker.patch("crud.crud_data.data_daily.refresh")
+
+    def test_removes_the_row(self, client, db):
+        response = client.delete("/3/")
+        assert response.status_code == 200
+        assert response.json()["message"] == "Successfully removed datapoint with ID:3"
+        assert sorted(row.id for row in db.query(Data)) == [1, 2, 4, 5, 6]
+
+    def test_rebuilds_the_day_and_drops_what_derives_from_it(self, client, db, derived, refresh):
+        assert client.delete("/5/").status_code == 200
+        assert refresh.call_args.kwargs["parcel_id"] == 1
+        assert refresh.call_args.kwargs["dates"] == [datetime.date(2024, 6, 2)]
+        for model in (DataDaily, GDDSnapshot, FuzzyRiskDaily):
+            assert [row.date for row in db.query(model)] == [datetime.date(2024, 6, 1)]
+
+    def test_unknown_data_point(self, client, db):
+        assert client.delete("/7/").status_code == 400
+        assert db.query(Data).count() == 6
+
+    def test_failed_delete(self, client, db, refresh):
+        refresh.side_effect = OperationalError("INSERT", {}, Exception("locked"))
+        assert client.delete("/3/").status_code == 400
+        assert db.query(Data).count() == 6
+
+
+def test_parcel_delete_leaves_the_data_rows_to_the_database():
+    engine = create_engine("sqlite://")
+    for model in (WeatherCell, Parcel, Data):
+        model.__table__.create(engine)
+    session = sessionmaker(bind=engine)()
+    session.execute(text("PRAGMA foreign_keys = ON"))
+    session.add(Parcel(id=1, name="a", latitude=0.0, longitude=0.0))
+    session.add_all([Data(id=i, parcel_id=1, date=datetime.date(2024, 6, i)) for i in (1, 2)])
+    session.commit()
+    session.expunge_all()
+
+    crud.parcel.remove(db=session, id=1)
+    # the data rows are never loaded; the foreign key cascades the delete
+    assert session.query(Data).count() == 0
+    session.close()
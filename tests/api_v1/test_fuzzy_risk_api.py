@@ -70,6 +70,11 @@ FORECAST_BODY = {
     "days_ahead": 7,
 }
 
+BATCH_FORECAST_BODY = {
+    "parcel_ids": [1, 2, 3],
+    "days_ahead": 7,
+}
+
 FC_FORECAST_BODY = {
     "parcel_id":  "550e8400-e29b-41d4-a716-446655440000",
     "days_ahead": 7,
@@ -83,14 +88,28 @@ def mock_db_session() -> MagicMock:
     return MagicMock(spec=Session)
 
 
-def _make_parcel() -> MagicMock:
+def _make_parcel(pid: int = 1, latitude: float = 45.0, longitude: float = 14.0) -> MagicMock:
     p = MagicMock()
-    p.id        = 1
-    p.latitude  = 45.0
-    p.longitude = 14.0
+    p.id        = pid
+    p.latitude  = latitude
+    p.longitude = longitude
     return p
 
 
+@pytest.fixture(autouse=True)
+def no_gdd_seed(mocker):
+    mocker.patch(f"{ENDPOINT_MODULE}.gdd_annual_refs", return_value={})
+    return mocker.patch(f"{ENDPOINT_MODULE}.gdd_seed_for_window", return_value={})
+
+
+@pytest.fixture(autouse=True)
+def nothing_materialized(mocker):
+    return mocker.patch(
+        f"{ENDPOINT_MODULE}.load_materialized_risk",
+        side_effect=lambda db, parcel_id, tms, start, end: (pd.DataFrame(), [(tm, [start]) for tm in tms]),
+    )
+
+
 @pytest.fixture
 def client(mock_db_session: MagicMock) -> TestClient:
     app = FastAPI()
@@ -118,11 +137,9 @@ def _patch_calculate_happy_path(mocker):
     """Patch all heavy deps for /calculate/ with a successful scenario."""
     mock_crud = mocker.patch(f"{ENDPOINT_MODULE}.crud")
     mock_crud.parcel.get.return_value = _make_parcel()
-    mock_crud.data.get_data_by_parcel_id_and_date_interval.return_value = [MagicMock()]
 
-    mocker.patch(f"{ENDPOINT_MODULE}._weather_rows_to_daily_df", return_value=SAMPLE_DAILY_DF)
-    mocker.patch(f"{ENDPOINT_MODULE}._resolve_threat_models",    return_value=[MagicMock()])
-    mocker.patch(f"{ENDPOINT_MODULE}.calculate_fuzzy_risk",      return_value=SAMPLE_RESULTS_DF)
+    mocker.patch(f"{ENDPOINT_MODULE}._resolve_threat_models", return_value=[MagicMock()])
+    mocker.patch(f"{ENDPOINT_MODULE}.score_missing_days",     return_value=SAMPLE_RESULTS_DF)
     return mock_crud
 
 
@@ -191,12 +208,11 @@ class TestCalculateRisk:
         assert r.status_code == 404
         assert "Parcel" in r.json()["detail"]
 
-    def test_no_weather_data(self, client, mocker):
+    def test_no_weather_data(self, client, mocker, nothing_materialized):
         mock_crud = mocker.patch(f"{ENDPOINT_MODULE}.crud")
         mock_crud.parcel.get.return_value = _make_parcel()
-        mock_crud.data.get_data_by_parcel_id_and_date_interval.return_value = []
-        mocker.patch(f"{ENDPOINT_MODULE}._weather_rows_to_daily_df",
-                     return_value=pd.DataFrame())
+        nothing_materialized.side_effect = None
+        nothing_materialized.return_value = (pd.DataFrame(), [])
         mocker.patch(f"{ENDPOINT_MODULE}._resolve_threat_models", return_value=[MagicMock()])
         r = client.post("/calculate/", json=CALCULATE_BODY)
         assert r.status_code == 404
@@ -205,9 +221,7 @@ class TestCalculateRisk:
     def test_no_threat_models(self, client, mocker):
         mock_crud = mocker.patch(f"{ENDPOINT_MODULE}.crud")
         mock_crud.parcel.get.return_value = _make_parcel()
-        mock_crud.data.get_data_by_parcel_id_and_date_interval.return_value = [MagicMock()]
-        mocker.patch(f"{ENDPOINT_MODULE}._weather_rows_to_daily_df", return_value=SAMPLE_DAILY_DF)
-        mocker.patch(f"{ENDPOINT_MODULE}._resolve_threat_models",    return_value=[])
+        mocker.patch(f"{ENDPOINT_MODULE}._resolve_threat_models", return_value=[])
         r = client.post("/calculate/", json=CALCULATE_BODY)
         assert r.status_code == 404
         assert "threat" in r.json()["detail"].lower()
@@ -217,6 +231,28 @@ class TestCalculateRisk:
         r = client.post("/calculate/?format=xml", json=CALCULATE_BODY)
         assert r.status_code == 422
 
+    def test_served_from_materialized_table(self, client, mocker, nothing_materialized):
+        _patch_calculate_happy_path(mocker)
+        nothing_materialized.side_effect = None
+        nothing_materialized.return_value = (SAMPLE_RESULTS_DF, [])
+        live = mocker.patch(f"{ENDPOINT_MODULE}.score_missing_days")
+        r = client.post("/calculate/?format=json", json=CALCULATE_BODY)
+        assert r.status_code == 200
+        assert r.json()[0]["risk_class"] == "High"
+        live.assert_not_called()
+
+    def test_missing_days_computed_live(self, client, mocker, nothing_materialized):
+        _patch_calculate_happy_path(mocker)
+        missing = [(MagicMock(), [pd.Timestamp("2024-06-02").date()])]
+        nothing_materialized.side_effect = None
+        nothing_materialized.return_value = (SAMPLE_RESULTS_DF, missing)
+        live = mocker.patch(f"{ENDPOINT_MODULE}.score_missing_days",
+                            return_value=SAMPLE_RESULTS_DF.assign(date=pd.Timestamp("2024-06-02")))
+        r = client.post("/calculate/?format=json", json=CALCULATE_BODY)
+        assert r.status_code == 200
+        assert [row["date"][:10] for row in r.json()] == ["2024-06-01", "2024-06-02"]
+        assert live.call_args.args[2] == missing
+
 
 # ─── /forecast/ ──────────────────────────────────────────────────────────────
 
@@ -238,6 +274,14 @@ class TestForecastRisk:
         assert isinstance(body, list)
         assert len(body) == 1
 
+    def test_gdd_seed_and_annual_ref_passed(self, client, mocker):
+        _patch_forecast_happy_path(mocker)
+        calc = mocker.patch(f"{ENDPOINT_MODULE}.calculate_fuzzy_risk", return_value=SAMPLE_RESULTS_DF)
+        mocker.patch(f"{ENDPOINT_MODULE}.gdd_annual_refs", return_value={"gdd_10": 900.0})
+        r = client.post("/forecast/", json=FORECAST_BODY)
+        assert r.status_code == 200
+        assert calc.call_args.kwargs == {"gdd_seed": {}, "gdd_annual_ref": {"gdd_10": 900.0}}
+
     def test_parcel_not_found(self, client, mocker):
         mock_crud = mocker.patch(f"{ENDPOINT_MODULE}.crud")
         mock_crud.parcel.get.return_value = None
@@ -260,6 +304,93 @@ class TestForecastRisk:
         assert r.status_code == 502
 
 
+# ─── /forecast/batch/ ────────────────────────────────────────────────────────
+
+def _patch_batch_happy_path(mocker, parcels):
+    """Patch /forecast/batch/ deps; returns (crud, fetch, calculate) mocks."""
+    mock_crud = mocker.patch(f"{ENDPOINT_MODULE}.crud")
+    mock_crud.parcel.get_by_ids.return_value = parcels
+
+    fetch = mocker.patch(
+        f"{ENDPOINT_MODULE}._openmeteo_to_daily_dfs",
+        side_effect=lambda locations, days: [SAMPLE_DAILY_DF for _ in locations],
+    )
+    mocker.patch(f"{ENDPOINT_MODULE}._resolve_threat_models", return_value=[MagicMock()])
+    calc = mocker.patch(f"{ENDPOINT_MODULE}.calculate_fuzzy_risk", return_value=SAMPLE_RESULTS_DF)
+    return mock_crud, fetch, calc
+
+
+class TestForecastRiskBatch:
+
+    PARCELS = [
+        _make_parcel(1, 45.001, 14.002),
+        _make_parcel(2, 44.998, 13.999),   # same 0.1° cell as parcel 1
+        _make_parcel(3, 46.500, 15.500),
+    ]
+
+    def test_one_fetch_per_unique_cell(self, client, mocker):
+        _, fetch, calc = _patch_batch_happy_path(mocker, self.PARCELS)
+        r = client.post("/forecast/batch/?format=json", json=BATCH_FORECAST_BODY)
+        assert r.status_code == 200
+        fetch.assert_called_once()
+        locations, days = fetch.call_args.args
+        assert locations == [(45.0, 14.0), (46.5, 15.5)]
+        assert days == 7
+        assert calc.call_count == 2
+
+    def test_json_fans_out_per_parcel(self, client, mocker):
+        _patch_batch_happy_path(mocker, self.PARCELS)
+        r = client.post("/forecast/batch/?format=json", json=BATCH_FORECAST_BODY)
+        body = r.json()
+        assert [rec["parcel_id"] for rec in body] == [1, 2, 3]
+        assert all(rec["risk_class"] == "High" for rec in body)
+
+    def test_jsonld_has_collection_per_parcel(self, client, mocker):
+        _patch_batch_happy_path(mocker, self.PARCELS)
+        r = client.post("/forecast/batch/", json=BATCH_FORECAST_BODY)
+        assert r.status_code == 200
+        graph = r.json()["@graph"]
+        assert [c["hasFeatureOfInterest"]["lat"] for c in graph] == ["45.001", "44.998", "46.5"]
+
+    def test_different_gdd_seed_scores_separately(self, client, mocker, no_gdd_seed):
+        _, _, calc = _patch_batch_happy_path(mocker, self.PARCELS[:2])
+        no_gdd_seed.side_effect = lambda db, pid, first, tms: {"gdd_5": 100.0 * pid}
+        r = client.post("/forecast/batch/", json={"parcel_ids": [1, 2]})
+        assert r.status_code == 200
+        assert calc.call_count == 2
+
+    def test_different_gdd_annual_ref_scores_separately(self, client, mocker):
+        _, _, calc = _patch_batch_happy_path(mocker, self.PARCELS[:2])
+        mocker.patch(f"{ENDPOINT_MODULE}.gdd_annual_refs",
+                     side_effect=lambda db, pid, tms: {"gdd_5": 1000.0 * pid})
+        r = client.post("/forecast/batch/", json={"parcel_ids": [1, 2]})
+        assert r.status_code == 200
+        assert [c.kwargs["gdd_annual_ref"] for c in calc.call_args_list] == [{"gdd_5": 1000.0}, {"gdd_5": 2000.0}]
+
+    def test_duplicate_ids_computed_once(self, client, mocker):
+        _, fetch, calc = _patch_batch_happy_path(mocker, self.PARCELS[:1])
+        r = client.post("/forecast/batch/?format=json", json={"parcel_ids": [1, 1]})
+        assert r.status_code == 200
+        assert len(r.json()) == 1
+        assert calc.call_count == 1
+
+    def test_missing_parcel(self, client, mocker):
+        _patch_batch_happy_path(mocker, self.PARCELS[:2])
+        r = client.post("/forecast/batch/", json=BATCH_FORECAST_BODY)
+        assert r.status_code == 404
+        assert "3" in r.json()["detail"]
+
+    def test_empty_parcel_list_rejected(self, client):
+        r = client.post("/forecast/batch/", json={"parcel_ids": []})
+        assert r.status_code == 422
+
+    def test_openmeteo_empty_cell(self, client, mocker):
+        _, fetch, _ = _patch_batch_happy_path(mocker, self.PARCELS)
+        fetch.side_effect = lambda locations, days: [SAMPLE_DAILY_DF, pd.DataFrame()]
+        r = client.post("/forecast/batch/", json=BATCH_FORECAST_BODY)
+        assert r.status_code == 502
+
+
 # ─── /historical/ ────────────────────────────────────────────────────────────
 
 class TestHistoricalFetchAndCalculate:
@@ -318,6 +449,14 @@ class TestHistoricalFetchAndCalculate:
         client.post("/historical/", json=FETCH_BODY)
         spy.assert_called_once()
 
+    def test_gdd_annual_ref_passed(self, client, mocker):
+        _patch_fetch_happy_path(mocker, "fetch_archive_hourly_for_range")
+        calc = mocker.patch(f"{ENDPOINT_MODULE}.calculate_fuzzy_risk", return_value=SAMPLE_RESULTS_DF)
+        mocker.patch(f"{ENDPOINT_MODULE}.gdd_annual_refs", return_value={"gdd_10": 900.0})
+        r = client.post("/historical/", json=FETCH_BODY)
+        assert r.status_code == 200
+        assert calc.call_args.kwargs["gdd_annual_ref"] == {"gdd_10": 900.0}
+
 
 # ─── /forecast-fetch/ ────────────────────────────────────────────────────────
 
@@ -79,7 +79,7 @@ def client(mock_db_session: MagicMock) -> TestClient:
 class TestOfflineRiskIndexForecast:
 
     def test_happy_path(self, client: TestClient, mock_db_session: MagicMock, mocker):
-        mocker.patch(f"{ENDPOINT_MODULE}.crud.pest_model.get", return_value=_make_pest_model())
+        mocker.patch(f"{ENDPOINT_MODULE}.pest_model_catalog.resolve", return_value=([_make_pest_model()], []))
         mocker.patch(
             f"{ENDPOINT_MODULE}.fetch_weather_service_forecast_weather_data_offline",
             return_value=SAMPLE_WEATHER_DF,
@@ -97,7 +97,7 @@ class TestOfflineRiskIndexForecast:
         assert "@graph" in body
 
     def test_json_format_returns_plain_dict(self, client: TestClient, mock_db_session: MagicMock, mocker):
-        mocker.patch(f"{ENDPOINT_MODULE}.crud.pest_model.get", return_value=_make_pest_model())
+        mocker.patch(f"{ENDPOINT_MODULE}.pest_model_catalog.resolve", return_value=([_make_pest_model()], []))
         mocker.patch(
             f"{ENDPOINT_MODULE}.fetch_weather_service_forecast_weather_data_offline",
             return_value=SAMPLE_WEATHER_DF,
@@ -129,7 +129,7 @@ class TestOfflineRiskIndexForecast:
         assert "offline deployment" in r.json()["detail"].lower()
 
     def test_invalid_pest_model_id(self, client: TestClient, mock_db_session: MagicMock, mocker):
-        mocker.patch(f"{ENDPOINT_MODULE}.crud.pest_model.get", return_value=None)
+        mocker.patch(f"{ENDPOINT_MODULE}.pest_model_catalog.resolve", return_value=([], [PEST_MODEL_ID]))
         mocker.patch(
             f"{ENDPOINT_MODULE}.fetch_weather_service_forecast_weather_data_offline",
             return_value=SAMPLE_WEATHER_DF,
@@ -156,7 +156,7 @@ class TestOfflineRiskIndexForecast:
             f"{ENDPOINT_MODULE}.fetch_weather_service_forecast_weather_data_offline",
             return_value=SAMPLE_WEATHER_DF,
         )
-        mocker.patch(f"{ENDPOINT_MODULE}.crud.pest_model.get", return_value=_make_pest_model())
+        mocker.patch(f"{ENDPOINT_MODULE}.pest_model_catalog.resolve", return_value=([_make_pest_model()], []))
         mocker.patch(
             f"{ENDPOINT_MODULE}.calculate_risk_index_forecast_wd",
             return_value=SAMPLE_RESULT_JSONLD,
@@ -130,6 +130,24 @@ class TestThreatModelAPI:
         r = client.delete(f"/{tm.id}/")
         assert r.status_code == 200
 
+    def test_update_invalidates_catalog(self, client, mocker):
+        tm = _make_tm()
+        mock_crud = mocker.patch(self.CRUD)
+        mock_crud.threat_model.get.return_value = tm
+        mock_crud.threat_model.update.return_value = tm
+        catalog = mocker.patch("app.api.api_v1.endpoints.threat_model.threat_model_catalog")
+        client.patch(f"/{tm.id}/", json={"common_name": "Scab"})
+        catalog.invalidate.assert_called_once_with(tm.id)
+
+    def test_delete_invalidates_catalog(self, client, mocker):
+        tm = _make_tm()
+        mock_crud = mocker.patch(self.CRUD)
+        mock_crud.threat_model.get.return_value = tm
+        mock_crud.threat_model.remove.return_value = tm
+        catalog = mocker.patch("app.api.api_v1.endpoints.threat_model.threat_model_catalog")
+        client.delete(f"/{tm.id}/")
+        catalog.invalidate.assert_called_once_with(tm.id)
+
     def test_delete_not_found(self, client, mocker):
         mock_crud = mocker.patch(self.CRUD)
         mock_crud.threat_model.get.return_value = None
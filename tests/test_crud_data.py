@@ -0,0 +1,469 @@
+"""
+Tests for the hourly weather reads and the data_daily rollup
+(app/crud/crud_data.py, app/crud/crud_data_daily.py) on an in-memory SQLite
+database.
+"""
+
+from __future__ import annotations
+
+import datetime
+
+from collections import namedtuple
+from types import SimpleNamespace
+from unittest.mock import MagicMock, call
+
+import numpy as np
+import pandas as pd
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.orm import sessionmaker
+
+import crud
+from crud.crud_data import _merge_hours
+from crud.crud_data_compact import COMPACT_SQL, day_arrays, hourly_select, uses_compact_store
+from crud.crud_data_daily import ROLLUP_COLUMNS, rollup_select
+from models import Data
+from schemas import NewCreateData
+from utils.fuzzy_risk import _data_daily_to_daily_df
+
+
+@pytest.fixture
+def db():
+    engine = create_engine("sqlite://")
+    Data.__table__.create(engine)
+    session = sessionmaker(bind=engine)()
+    start = datetime.datetime(2024, 6, 1)
+    for i in range(30):
+        ts = start + datetime.timedelta(hours=6 * i)
+        # the (id, date) primary key gets no autoincrement on SQLite
+        session.add(Data(
+            id=i + 1, parcel_id=1, date=ts.date(), time=None if i == 0 else ts.time(),
+            atmospheric_temperature=None if i % 5 == 0 else 10.0 + i,
+            atmospheric_relative_humidity=50.0 + i,
+            precipitation=None if i % 4 == 0 else 0.5,
+        ))
+    session.add(Data(id=31, parcel_id=2, date=start.date(), time=start.time(), atmospheric_temperature=99.0))
+    session.commit()
+    yield session
+    session.close()
+
+
+class TestGetWeatherColumns:
+    def test_streams_projected_columns(self, db):
+        columns = crud.data.get_weather_columns(
+            db=db, parcel_id=1, columns=["atmospheric_temperature", "precipitation"],
+            date_from=datetime.date(2024, 6, 1), date_to=datetime.date(2024, 6, 5), chunk_size=7,
+        )
+        assert set(columns) == {"date", "time", "atmospheric_temperature", "precipitation"}
+        assert columns["date"].dtype == np.dtype("datetime64[D]")
+        assert len(columns["date"]) == 20
+        assert np.isnat(columns["time"][0])
+        assert columns["time"][5] == np.timedelta64(6 * 3600, "s")
+        assert np.isnan(columns["atmospheric_temperature"][[0, 5, 10, 15]]).all()
+        assert columns["atmospheric_temperature"][1] == 11.0
+        assert np.isnan(columns["precipitation"][::4]).all()
+
+    def test_empty_interval(self, db):
+        columns = crud.data.get_weather_columns(
+            db=db, parcel_id=1, columns=["precipitation"],
+            date_from=datetime.date(2025, 1, 1), date_to=datetime.date(2025, 1, 2),
+        )
+        assert {name: len(a) for name, a in columns.items()} == {"date": 0, "time": 0, "precipitation": 0}
+
+    def test_unknown_column(self, db):
+        with pytest.raises(KeyError):
+            crud.data.get_weather_columns(
+                db=db, parcel_id=1, columns=["not_a_column"],
+                date_from=datetime.date(2024, 6, 1), date_to=datetime.date(2024, 6, 5),
+            )
+
+
+class TestDataDailyRollup:
+    def test_rollup_matches_hourly_aggregation(self, db):
+        rows = db.execute(rollup_select(1, [datetime.date(2024, 6, 1), datetime.date(2024, 6, 2)])).all()
+        daily = dict(zip(ROLLUP_COLUMNS, rows[0]))
+        # June 1st: hours 0..3, hour 0 without temperature and precipitation
+        assert (daily["temp_min"], daily["temp_max"]) == (11.0, 13.0)
+        assert daily["temp_mean"] == pytest.approx(12.0)
+        assert daily["humidity_mean"] == pytest.approx(51.5)
+        assert daily["precipitation_sum"] == pytest.approx(1.5)
+        assert (daily["hours"], bool(daily["complete"])) == (4, False)
+        assert len(rows) == 2
+
+    def test_daily_frame_skips_days_without_temperature(self):
+        rows = [
+            SimpleNamespace(date=datetime.date(2024, 6, 1), temp_min=8.0, temp_max=20.0,
+                            humidity_mean=70.0, precipitation_sum=None),
+            SimpleNamespace(date=datetime.date(2024, 6, 2), temp_min=None, temp_max=None,
+                            humidity_mean=80.0, precipitation_sum=2.0),
+        ]
+        daily = _data_daily_to_daily_df(rows)
+        assert daily.to_dict("records") == [{
+            "date": pd.Timestamp("2024-06-01"), "temp_max": 20.0, "temp_min": 8.0,
+            "humidity": 70.0, "rainfall": 0.0,
+        }]
+
+
+def _hours(*keys, **values) -> list[NewCreateData]:
+    empty = dict.fromkeys(NewCreateData.model_fields)
+    return [
+        NewCreateData(**{**empty, **values, "date": datetime.date(2024, 6, d), "time": datetime.time(h)})
+        for d, h in keys
+    ]
+
+
+class TestBatchInsert:
+    @pytest.fixture
+    def refresh(self, mocker):
+        return mocker.patch("crud.crud_data.data_daily.refresh")
+
+    @staticmethod
+    def _sql(session: MagicMock, i: int = 0) -> str:
+        return str(session.execute.call_args_list[i].args[0].compile(dialect=postgresql.dialect()))
+
+    def test_refreshes_only_days_written(self, refresh):
+        session = MagicMock()
+        # every hour of June 1st is already stored
+        session.execute.return_value = [SimpleNamespace(date=datetime.date(2024, 6, 2))] * 2
+
+        written = crud.data.batch_insert(db=session, list_of_data=_hours((1, 0), (1, 1), (2, 0), (2, 1)),
+                                         parcel_id=3)
+
+        assert written == 2
+        assert refresh.call_args.kwargs == {"db": session, "parcel_id": 3, "dates": {datetime.date(2024, 6, 2)}}
+        assert session.method_calls[-1] == call.commit()
+
+    def test_conflicts_skipped_in_database(self, refresh):
+        session = MagicMock()
+        crud.data.batch_insert(db=session, list_of_data=_hours((1, 0)), parcel_id=3)
+        assert "ON CONFLICT ON CONSTRAINT uq_data_parcel_date_time DO NOTHING" in self._sql(session)
+
+    def test_update_overwrites_values_only(self, refresh):
+        session = MagicMock()
+        crud.data.batch_insert(db=session, list_of_data=_hours((1, 0)), parcel_id=3, on_conflict="update")
+        sql = self._sql(session)
+        assert "DO UPDATE SET" in sql
+        assert "atmospheric_temperature = excluded.atmospheric_temperature" in sql
+        assert "parcel_id = excluded" not in sql and "time = excluded" not in sql
+
+    def test_duplicate_hours_in_batch(self, refresh):
+        session = MagicMock()
+        hours = _hours((1, 0), atmospheric_temperature=1.0) + _hours((1, 0), atmospheric_temperature=2.0)
+
+        crud.data.batch_insert(db=session, list_of_data=hours, parcel_id=3)
+        crud.data.batch_insert(db=session, list_of_data=hours, parcel_id=3, on_conflict="update")
+
+        first, last = (c.args[0].compile().params for c in session.execute.call_args_list)
+        assert first["atmospheric_temperature_m0"] == 1.0 and "atmospheric_temperature_m1" not in first
+        assert last["atmospheric_temperature_m0"] == 2.0
+
+    def test_chunks_large_batches(self, refresh, mocker):
+        mocker.patch.object(crud.data, "INSERT_CHUNK_SIZE", 3)
+        session = MagicMock()
+        crud.data.batch_insert(db=session, list_of_data=_hours(*((1, h) for h in range(7))), parcel_id=3)
+        assert session.execute.call_count == 3
+
+
+
+class TestBulkWrite:
+    @pytest.fixture
+    def refresh(self, mocker):
+        return mocker.patch("crud.crud_data.data_daily.refresh")
+
+    @staticmethod
+    def _frame() -> pd.DataFrame:
+        return pd.DataFrame({
+            "date": pd.date_range("2024-06-01 22:00", periods=3, freq="h", tz="UTC").append(
+                pd.DatetimeIndex(["2024-06-01 22:00"], tz="UTC")),
+            "atmospheric_temperature": np.array([12.3, np.nan, 14.0, 99.0], dtype=np.float32),
+            "rain": [0.0, 0.0, 0.0, 0.0],
+        })
+
+    @staticmethod
+    def _session(driver: str, written) -> MagicMock:
+        session = MagicMock()
+        session.get_bind.return_value.dialect.driver = driver
+        session.execute.return_value.all.return_value = written
+        return session
+
+    def test_executemany_rows(self, refresh):
+        written = [SimpleNamespace(id=1, date=datetime.date(2024, 6, 1)),
+                   SimpleNamespace(id=2, date=datetime.date(2024, 6, 2))]
+        session = self._session("sqlite", written)
+
+        assert crud.data.bulk_write(db=session, frame=self._frame(), parcel_id=3, method="executemany") == 2
+
+        stmt, records = session.execute.call_args.args
+        assert "ON CONFLICT ON CONSTRAINT uq_data_parcel_date_time DO NOTHING" in str(
+            stmt.compile(dialect=postgresql.dialect()))
+        assert [(r["date"], r["time"]) for r in records] == [
+            (datetime.date(2024, 6, 1), datetime.time(22)),
+            (datetime.date(2024, 6, 1), datetime.time(23)),
+            (datetime.date(2024, 6, 2), datetime.time(0)),
+        ]
+        assert records[0]["atmospheric_temperature"] == float(np.float32(12.3))
+        assert records[1]["atmospheric_temperature"] is None
+        assert set(records[0]) == {"parcel_id", "date", "time", "atmospheric_temperature"}
+        assert refresh.call_args.kwargs["dates"] == {datetime.date(2024, 6, 1), datetime.date(2024, 6, 2)}
+        session.commit.assert_called_once()
+
+    def test_update_keeps_last_duplicate(self, refresh):
+        session = self._session("sqlite", [])
+        crud.data.bulk_write(db=session, frame=self._frame(), parcel_id=3, method="executemany",
+                             on_conflict="update")
+        records = session.execute.call_args.args[1]
+        assert records[-1]["atmospheric_temperature"] == 99.0
+
+    def test_copy_streams_csv_through_staging_table(self, refresh):
+        session = self._session("psycopg2", [SimpleNamespace(id=1, date=datetime.date(2024, 6, 1))])
+        cursor = session.connection.return_value.connection.cursor.return_value.__enter__.return_value
+        copied = {}
+        cursor.copy_expert.side_effect = lambda sql, buffer: copied.update(sql=sql, csv=buffer.read())
+
+        assert crud.data.bulk_write(db=session, frame=self._frame(), parcel_id=3) == 1
+
+        assert copied["sql"] == ("COPY data_staging (parcel_id, date, time, atmospheric_temperature) "
+                                 "FROM STDIN WITH (FORMAT csv)")
+        assert copied["csv"].splitlines() == [
+            "3,2024-06-01,22:00:00,{!r}".format(float(np.float32(12.3))),
+            "3,2024-06-01,23:00:00,",
+            "3,2024-06-02,00:00:00,14.0",
+        ]
+        statements = [str(c.args[0]) for c in session.execute.call_args_list]
+        assert statements[0].startswith("CREATE TEMPORARY TABLE data_staging")
+        assert "FROM data_staging" in statements[1]
+        assert statements[2] == "DROP TABLE data_staging"
+
+    def test_return_rows(self, refresh):
+        session = self._session("sqlite", [SimpleNamespace(id=7, date=datetime.date(2024, 6, 1))])
+        rows = crud.data.bulk_write(db=session, frame=self._frame(), parcel_id=3, method="executemany",
+                                    return_rows=True)
+        assert rows is session.query.return_value.filter.return_value.order_by.return_value.all.return_value
+
+    def test_empty_frame(self, refresh):
+        session = self._session("sqlite", [])
+        assert crud.data.bulk_write(db=session, frame=self._frame().iloc[:0], parcel_id=3) == 0
+        session.execute.assert_not_called()
+
+
+class TestDataPartitions:
+    @pytest.fixture(autouse=True)
+    def known(self, mocker):
+        return mocker.patch("crud.crud_data._known_partitions", set())
+
+    @staticmethod
+    def _session(*existing: str) -> MagicMock:
+        session = MagicMock()
+        session.get_bind.return_value.dialect.name = "postgresql"
+        session.execute.return_value.scalars.return_value = list(existing)
+        return session
+
+    @staticmethod
+    def _statements(session: MagicMock) -> list[str]:
+        return [str(c.args[0]) for c in session.execute.call_args_list]
+
+    def test_creates_missing_months(self):
+        session = self._session("data_p2024_05", "data_default")
+        dates = [datetime.date(2024, 5, 3), datetime.date(2024, 6, 30), datetime.date(2024, 12, 1), None]
+
+        created = crud.data.ensure_partitions(db=session, dates=dates)
+
+        assert created == [datetime.date(2024, 6, 1), datetime.date(2024, 12, 1)]
+        assert self._statements(session)[1:] == [
+            "CREATE TABLE IF NOT EXISTS data_p2024_06 PARTITION OF data "
+            "FOR VALUES FROM ('2024-06-01') TO ('2024-07-01')",
+            "CREATE TABLE IF NOT EXISTS data_p2024_12 PARTITION OF data "
+            "FOR VALUES FROM ('2024-12-01') TO ('2025-01-01')",
+        ]
+        session.commit.assert_not_called()
+
+    def test_known_months_skip_the_catalog(self, known):
+        session = self._session("data_p2024_05")
+        crud.data.ensure_partitions(db=session, dates=[datetime.date(2024, 5, 3)])
+        assert known == {datetime.date(2024, 5, 1)}
+
+        session.execute.reset_mock()
+        assert crud.data.ensure_partitions(db=session, dates=[datetime.date(2024, 5, 20)]) == []
+        session.execute.assert_not_called()
+
+    def test_noop_off_postgresql(self):
+        session = MagicMock()
+        session.get_bind.return_value.dialect.name = "sqlite"
+        assert crud.data.ensure_partitions(db=session, dates=[datetime.date(2024, 5, 3)]) == []
+        session.execute.assert_not_called()
+
+    def test_drop_partitions_before(self, known):
+        session = self._session("data_p2023_12", "data_p2024_02", "data_p2024_01")
+        known.update({datetime.date(2023, 12, 1), datetime.date(2024, 2, 1)})
+
+        dropped = crud.data.drop_partitions_before(db=session, month=datetime.date(2024, 2, 15))
+
+        assert dropped == [datetime.date(2023, 12, 1), datetime.date(2024, 1, 1)]
+        assert self._statements(session)[1:] == ["DROP TABLE IF EXISTS data_p2023_12",
+                                                 "DROP TABLE IF EXISTS data_p2024_01"]
+        assert known == {datetime.date(2024, 2, 1)}
+        session.commit.assert_called_once()
+
+
+class TestDataCompact:
+    @pytest.fixture
+    def refresh(self, mocker):
+        return mocker.patch("crud.data_daily.refresh")
+
+    @staticmethod
+    def _session(deleted) -> MagicMock:
+        session = MagicMock()
+        session.execute.return_value.scalars.return_value.all.return_value = deleted
+        return session
+
+    def test_compact_folds_deletes_and_refreshes(self, refresh):
+        session = self._session([datetime.date(2023, 1, 1)] * 24 + [datetime.date(2023, 1, 2)])
+
+        deleted = crud.data_compact.compact(db=session, parcel_id=3, start=datetime.date(2023, 1, 1),
+                                            end=datetime.date(2023, 2, 1))
+
+        assert deleted == 25
+        (insert, params), (delete, _) = (c.args for c in session.execute.call_args_list)
+        assert str(insert) == COMPACT_SQL
+        assert params == {"parcel_id": 3, "start": datetime.date(2023, 1, 1), "end": datetime.date(2023, 2, 1)}
+        assert str(delete).startswith("DELETE FROM data") and "time IS NOT NULL" in str(delete)
+        assert refresh.call_args.kwargs["dates"] == {datetime.date(2023, 1, 1), datetime.date(2023, 1, 2)}
+        assert session.method_calls[-1] == call.commit()
+
+    def test_rollup_only(self, refresh):
+        session = self._session([datetime.date(2023, 1, 1)])
+        crud.data_compact.compact(db=session, parcel_id=3, start=datetime.date(2023, 1, 1),
+                                  end=datetime.date(2023, 2, 1), keep_hourly=False)
+        assert str(session.execute.call_args.args[0]).startswith("DELETE FROM data")
+        refresh.assert_not_called()
+        session.commit.assert_called_once()
+
+    def test_compact_sql_merges_slot_by_slot(self):
+        assert ("CASE WHEN count(reading.precipitation) > 0 "
+                "THEN array_agg(reading.precipitation ORDER BY slot.hour)::real[] END") in COMPACT_SQL
+        assert "array_agg(reading.wind_direction ORDER BY slot.hour)::text[]" in COMPACT_SQL
+        assert "hours = data_compact.hours | excluded.hours" in COMPACT_SQL
+        assert ("ARRAY(SELECT coalesce(p, o) FROM unnest(excluded.precipitation, data_compact.precipitation) "
+                "WITH ORDINALITY AS u(p, o, i) ORDER BY i)") in COMPACT_SQL
+
+    def test_hourly_select_reads_view(self):
+        sql = str(hourly_select(1, compacted=True, date_from=datetime.date(2023, 1, 1),
+                                date_to=datetime.date(2023, 1, 31)).compile(dialect=postgresql.dialect()))
+        assert sql.startswith("SELECT data_hourly.id, data_hourly.parcel_id, data_hourly.date, data_hourly.time")
+        assert "FROM data_hourly \nWHERE data_hourly.parcel_id = " in sql
+
+    def test_hourly_select_without_compact_store(self, db):
+        rows = db.execute(hourly_select(1, compacted=False, dates=[datetime.date(2024, 6, 1)])).all()
+        assert len(rows) == 4 and {r.parcel_id for r in rows} == {1}
+
+    def test_compact_store_only_when_configured(self, mocker):
+        session = MagicMock()
+        session.get_bind.return_value.dialect.name = "postgresql"
+        assert not uses_compact_store(session)
+
+        mocker.patch("crud.crud_data_compact.settings.DATA_COMPACT_AFTER_DAYS", 730)
+        assert uses_compact_store(session)
+
+        session.get_bind.return_value.dialect.name = "sqlite"
+        assert not uses_compact_store(session)
+
+
+def _readings(*rows) -> pd.DataFrame:
+    return pd.DataFrame(
+        [{"date": datetime.date(2024, 6, d), "time": datetime.time(h, m), **values} for d, h, m, values in rows]
+    )
+
+
+class TestDailyArrays:
+    def test_day_arrays(self):
+        records = day_arrays(_readings(
+            (1, 0, 0, {"precipitation": 1.0, "atmospheric_temperature": None}),
+            (1, 5, 10, {"precipitation": 2.0, "atmospheric_temperature": None}),
+            (1, 5, 40, {"precipitation": 4.0, "atmospheric_temperature": None}),
+            (2, 23, 0, {"precipitation": None, "atmospheric_temperature": 20.5}),
+        ))
+
+        assert [r["date"] for r in records] == [datetime.date(2024, 6, 1), datetime.date(2024, 6, 2)]
+        assert [r["hours"] for r in records] == [1 | 1 << 5, 1 << 23]
+        assert records[0]["precipitation"] == [1.0, None, None, None, None, 3.0] + [None] * 18
+        assert records[0]["atmospheric_temperature"] is None
+        assert records[1]["precipitation"] is None
+        assert records[1]["atmospheric_temperature"][23] == 20.5
+
+    def test_write_hours_merges_on_conflict(self, mocker):
+        session = MagicMock()
+        session.execute.return_value.all.return_value = []
+        session.execute.return_value.scalars.return_value = [datetime.date(2024, 6, 1)]
+        values = _readings((1, 3, 0, {"precipitation": 1.0}))
+
+        assert crud.data_compact.write_hours(db=session, values=values, parcel_id=3) == {datetime.date(2024, 6, 1): 1}
+        crud.data_compact.write_hours(db=session, values=values, parcel_id=3, on_conflict="update")
+
+        _, keep, _, update = (str(c.args[0].compile(dialect=postgresql.dialect()))
+                              for c in session.execute.call_args_list)
+        assert "unnest(data_compact.precipitation, excluded.precipitation)" in keep
+        assert "WHERE (data_compact.hours | excluded.hours) != data_compact.hours" in keep
+        assert "unnest(excluded.precipitation, data_compact.precipitation)" in update
+        assert "WHERE" not in update.split("DO UPDATE")[1]
+
+    def test_write_hours_counts_the_changed_hours(self):
+        Row = namedtuple("Row", "date hours precipitation wind_direction")
+        stored = Row(datetime.date(2024, 6, 1), 1 | 1 << 1 | 1 << 2,
+                     [1.0, 2.0, None] + [None] * 21, ["N", "N", "N"] + [None] * 21)
+        session = MagicMock()
+        session.execute.return_value.all.return_value = [stored]
+        session.execute.return_value.scalars.return_value = [datetime.date(2024, 6, 1)]
+        # hour 0 unchanged, 1 a new value, 2 fills a missing value, 3 a new hour
+        values = _readings(*((1, h, 0, {"precipitation": p, "wind_direction": "N"})
+                             for h, p in ((0, 1.0), (1, 5.0), (2, 3.0), (3, 4.0))))
+
+        assert crud.data_compact.write_hours(db=session, values=values, parcel_id=3,
+                                             on_conflict="update") == {datetime.date(2024, 6, 1): 3}
+        # stored readings are kept: only the missing value and the new hour
+        assert crud.data_compact.write_hours(db=session, values=values, parcel_id=3) == {datetime.date(2024, 6, 1): 2}
+
+    def test_get_blocks(self):
+        Row = namedtuple("Row", "date hours precipitation")
+        session = MagicMock()
+        session.execute.return_value.all.return_value = [
+            Row(datetime.date(2024, 6, 1), 1 | 1 << 5, [1.0] + [None] * 4 + [3.0] + [None] * 18),
+            Row(datetime.date(2024, 6, 2), 1 << 23, None),
+        ]
+
+        blocks = crud.data_compact.get_blocks(db=session, parcel_id=3, columns=["precipitation"],
+                                              date_from=datetime.date(2024, 6, 1), date_to=datetime.date(2024, 6, 2))
+
+        assert blocks["date"].tolist() == [datetime.date(2024, 6, 1)] * 2 + [datetime.date(2024, 6, 2)]
+        assert (blocks["time"] == np.array([0, 5, 23], dtype="timedelta64[h]")).all()
+        assert blocks["precipitation"][:2].tolist() == [1.0, 3.0] and np.isnan(blocks["precipitation"][2])
+
+    def test_merge_hours_prefers_rows(self):
+        def columns(dates, hours, values):
+            return {
+                "date": np.array(dates, dtype="datetime64[D]"),
+                "time": np.array(hours, dtype="timedelta64[h]").astype("timedelta64[s]"),
+                "precipitation": np.array(values, dtype=float),
+            }
+        rows = columns(["2024-06-01", "2024-06-02", "2024-06-02"], [5, 1, "NaT"], [9.0, 8.0, 7.0])
+        compacted = columns(["2024-06-01", "2024-06-01", "2024-06-02"], [0, 5, 3], [1.0, 3.0, 4.0])
+
+        merged = _merge_hours(rows, compacted)
+
+        assert merged["precipitation"].tolist() == [1.0, 9.0, 8.0, 4.0, 7.0]
+
+    def test_writers_route_to_arrays(self, mocker):
+        mocker.patch("crud.crud_data.settings.DATA_STORE_DAILY_ARRAYS", True)
+        write_hours = mocker.patch("crud.crud_data.data_compact.write_hours", return_value={datetime.date(2024, 6, 1): 2})
+        refresh = mocker.patch("crud.crud_data.data_daily.refresh")
+        session = MagicMock()
+        session.get_bind.return_value.dialect.name = "postgresql"
+
+        written = crud.data.batch_insert(db=session, list_of_data=_hours((1, 0), (1, 1), (2, 0)), parcel_id=3)
+
+        assert written == 2
+        assert write_hours.call_args.kwargs["values"]["time"].tolist() == [datetime.time(0), datetime.time(1),
+                                                                           datetime.time(0)]
+        assert refresh.call_args.kwargs["dates"] == [datetime.date(2024, 6, 1)]
+        session.execute.assert_not_called()
+        session.commit.assert_called_once()
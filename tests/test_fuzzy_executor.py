@@ -0,0 +1,99 @@
+"""
+Tests for app/utils/fuzzy_executor.py: partitioned process-pool scoring must
+reproduce the inline single-pass result.
+"""
+
+from __future__ import annotations
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from core.config import settings
+from utils import fuzzy_executor
+from utils.fuzzy_executor import _lookback_rows, _model_groups, _season_chunks
+from utils.fuzzy_risk import (
+    _score_threat_models_inline,
+    compile_threat_model,
+    plan_features,
+    score_threat_models,
+)
+
+from test_fuzzy_risk import _PARITY_MODELS, _synthetic_weather
+
+
+@pytest.fixture
+def pool(monkeypatch):
+    monkeypatch.setattr(settings, "FUZZY_PROCESS_WORKERS", 3)
+    monkeypatch.setattr(settings, "FUZZY_PROCESS_MIN_MODEL_DAYS", 0)
+    yield
+    fuzzy_executor.shutdown_executor()
+
+
+def _assert_same(result, expected):
+    assert [tm.scientific_name for tm, _ in result] == [tm.scientific_name for tm, _ in expected]
+    for (_, got), (_, want) in zip(result, expected):
+        assert (pd.to_datetime(got["date"]) == pd.to_datetime(want["date"])).all()
+        assert got["score"].tolist() == want["score"].tolist()
+        assert got["risk_class"].tolist() == want["risk_class"].tolist()
+        assert got["detail"].tolist() == want["detail"].tolist()
+
+
+class TestScorePartitioned:
+    @pytest.fixture(scope="class")
+    def weather(self) -> pd.DataFrame:
+        # three seasons plus a long humid spell across the second new year
+        df = _synthetic_weather(days=1000, seed=11)
+        df.loc[715:745, "humidity"] = 95.0
+        return df
+
+    @pytest.fixture(scope="class")
+    def models(self):
+        return [compile_threat_model(tm) for tm in _PARITY_MODELS]
+
+    def test_matches_inline(self, pool, weather, models):
+        expected = _score_threat_models_inline(weather, models)
+        result   = score_threat_models(weather, models)
+        _assert_same(result, expected)
+
+    def test_seed_only_shifts_first_season(self, pool, weather, models):
+        seed = {"8b": 250.0, "10b": 180.0}
+        expected = _score_threat_models_inline(weather, models, gdd_seed=seed)
+        result   = score_threat_models(weather, models, gdd_seed=seed)
+        _assert_same(result, expected)
+
+    def test_disabled_pool_stays_inline(self, monkeypatch, weather, models):
+        monkeypatch.setattr(settings, "FUZZY_PROCESS_WORKERS", 0)
+        assert not fuzzy_executor.should_partition(weather, models)
+
+    def test_small_jobs_stay_inline(self, pool, monkeypatch, weather, models):
+        monkeypatch.setattr(settings, "FUZZY_PROCESS_MIN_MODEL_DAYS", len(weather) * 10)
+        assert not fuzzy_executor.should_partition(weather, models)
+
+    def test_precomputed_columns_stay_inline(self, pool, weather, models):
+        assert not fuzzy_executor.should_partition(weather.assign(gdd_cum_5b=0.0), models)
+
+
+class TestPartitioning:
+    def test_season_chunks_cover_rows_in_order(self):
+        bounds = [(0, 365), (365, 730), (730, 1000), (1000, 1100)]
+        chunks = _season_chunks(bounds, 2)
+        assert chunks[0][0] == 0 and chunks[-1][1] == 1100
+        assert all(a[1] == b[0] for a, b in zip(chunks, chunks[1:]))
+        assert len(chunks) <= 2
+
+    def test_more_parts_than_seasons(self):
+        assert _season_chunks([(0, 10), (10, 20)], 8) == [(0, 10), (10, 20)]
+
+    def test_model_groups_round_robin(self):
+        assert _model_groups(list("abcde"), 2) == [[0, 2, 4], [1, 3]]
+        assert _model_groups(list("ab"), 5) == [[0], [1]]
+
+    def test_lookback_follows_humid_streak(self):
+        models   = [compile_threat_model(tm) for tm in _PARITY_MODELS]
+        humidity = np.full(100, 50.0)
+        humidity[40:60] = 90.0
+        lookback = _lookback_rows(humidity, plan_features(models))
+        assert lookback(0) == 0
+        assert lookback(60) == 20
+        assert lookback(80) == 6
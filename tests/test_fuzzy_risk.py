@@ -5,9 +5,13 @@ Uses other/weather_data.xlsx as sample input.
 
 from __future__ import annotations
 
+import datetime
+import uuid
 from dataclasses import dataclass
 from pathlib import Path
+from unittest.mock import MagicMock
 
+import numpy as np
 import pandas as pd
 import pytest
 
@@ -19,6 +23,11 @@ from utils.fuzzy_risk import (
     membership_rainfall,
     membership_phenology,
     score_day,
+    compile_threat_model,
+    CompiledThreatModel,
+    ThreatModelCatalog,
+    FeaturePlan,
+    plan_features,
     _trapezoid,
     _definition_to_rules,
 )
@@ -512,3 +521,299 @@ class TestCalculateFuzzyRisk:
         assert len(result) == len(raw_weather)
         assert (result["risk_score"] >= 0.0).all()
         assert (result["risk_score"] <= 100.0).all()
+
+
+# ─── score_period parity ─────────────────────────────────────────────────────
+
+def _synthetic_weather(days: int = 800, seed: int = 7) -> pd.DataFrame:
+    """Seasonal daily weather with lethal extremes, dry spells and a NaN gap."""
+    rng   = np.random.default_rng(seed)
+    doy   = np.arange(days)
+    t_avg = 12.0 + 12.0 * np.sin(2 * np.pi * (doy - 100) / 365.0) + rng.normal(0, 4, days)
+    spread = rng.uniform(4.0, 14.0, days)
+    noise = np.zeros(days)
+    for i in range(1, days):
+        noise[i] = 0.8 * noise[i - 1] + rng.normal(0, 6)
+    humidity = np.clip(72.0 + 12.0 * np.cos(2 * np.pi * doy / 365.0) + noise, 20.0, 100.0)
+    rainfall = np.where(rng.random(days) < 0.35, rng.gamma(1.2, 4.0, days), 0.0)
+    df = pd.DataFrame({
+        "date":     pd.date_range("2022-01-01", periods=days, freq="D"),
+        "temp_max": t_avg + spread / 2,
+        "temp_min": t_avg - spread / 2,
+        "humidity": humidity,
+        "rainfall": rainfall,
+    })
+    df.loc[30:33, "temp_min"] = -15.0
+    df.loc[560:562, "temp_max"] = 45.0
+    df.loc[400:402, "humidity"] = np.nan
+    return df
+
+
+def _reference_fuzzy_risk(weather_df: pd.DataFrame, threat_models: list) -> pd.DataFrame:
+    """Row-by-row score_day loop the vectorised engine must reproduce."""
+    extra_t_bases = {
+        float(v if (v := (tm.definition.get("bio_params") or {}).get("t_base")) is not None else 5.0)
+        for tm in threat_models
+    }
+    enriched = compute_features(weather_df, extra_t_bases=extra_t_bases)
+    results = []
+    for tm in threat_models:
+        bio_params = tm.definition.get("bio_params") or {}
+        rules      = _definition_to_rules(tm.definition)
+        if not rules:
+            continue
+        for _, row in enriched.iterrows():
+            res = score_day(row, rules, tm.scientific_name, bio_params)
+            results.append({
+                "date":            row["date"],
+                "scientific_name": tm.scientific_name,
+                "common_name":     tm.common_name,
+                "risk_score":      res["score"],
+                "risk_class":      res["risk_class"],
+                "detail":          res["detail"],
+            })
+    return pd.DataFrame(results)
+
+
+_PARITY_MODELS = [
+    FakeThreatModel(
+        scientific_name="Plasmopara viticola", common_name="Downy mildew",
+        definition={
+            "bio_params": {
+                "t_base": 8.0, "t_lethal_min": -2.0, "t_lethal_max": 38.0,
+                "min_streak": 3, "pheno_frac_lo": 0.05, "pheno_frac_hi": 0.90,
+                "min_wetness_hours_critical": 10.0, "min_wetness_hours_high": 4.0,
+            },
+            "fuzzy_rules": [
+                {"hum_lo": 80.0, "hum_hi": 100.0, "temp_lo": 10.0, "temp_hi": 24.0,
+                 "rain_min": 5.0, "risk_level": "critical"},
+                {"hum_lo": 70.0, "hum_hi": 100.0, "temp_lo": 8.0, "temp_hi": 28.0,
+                 "rain_min": 1.0, "risk_level": "high"},
+            ],
+        },
+    ),
+    FakeThreatModel(
+        scientific_name="Lobesia botrana", common_name="Grape moth",
+        definition={
+            "bio_params": {
+                "t_base": 10.0, "pheno_lo": 400.0, "pheno_hi": 1200.0,
+                "min_streak": 2, "t_lethal_max": 36.0,
+            },
+            "fuzzy_rules": [
+                {"hum_lo": 40.0, "hum_hi": 80.0, "temp_lo": 18.0, "temp_hi": 30.0,
+                 "rain_min": 0.0, "risk_level": "high"},
+                {"hum_lo": 0.0, "hum_hi": 100.0, "temp_lo": 12.0, "temp_hi": 32.0,
+                 "rain_min": 0.0, "risk_level": "moderate"},
+            ],
+        },
+    ),
+    FakeThreatModel(
+        scientific_name="Arborea-arboris", common_name="arbor",
+        definition={
+            "bio_params": None,
+            "fuzzy_rules": [
+                {"hum_hi": 100, "hum_lo": 0, "temp_hi": 999, "temp_lo": -999,
+                 "rain_min": 0, "risk_level": "low"},
+            ],
+        },
+    ),
+]
+
+
+class TestScorePeriodParity:
+    @pytest.fixture(scope="class")
+    def synthetic_weather(self) -> pd.DataFrame:
+        return _synthetic_weather()
+
+    @pytest.mark.parametrize(
+        "threat_model",
+        _PARITY_MODELS,
+        ids=[tm.scientific_name for tm in _PARITY_MODELS],
+    )
+    def test_matches_per_row_scoring(self, synthetic_weather: pd.DataFrame, threat_model):
+        expected = _reference_fuzzy_risk(synthetic_weather, [threat_model])
+        result   = calculate_fuzzy_risk(synthetic_weather, [threat_model])
+        assert list(result.columns) == list(expected.columns)
+        assert (pd.to_datetime(result["date"]) == pd.to_datetime(expected["date"])).all()
+        assert result["risk_score"].tolist() == expected["risk_score"].tolist()
+        assert result["risk_class"].tolist() == expected["risk_class"].tolist()
+        assert result["detail"].tolist() == expected["detail"].tolist()
+
+    def test_fixture_hits_every_class(self, synthetic_weather: pd.DataFrame):
+        result = calculate_fuzzy_risk(synthetic_weather, _PARITY_MODELS)
+        assert {"Low", "Moderate", "High", "Critical", "Out of season"} <= set(result["risk_class"])
+
+    def test_multi_model_order(self, synthetic_weather: pd.DataFrame):
+        expected = _reference_fuzzy_risk(synthetic_weather, _PARITY_MODELS)
+        result   = calculate_fuzzy_risk(synthetic_weather, _PARITY_MODELS)
+        assert result["scientific_name"].tolist() == expected["scientific_name"].tolist()
+        assert result["risk_score"].tolist() == expected["risk_score"].tolist()
+
+
+# ─── compiled threat models / catalog ────────────────────────────────────────
+
+def _db_threat_model(name: str, updated_at: datetime.datetime) -> MagicMock:
+    tm = MagicMock()
+    tm.id              = uuid.uuid4()
+    tm.scientific_name = name
+    tm.common_name     = name
+    tm.updated_at      = updated_at
+    tm.definition      = _PARITY_MODELS[0].definition
+    return tm
+
+
+class TestCompileThreatModel:
+    def test_compiled_fields(self, fungal_threat_model: FakeThreatModel):
+        compiled = compile_threat_model(fungal_threat_model)
+        assert compiled.t_base == 5.0
+        assert compiled.is_pathogen
+        assert [r["risk"] for r in compiled.rules] == ["High", "Moderate"]
+
+    def test_null_t_base_defaults(self):
+        tm = FakeThreatModel("X", "Y", {"bio_params": {"t_base": None}, "fuzzy_rules": []})
+        compiled = compile_threat_model(tm)
+        assert compiled.t_base == 5.0
+        assert not compiled.is_pathogen
+
+    def test_calculate_accepts_compiled(self, fungal_threat_model: FakeThreatModel):
+        weather  = _synthetic_weather(days=120)
+        compiled = compile_threat_model(fungal_threat_model)
+        assert isinstance(compiled, CompiledThreatModel)
+        pd.testing.assert_frame_equal(
+            calculate_fuzzy_risk(weather, [compiled]),
+            calculate_fuzzy_risk(weather, [fungal_threat_model]),
+        )
+
+
+class TestThreatModelCatalog:
+    @pytest.fixture
+    def mock_crud(self, mocker) -> MagicMock:
+        return mocker.patch("utils.fuzzy_risk.crud")
+
+    def test_second_resolve_loads_nothing(self, mock_crud: MagicMock):
+        stamp = datetime.datetime(2026, 1, 1)
+        tm = _db_threat_model("Plasmopara viticola", stamp)
+        mock_crud.threat_model.get_versions.return_value = [(tm.id, stamp)]
+        mock_crud.threat_model.get_by_ids.return_value   = [tm]
+
+        catalog = ThreatModelCatalog()
+        first  = catalog.resolve(MagicMock(), [tm.id])
+        second = catalog.resolve(MagicMock(), [tm.id])
+
+        assert first == second
+        assert mock_crud.threat_model.get_by_ids.call_count == 1
+
+    def test_version_change_recompiles(self, mock_crud: MagicMock):
+        stamp = datetime.datetime(2026, 1, 1)
+        tm = _db_threat_model("Plasmopara viticola", stamp)
+        mock_crud.threat_model.get_versions.return_value = [(tm.id, stamp)]
+        mock_crud.threat_model.get_by_ids.return_value   = [tm]
+        catalog = ThreatModelCatalog()
+        catalog.resolve(MagicMock())
+
+        newer = stamp + datetime.timedelta(minutes=1)
+        tm.updated_at = newer
+        tm.common_name = "Downy mildew"
+        mock_crud.threat_model.get_versions.return_value = [(tm.id, newer)]
+        (compiled,) = catalog.resolve(MagicMock())
+
+        assert compiled.common_name == "Downy mildew"
+        assert mock_crud.threat_model.get_by_ids.call_count == 2
+
+    def test_invalidate_forces_reload(self, mock_crud: MagicMock):
+        stamp = datetime.datetime(2026, 1, 1)
+        tm = _db_threat_model("Lobesia botrana", stamp)
+        mock_crud.threat_model.get_versions.return_value = [(tm.id, stamp)]
+        mock_crud.threat_model.get_by_ids.return_value   = [tm]
+        catalog = ThreatModelCatalog()
+        catalog.resolve(MagicMock())
+        catalog.invalidate(tm.id)
+        catalog.resolve(MagicMock())
+        assert mock_crud.threat_model.get_by_ids.call_count == 2
+
+    def test_deleted_models_dropped(self, mock_crud: MagicMock):
+        stamp = datetime.datetime(2026, 1, 1)
+        tm = _db_threat_model("Lobesia botrana", stamp)
+        mock_crud.threat_model.get_versions.return_value = [(tm.id, stamp)]
+        mock_crud.threat_model.get_by_ids.return_value   = [tm]
+        catalog = ThreatModelCatalog()
+        catalog.resolve(MagicMock())
+
+        mock_crud.threat_model.get_versions.return_value = []
+        assert catalog.resolve(MagicMock()) == []
+
+
+# ─── compute_features kernel ─────────────────────────────────────────────────
+
+class TestComputeFeaturesKernel:
+    @pytest.fixture(scope="class")
+    def enriched(self) -> pd.DataFrame:
+        weather = _synthetic_weather().sample(frac=1.0, random_state=3)
+        return compute_features(weather, extra_t_bases={8.0, 12.5})
+
+    def test_streaks_match_running_count(self, enriched: pd.DataFrame):
+        for thr in [60, 70, 80, 85, 90, 95]:
+            count, expected = 0, []
+            for h in enriched["humidity"]:
+                count = count + 1 if h >= thr else 0
+                expected.append(count)
+            assert enriched[f"streak_hum{thr}"].tolist() == expected
+
+    def test_gdd_matches_per_season_cumsum(self, enriched: pd.DataFrame):
+        for label in ["0b", "5b", "8b", "10b", "12b"]:
+            expected = enriched.groupby("season_year")[f"gdd_daily_{label}"].cumsum()
+            np.testing.assert_allclose(
+                enriched[f"gdd_cum_{label}"], expected, rtol=1e-12, equal_nan=True
+            )
+        np.testing.assert_allclose(enriched["gdd_cum_pheno"], enriched["gdd_cum_5b"])
+
+    def test_nan_humidity_breaks_streak(self, enriched: pd.DataFrame):
+        gap = enriched["humidity"].isna()
+        assert gap.any()
+        assert (enriched.loc[gap, "streak_hum60"] == 0).all()
+
+    def test_precomputed_gdd_column_kept(self):
+        weather = _synthetic_weather(days=30)
+        weather["gdd_cum_5b"] = 123.0
+        enriched = compute_features(weather)
+        assert (enriched["gdd_cum_5b"] == 123.0).all()
+        assert list(enriched.columns).count("gdd_cum_5b") == 1
+
+
+# ─── feature plans ───────────────────────────────────────────────────────────
+
+class TestFeaturePlan:
+    def test_insect_plan_skips_pathogen_features(self, insect_threat_model: FakeThreatModel):
+        plan = plan_features([compile_threat_model(insect_threat_model)])
+        enriched = compute_features(_synthetic_weather(days=60), plan=plan)
+        assert "streak_hum60" in enriched.columns
+        assert "gdd_cum_10b" in enriched.columns
+        for col in ["temp_avg_7d", "humidity_7d", "streak_hum70", "vpd", "gdd_cum_0b"]:
+            assert col not in enriched.columns
+        assert enriched.attrs["feature_plan"] == plan.describe()
+
+    def test_pathogen_plan_includes_7d(self, fungal_threat_model: FakeThreatModel):
+        plan = plan_features([compile_threat_model(fungal_threat_model)])
+        assert 7 in plan.windows
+        assert plan.streak_thresholds == (70,)
+        assert plan.gdd_labels == ("5b",)
+
+    def test_no_phenology_params_no_gdd(self):
+        tm = FakeThreatModel("X", "Y", {"bio_params": {}, "fuzzy_rules": []})
+        plan = plan_features([compile_threat_model(tm)])
+        assert plan.t_bases() == {}
+
+    def test_label_collision_matches_full_plan(self):
+        tm = FakeThreatModel(
+            "X", "Y", {"bio_params": {"t_base": 5.5, "pheno_lo": 10, "pheno_hi": 500},
+                       "fuzzy_rules": []},
+        )
+        plan = plan_features([compile_threat_model(tm)])
+        assert plan.t_bases() == {"5b": 5.0}
+        assert FeaturePlan.full({5.5}).t_bases()["5b"] == 5.0
+
+    def test_default_builds_everything(self):
+        enriched = compute_features(_synthetic_weather(days=60))
+        for col in ["temp_avg_14d", "rain_10d", "wetness_3d", "vpd_7d",
+                    "gdd_cum_pheno", "gdd_annual_ref", "streak_hum95"]:
+            assert col in enriched.columns
@@ -0,0 +1,204 @@
+"""
+Unit tests for app/utils/fuzzy_risk_daily.py (materialized fuzzy risk).
+crud and the GDD snapshot helpers are patched, so no database is needed.
+"""
+
+from __future__ import annotations
+
+import datetime
+import uuid
+from types import SimpleNamespace
+from unittest.mock import MagicMock
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import crud
+from utils.fuzzy_risk import compile_threat_model
+from utils.fuzzy_risk_daily import (
+    load_materialized_risk,
+    materialize_fuzzy_risk,
+    materialize_missing_fuzzy_risk,
+    score_missing_days,
+)
+
+MODULE = "utils.fuzzy_risk_daily"
+VERSION = datetime.datetime(2026, 1, 1, 12, 0)
+
+
+def _threat_model(name: str = "Plasmopara viticola", version=VERSION):
+    return compile_threat_model(SimpleNamespace(
+        id=uuid.uuid4(), scientific_name=name, common_name=name, updated_at=version,
+        definition={
+            "bio_params": {"min_streak": 1},
+            "fuzzy_rules": [
+                {"hum_lo": 60.0, "hum_hi": 100.0, "temp_lo": 5.0, "temp_hi": 30.0,
+                 "rain_min": 0.0, "risk_level": "high"},
+            ],
+        },
+    ))
+
+
+def _daily_rows(start: datetime.date, days: int) -> list[SimpleNamespace]:
+    """data_daily rollup rows."""
+    rng = np.random.default_rng(5)
+    return [
+        SimpleNamespace(
+            date=start + datetime.timedelta(days=d),
+            temp_min=float(rng.uniform(5, 12)),
+            temp_max=float(rng.uniform(15, 25)),
+            humidity_mean=float(rng.uniform(50, 100)),
+            precipitation_sum=float(rng.uniform(0, 8)),
+        )
+        for d in range(days)
+    ]
+
+
+@pytest.fixture
+def mock_crud(mocker) -> MagicMock:
+    crud = mocker.patch(f"{MODULE}.crud")
+    crud.fuzzy_risk_daily.upsert.side_effect = lambda db, rows: len(rows)
+    mocker.patch(f"{MODULE}.gdd_seed_for_window", return_value={})
+    mocker.patch(f"{MODULE}.gdd_annual_refs", return_value={})
+    return crud
+
+
+class TestMaterializeFuzzyRisk:
+    def test_reads_lookback_and_stores_only_new_days(self, mock_crud: MagicMock):
+        tm = _threat_model()
+        from_date = datetime.date(2024, 6, 15)
+        mock_crud.data_daily.get_range.return_value = _daily_rows(datetime.date(2024, 6, 1), 20)
+
+        written = materialize_fuzzy_risk(MagicMock(), 7, from_date, threat_models=[tm])
+
+        read = mock_crud.data_daily.get_range.call_args.kwargs
+        assert read["start"] == datetime.date(2024, 6, 1)
+        rows = mock_crud.fuzzy_risk_daily.upsert.call_args.kwargs["rows"]
+        assert written == 6
+        assert [r["date"] for r in rows] == [from_date + datetime.timedelta(days=d) for d in range(6)]
+        assert {r["threat_model_id"] for r in rows} == {tm.id}
+        assert {r["model_version"] for r in rows} == {VERSION}
+
+    def test_no_weather_writes_nothing(self, mock_crud: MagicMock):
+        mock_crud.data_daily.get_range.return_value = []
+        assert materialize_fuzzy_risk(
+            MagicMock(), 7, datetime.date(2024, 6, 15), threat_models=[_threat_model()],
+        ) == 0
+        mock_crud.fuzzy_risk_daily.upsert.assert_not_called()
+
+
+class TestLoadMaterializedRisk:
+    START = datetime.date(2024, 6, 1)
+    END   = datetime.date(2024, 6, 3)
+
+    def _stored(self, tm, days, version=VERSION):
+        return [
+            SimpleNamespace(
+                threat_model_id=tm.id, model_version=version,
+                date=self.START + datetime.timedelta(days=d),
+                risk_score=40.0, risk_class="Moderate", detail="x",
+            )
+            for d in range(days)
+        ]
+
+    def test_complete_model_served_from_table(self, mock_crud: MagicMock):
+        tm = _threat_model()
+        mock_crud.data_daily.get_dates.return_value = [self.START + datetime.timedelta(days=d) for d in range(3)]
+        mock_crud.fuzzy_risk_daily.get_range.return_value = self._stored(tm, 3)
+
+        stored, missing = load_materialized_risk(MagicMock(), 7, [tm], self.START, self.END)
+
+        assert missing == []
+        assert len(stored) == 3
+        assert list(stored.columns) == [
+            "date", "scientific_name", "common_name", "risk_score", "risk_class", "detail",
+        ]
+
+    def test_gap_or_stale_version_returns_missing_days(self, mock_crud: MagicMock):
+        partial, stale = _threat_model("A"), _threat_model("B")
+        dates = [self.START + datetime.timedelta(days=d) for d in range(3)]
+        mock_crud.data_daily.get_dates.return_value = dates
+        mock_crud.fuzzy_risk_daily.get_range.return_value = (
+            self._stored(partial, 2) + self._stored(stale, 3, version=datetime.datetime(2025, 1, 1))
+        )
+
+        stored, missing = load_materialized_risk(
+            MagicMock(), 7, [partial, stale], self.START, self.END,
+        )
+
+        assert len(stored) == 2
+        assert set(stored["scientific_name"]) == {"A"}
+        assert missing == [(partial, [self.END]), (stale, dates)]
+
+    def test_no_weather_dates_nothing_to_serve(self, mock_crud: MagicMock):
+        tm = _threat_model()
+        mock_crud.data_daily.get_dates.return_value = []
+        stored, missing = load_materialized_risk(MagicMock(), 7, [tm], self.START, self.END)
+        assert stored.empty
+        assert missing == []
+        mock_crud.fuzzy_risk_daily.get_range.assert_not_called()
+
+
+class TestScoreMissingDays:
+    def test_scores_only_the_missing_days(self, mock_crud: MagicMock):
+        tm = _threat_model()
+        day = datetime.date(2024, 6, 20)
+        mock_crud.data_daily.get_range.return_value = _daily_rows(datetime.date(2024, 6, 1), 25)
+
+        results = score_missing_days(MagicMock(), 7, [(tm, [day])])
+
+        read = mock_crud.data_daily.get_range.call_args.kwargs
+        assert (read["start"], read["end"]) == (datetime.date(2024, 6, 6), day)
+        assert [d.date() for d in results["date"]] == [day]
+        assert list(results.columns) == [
+            "date", "scientific_name", "common_name", "risk_score", "risk_class", "detail",
+        ]
+
+    def test_distant_gaps_read_separately(self, mock_crud: MagicMock):
+        a, b = _threat_model("A"), _threat_model("B")
+        early, late = datetime.date(2024, 6, 2), datetime.date(2024, 8, 1)
+        mock_crud.data_daily.get_range.side_effect = lambda db, parcel_id, start, end: _daily_rows(start, (end - start).days + 1)
+
+        results = score_missing_days(MagicMock(), 7, [(a, [early]), (b, [early, late])])
+
+        reads = [c.kwargs["end"] for c in mock_crud.data_daily.get_range.call_args_list]
+        assert reads == [early, late]
+        assert sorted(zip(results["scientific_name"], results["date"].dt.date)) == [
+            ("A", early), ("B", early), ("B", late),
+        ]
+
+
+def test_materialize_missing_starts_at_the_first_gap(mock_crud: MagicMock, mocker):
+    complete, gap = _threat_model("A"), _threat_model("B")
+    start, end = datetime.date(2024, 6, 1), datetime.date(2024, 6, 3)
+    dates = [start + datetime.timedelta(days=d) for d in range(3)]
+    mock_crud.data_daily.get_dates.return_value = dates
+    mock_crud.fuzzy_risk_daily.get_range.return_value = [
+        SimpleNamespace(threat_model_id=tm.id, model_version=VERSION, date=day)
+        for tm, days in ((complete, dates), (gap, dates[:1]))
+        for day in days
+    ]
+    materialize = mocker.patch(f"{MODULE}.materialize_fuzzy_risk", return_value=2)
+
+    assert materialize_missing_fuzzy_risk(MagicMock(), 7, start, end, threat_models=[complete, gap]) == 2
+    assert materialize.call_args.args[2] == dates[1]
+    assert materialize.call_args.kwargs["threat_models"] == [gap]
+
+    mock_crud.fuzzy_risk_daily.get_range.return_value += [
+        SimpleNamespace(threat_model_id=gap.id, model_version=VERSION, date=day) for day in dates[1:]
+    ]
+    materialize.reset_mock()
+    assert materialize_missing_fuzzy_risk(MagicMock(), 7, start, end, threat_models=[complete, gap]) == 0
+    materialize.assert_not_called()
+
+
+def test_upsert_chunks_large_batches(mocker):
+    mocker.patch.object(crud.fuzzy_risk_daily, "INSERT_CHUNK_SIZE", 2)
+    session = MagicMock()
+    rows = [{"parcel_id": 7, "threat_model_id": uuid.uuid4(), "model_version": VERSION,
+             "date": datetime.date(2024, 6, d), "risk_score": 0.5, "risk_class": "low", "detail": None}
+            for d in range(1, 6)]
+    assert crud.fuzzy_risk_daily.upsert(db=session, rows=rows) == 5
+    assert session.execute.call_count == 3
+    session.commit.assert_called_once()
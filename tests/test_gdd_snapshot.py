@@ -0,0 +1,224 @@
+"""
+Unit tests for app/utils/gdd_snapshot.py, crud.gdd_snapshot.upsert and GDD
+seeding in compute_features. crud is patched, so no database is needed.
+"""
+
+from __future__ import annotations
+
+import datetime
+from types import SimpleNamespace
+from unittest.mock import MagicMock
+
+import numpy as np
+import pandas as pd
+import pytest
+from sqlalchemy.exc import OperationalError
+
+import crud
+from utils.fuzzy_risk import compile_threat_model, compute_features
+from utils.gdd_snapshot import gdd_seed_for_window, refresh_after_ingest, refresh_gdd_snapshots, season_of
+
+MODULE = "utils.gdd_snapshot"
+
+
+def _day(d: datetime.date, t_min: float, t_max: float) -> SimpleNamespace:
+    return SimpleNamespace(date=d, temp_min=t_min, temp_max=t_max)
+
+
+@pytest.fixture
+def mock_crud(mocker) -> MagicMock:
+    crud = mocker.patch(f"{MODULE}.crud")
+    crud.gdd_snapshot.upsert.side_effect = lambda db, rows: len(rows)
+    return crud
+
+
+class TestSeasonOf:
+    def test_january_reset(self):
+        assert season_of(datetime.date(2024, 2, 1), reset_month=1) == 2024
+
+    def test_july_reset(self):
+        assert season_of(datetime.date(2024, 3, 1), reset_month=7) == 2023
+        assert season_of(datetime.date(2024, 7, 1), reset_month=7) == 2024
+
+
+class TestRefreshGddSnapshots:
+    def test_full_build_resets_each_season(self, mock_crud: MagicMock):
+        mock_crud.gdd_snapshot.get_last.return_value = None
+        mock_crud.data_daily.get_range.return_value = [
+            _day(datetime.date(2023, 12, 30), 8.0, 12.0),
+            _day(datetime.date(2023, 12, 31), 10.0, 14.0),
+            _day(datetime.date(2024, 1, 1), 6.0, 10.0),
+            _day(datetime.date(2024, 1, 2), None, None),
+        ]
+
+        written = refresh_gdd_snapshots(MagicMock(), parcel_id=1, t_bases=[5.0])
+
+        rows = mock_crud.gdd_snapshot.upsert.call_args.kwargs["rows"]
+        assert written == 3
+        assert [r["gdd_cum"] for r in rows] == [5.0, 12.0, 3.0]
+        assert [r["season_year"] for r in rows] == [2023, 2023, 2024]
+        assert mock_crud.data_daily.get_range.call_args.kwargs["start"] is None
+
+    def test_incremental_continues_from_seed(self, mock_crud: MagicMock):
+        last = SimpleNamespace(date=datetime.date(2024, 5, 10), season_year=2024, gdd_cum=300.0)
+        seed = SimpleNamespace(date=datetime.date(2024, 5, 9), season_year=2024, gdd_cum=290.0)
+        mock_crud.gdd_snapshot.get_last.return_value   = last
+        mock_crud.gdd_snapshot.get_before.return_value = seed
+        mock_crud.data_daily.get_range.return_value = [
+            _day(datetime.date(2024, 5, 10), 10.0, 20.0),
+            _day(datetime.date(2024, 5, 11), 12.0, 22.0),
+        ]
+
+        refresh_gdd_snapshots(MagicMock(), parcel_id=1, t_bases=[5.0])
+
+        rows = mock_crud.gdd_snapshot.upsert.call_args.kwargs["rows"]
+        assert [r["gdd_cum"] for r in rows] == [300.0, 312.0]
+        assert mock_crud.data_daily.get_range.call_args.kwargs["start"] == last.date
+
+    def test_backfill_rewrites_from_from_date(self, mock_crud: MagicMock):
+        mock_crud.gdd_snapshot.get_last.return_value = SimpleNamespace(
+            date=datetime.date(2024, 5, 10), season_year=2024, gdd_cum=300.0,
+        )
+        mock_crud.gdd_snapshot.get_before.return_value = None
+        mock_crud.data_daily.get_range.return_value = []
+
+        refresh_gdd_snapshots(
+            MagicMock(), parcel_id=1, t_bases=[5.0], from_date=datetime.date(2024, 4, 1),
+        )
+
+        kwargs = mock_crud.data_daily.get_range.call_args.kwargs
+        assert kwargs["start"] == datetime.date(2024, 4, 1)
+
+
+class TestUpsert:
+    ROWS = [{"parcel_id": 1, "t_base": 5.0, "season_year": 2024, "date": datetime.date(2024, 1, d),
+             "gdd_cum": float(d)} for d in range(1, 8)]
+
+    def test_chunks_large_refreshes(self, mocker):
+        mocker.patch.object(crud.gdd_snapshot, "INSERT_CHUNK_SIZE", 3)
+        session = MagicMock()
+        assert crud.gdd_snapshot.upsert(db=session, rows=self.ROWS) == 7
+        assert session.execute.call_count == 3
+        session.commit.assert_called_once()
+
+    def test_errors_are_raised(self):
+        session = MagicMock()
+        session.execute.side_effect = OperationalError("INSERT", {}, Exception("too many parameters"))
+        with pytest.raises(OperationalError):
+            crud.gdd_snapshot.upsert(db=session, rows=self.ROWS)
+        session.commit.assert_not_called()
+        session.rollback.assert_not_called()
+
+
+class TestRefreshAfterIngest:
+    @pytest.fixture(autouse=True)
+    def catalog(self, mocker) -> MagicMock:
+        return mocker.patch(f"{MODULE}.threat_model_catalog.resolve", return_value=[])
+
+    def test_drops_materialized_risk_from_the_first_day(self, mock_crud: MagicMock):
+        mock_crud.gdd_snapshot.get_t_bases.return_value = [7.0]
+        mock_crud.gdd_snapshot.get_last.return_value = None
+        mock_crud.data_daily.get_range.return_value = []
+
+        refresh_after_ingest(MagicMock(), 1, datetime.date(2024, 4, 1))
+
+        kwargs = mock_crud.fuzzy_risk_daily.remove_from.call_args.kwargs
+        assert (kwargs["parcel_id"], kwargs["start"]) == (1, datetime.date(2024, 4, 1))
+        assert mock_crud.gdd_snapshot.get_last.call_count == 4
+
+    def test_refreshes_the_threat_model_bases(self, mock_crud: MagicMock, catalog: MagicMock):
+        catalog.return_value = [compile_threat_model(SimpleNamespace(
+            scientific_name="Lobesia botrana", common_name="Grape moth",
+            definition={
+                "bio_params": {"t_base": 8.0, "pheno_lo": 400.0, "pheno_hi": 1200.0},
+                "fuzzy_rules": [{"risk_level": "high"}],
+            },
+        ))]
+        mock_crud.gdd_snapshot.get_t_bases.return_value = []
+        mock_crud.gdd_snapshot.get_last.return_value = None
+        mock_crud.data_daily.get_range.return_value = []
+
+        refresh_after_ingest(MagicMock(), 1, datetime.date(2024, 4, 1))
+
+        bases = [c.kwargs["t_base"] for c in mock_crud.gdd_snapshot.get_last.call_args_list]
+        assert sorted(bases) == [0.0, 5.0, 8.0, 10.0]
+
+
+class TestGddSeedForWindow:
+    @pytest.fixture
+    def pheno_model(self):
+        return compile_threat_model(SimpleNamespace(
+            scientific_name="Lobesia botrana", common_name="Grape moth",
+            definition={
+                "bio_params": {"t_base": 10.0, "pheno_lo": 400.0, "pheno_hi": 1200.0},
+                "fuzzy_rules": [{"risk_level": "high"}],
+            },
+        ))
+
+    def test_seed_from_same_season(self, mock_crud: MagicMock, pheno_model):
+        mock_crud.gdd_snapshot.get_last.return_value = SimpleNamespace(date=datetime.date(2024, 6, 10))
+        mock_crud.gdd_snapshot.get_before.return_value = SimpleNamespace(
+            date=datetime.date(2024, 5, 31), season_year=2024, gdd_cum=410.0,
+        )
+        seed = gdd_seed_for_window(MagicMock(), 1, pd.Timestamp("2024-06-01"), [pheno_model])
+        assert seed == {"10b": 410.0}
+        mock_crud.data_daily.get_range.assert_not_called()
+
+    def test_tail_after_last_snapshot_is_not_stored(self, mock_crud: MagicMock, pheno_model):
+        mock_crud.gdd_snapshot.get_last.return_value = SimpleNamespace(date=datetime.date(2024, 5, 30))
+        mock_crud.gdd_snapshot.get_before.return_value = SimpleNamespace(
+            date=datetime.date(2024, 5, 29), season_year=2024, gdd_cum=400.0,
+        )
+        mock_crud.data_daily.get_range.return_value = [
+            _day(datetime.date(2024, 5, 30), 10.0, 20.0),
+            _day(datetime.date(2024, 5, 31), 12.0, 22.0),
+        ]
+        db = MagicMock()
+
+        seed = gdd_seed_for_window(db, 1, datetime.date(2024, 6, 1), [pheno_model])
+
+        assert seed == {"10b": 412.0}
+        kwargs = mock_crud.data_daily.get_range.call_args.kwargs
+        assert (kwargs["start"], kwargs["end"]) == (datetime.date(2024, 5, 30), datetime.date(2024, 5, 31))
+        mock_crud.gdd_snapshot.upsert.assert_not_called()
+        db.commit.assert_not_called()
+
+    def test_previous_season_not_used(self, mock_crud: MagicMock, pheno_model):
+        mock_crud.gdd_snapshot.get_last.return_value = SimpleNamespace(date=datetime.date(2023, 12, 31))
+        mock_crud.gdd_snapshot.get_before.return_value = SimpleNamespace(
+            date=datetime.date(2023, 12, 31), season_year=2023, gdd_cum=1900.0,
+        )
+        mock_crud.data_daily.get_range.return_value = []
+        assert gdd_seed_for_window(MagicMock(), 1, datetime.date(2024, 1, 1), [pheno_model]) == {}
+
+    def test_no_phenology_no_queries(self, mock_crud: MagicMock):
+        tm = compile_threat_model(SimpleNamespace(
+            scientific_name="X", common_name="Y",
+            definition={"bio_params": {}, "fuzzy_rules": [{"risk_level": "low"}]},
+        ))
+        assert gdd_seed_for_window(MagicMock(), 1, datetime.date(2024, 6, 1), [tm]) == {}
+        mock_crud.gdd_snapshot.get_before.assert_not_called()
+
+
+class TestComputeFeaturesSeed:
+    def test_seeded_window_matches_full_period(self):
+        days    = 500
+        rng     = np.random.default_rng(11)
+        t_avg   = 12.0 + 10.0 * np.sin(2 * np.pi * (np.arange(days) - 100) / 365.0)
+        weather = pd.DataFrame({
+            "date":     pd.date_range("2023-01-01", periods=days, freq="D"),
+            "temp_max": t_avg + 4.0,
+            "temp_min": t_avg - 4.0,
+            "humidity": rng.uniform(40.0, 100.0, days),
+            "rainfall": rng.uniform(0.0, 5.0, days),
+        })
+        full = compute_features(weather)
+        cut  = 150
+        seed = {lb: full[f"gdd_cum_{lb}"].iloc[cut - 1] for lb in ["0b", "5b", "10b"]}
+
+        window = compute_features(weather.iloc[cut:], gdd_seed=seed)
+
+        for col in ["gdd_cum_0b", "gdd_cum_5b", "gdd_cum_10b", "gdd_cum_pheno"]:
+            np.testing.assert_allclose(
+                window[col].to_numpy(), full[col].iloc[cut:].to_numpy(), rtol=1e-9,
+            )
@@ -0,0 +1,24 @@
+import pytest
+
+from utils.grid import snap_to_grid
+
+
+class TestSnapToGrid:
+
+    def test_nearby_points_share_a_cell(self):
+        assert snap_to_grid(45.001, 14.002, 0.1) == snap_to_grid(44.998, 13.999, 0.1)
+
+    def test_distant_points_differ(self):
+        assert snap_to_grid(45.0, 14.0, 0.1) != snap_to_grid(45.2, 14.0, 0.1)
+
+    def test_snapped_values_are_clean(self):
+        assert snap_to_grid(45.04, -14.06, 0.1) == (45.0, -14.1)
+
+    def test_default_resolution_from_settings(self, monkeypatch):
+        from core.config import settings
+        monkeypatch.setattr(settings, "OPEN_METEO_GRID_RESOLUTION", 1.0)
+        assert snap_to_grid(45.4, 14.6) == (45.0, 15.0)
+
+    @pytest.mark.parametrize("resolution", [0, -1])
+    def test_non_positive_resolution_disables_snapping(self, resolution):
+        assert snap_to_grid(45.04, 14.06, resolution) == (45.04, 14.06)
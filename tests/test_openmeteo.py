@@ -0,0 +1,117 @@
+"""
+Unit tests for app/utils/openmeteo.py.
+The session and the flatbuffer framing are patched, so no request leaves the process.
+"""
+
+from __future__ import annotations
+
+from types import SimpleNamespace
+from unittest.mock import MagicMock
+
+import numpy as np
+import pytest
+import requests_cache
+
+from utils import openmeteo
+from utils.openmeteo import ARCHIVE_URL, FORECAST_URL, weather_api
+
+MODULE = "utils.openmeteo"
+
+
+def _message(values) -> SimpleNamespace:
+    variable = SimpleNamespace(ValuesAsNumpy=lambda: np.array(values, dtype=np.float32))
+    hourly = SimpleNamespace(Time=lambda: 0, TimeEnd=lambda: 3600 * len(values), Interval=lambda: 3600,
+                             VariablesLength=lambda: 1, Variables=lambda i: variable)
+    return SimpleNamespace(Hourly=lambda: hourly)
+
+
+@pytest.fixture
+def session(mocker) -> MagicMock:
+    openmeteo.reset()
+    session = MagicMock()
+    session.request.return_value.status_code = 200
+    mocker.patch(f"{MODULE}.get_session", return_value=session)
+    mocker.patch(f"{MODULE}._messages", side_effect=lambda data: [_message([1.0, 2.0])])
+    yield session
+    openmeteo.reset()
+
+
+@pytest.fixture
+def clock(mocker) -> list:
+    now = [1000.0]
+    mocker.patch(f"{MODULE}.time.monotonic", side_effect=lambda: now[0])
+    return now
+
+
+PARAMS = {"latitude": [45.0, 46.0], "longitude": [14.0, 15.0], "hourly": ["temperature_2m"]}
+
+
+class TestWeatherApi:
+    def test_warm_hit_skips_the_request(self, session):
+        [first] = weather_api(FORECAST_URL, params=PARAMS)
+        [second] = weather_api(FORECAST_URL, params=dict(reversed(list(PARAMS.items()))))
+
+        assert second is first
+        assert session.request.call_count == 1
+        hourly = second.Hourly()
+        assert (hourly.Time(), hourly.TimeEnd(), hourly.Interval()) == (0, 7200, 3600)
+        values = hourly.Variables(0).ValuesAsNumpy()
+        assert values.tolist() == [1.0, 2.0] and not values.flags.writeable
+        assert session.request.call_args.kwargs["params"]["format"] == "flatbuffers"
+
+    def test_ttl_per_api(self, session, clock):
+        weather_api(FORECAST_URL, params=PARAMS)
+        weather_api(ARCHIVE_URL, params=PARAMS)
+        assert [c.kwargs["expire_after"] for c in session.request.call_args_list] == [3600, -1]
+
+        clock[0] += 3601
+        weather_api(FORECAST_URL, params=PARAMS)
+        weather_api(ARCHIVE_URL, params=PARAMS)
+        assert [c.args[1] for c in session.request.call_args_list] == [FORECAST_URL, ARCHIVE_URL, FORECAST_URL]
+
+    def test_expire_after_overrides(self, session, clock):
+        weather_api(FORECAST_URL, params=PARAMS, expire_after=240)
+        clock[0] += 241
+        weather_api(FORECAST_URL, params=PARAMS, expire_after=240)
+        assert [c.kwargs["expire_after"] for c in session.request.call_args_list] == [240, 240]
+
+    def test_least_recently_used_is_dropped(self, session, mocker):
+        mocker.patch("core.config.settings.OPEN_METEO_FRAME_CACHE_SIZE", 2)
+        for latitude in (1.0, 2.0, 1.0, 3.0, 1.0, 2.0):
+            weather_api(FORECAST_URL, params={"latitude": latitude})
+        assert [c.kwargs["params"]["latitude"] for c in session.request.call_args_list] == [1.0, 2.0, 3.0, 2.0]
+
+    def test_api_error(self, session):
+        session.request.return_value.status_code = 429
+        session.request.return_value.json.return_value = {"reason": "Too many requests"}
+        with pytest.raises(openmeteo.OpenMeteoRequestsError):
+            weather_api(FORECAST_URL, params=PARAMS)
+        assert not openmeteo._frames
+
+
+class TestSession:
+    @pytest.fixture(autouse=True)
+    def fresh(self):
+        openmeteo.reset()
+        yield
+        openmeteo.reset()
+
+    def test_one_pooled_session_per_process(self, mocker, tmp_path):
+        mocker.patch("core.config.settings.OPEN_METEO_CACHE_BACKEND", "filesystem")
+        mocker.patch("core.config.settings.OPEN_METEO_CACHE_NAME", str(tmp_path / "cache"))
+        session = openmeteo.get_session()
+
+        assert openmeteo.get_session() is session
+        assert isinstance(session.cache, requests_cache.FileCache)
+        assert session.settings.urls_expire_after["archive-api.open-meteo.com"] == -1
+        adapter = session.get_adapter(FORECAST_URL)
+        assert adapter._pool_maxsize == 10 and adapter.max_retries.total == 5
+
+    def test_memory_backend(self, mocker):
+        mocker.patch("core.config.settings.OPEN_METEO_CACHE_BACKEND", "memory")
+        assert type(openmeteo.get_session().cache) is requests_cache.BaseCache
+
+    def test_unknown_backend(self, mocker):
+        mocker.patch("core.config.settings.OPEN_METEO_CACHE_BACKEND", "memcached")
+        with pytest.raises(ValueError):
+            openmeteo.get_session()
@@ -0,0 +1,355 @@
+"""
+Tests for app/utils/rule_compiler.py against the eval()-based rule engine it
+replaced in utils/risk_index.py and utils/wdutils.py.
+"""
+
+from __future__ import annotations
+
+import datetime
+import uuid
+from types import SimpleNamespace
+from unittest.mock import ANY, MagicMock
+
+import numpy as np
+import pandas as pd
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from utils.risk_index import (
+    calculate_risk_index_probability,
+    calculate_risk_index_probability_wd,
+    prob_values,
+)
+from models import Condition, Data, PestModel, Rule, Unit
+from utils.rule_compiler import (
+    PestModelCatalog,
+    PestRuleCache,
+    _forget_rolled_back_pest_models,
+    _invalidate_changed_pest_models,
+    _invalidate_committed_pest_models,
+    compile_pest_model,
+)
+from utils.wdutils import openmeteo_friendly_variables
+
+
+def _cond(unit: str, symbol: str, value: float) -> SimpleNamespace:
+    return SimpleNamespace(
+        unit=SimpleNamespace(name=unit), operator=SimpleNamespace(symbol=symbol), value=value,
+    )
+
+
+def _rule(rule_id: int, probability: str, *conditions) -> SimpleNamespace:
+    return SimpleNamespace(id=rule_id, probability_value=probability, conditions=list(conditions))
+
+
+def _pest_model(*rules) -> SimpleNamespace:
+    return SimpleNamespace(id=uuid.uuid4(), name="UNCINE", rules=list(rules))
+
+
+PEST_MODEL = _pest_model(
+    _rule(1, "moderate",
+          _cond("atmospheric_temperature", ">", 15.0),
+          _cond("atmospheric_relative_humidity", ">=", 60.0)),
+    _rule(2, "high",
+          _cond("atmospheric_temperature", ">", 20.0),
+          _cond("atmospheric_relative_humidity", ">", 80.0),
+          _cond("precipitation", "!=", 0.0)),
+    _rule(3, "low", _cond("atmospheric_temperature", "<=", 10.0)),
+    _rule(4, "moderate", _cond("atmospheric_temperature", "==", 18.0)),
+)
+
+
+@pytest.fixture(scope="module")
+def weather() -> pd.DataFrame:
+    rng = np.random.default_rng(3)
+    n = 2000
+    df = pd.DataFrame({
+        "atmospheric_temperature":       rng.choice([5.0, 10.0, 15.0, 18.0, 21.0, 30.0], n),
+        "atmospheric_relative_humidity": rng.uniform(40.0, 100.0, n),
+        "precipitation":                 rng.choice([0.0, 0.2, 3.0], n),
+    })
+    df.loc[::97, "atmospheric_temperature"] = np.nan
+    df.loc[::89, "precipitation"] = np.nan
+    return df
+
+
+def _eval_last_match(df: pd.DataFrame, pm) -> list:
+    """The removed per-rule eval() loop (last firing rule wins)."""
+    risks = ["Low"] * df.shape[0]
+    for rule in pm.rules:
+        final_str = " & ".join(
+            "(x['{}'] {} {})".format(c.unit.name, c.operator.symbol, float(c.value))
+            for c in rule.conditions
+        )
+        fired = df.assign(risk=eval("lambda x: {}".format(final_str)))["risk"]
+        risks = [rule.probability_value if x else y for x, y in zip(fired, risks)]
+    return risks
+
+
+def _eval_hourly(hours: list[dict], pm, parameter=None) -> list:
+    """The removed per-hour, per-condition eval() loop of the _wd path."""
+    out = []
+    for hour in hours:
+        current = "low"
+        for rule in pm.rules:
+            if parameter and prob_values[rule.probability_value] < prob_values[parameter]:
+                continue
+            if prob_values[rule.probability_value] <= prob_values[current]:
+                continue
+            if all(
+                eval("{} {} {}".format(hour[c.unit.name], c.operator.symbol, c.value))
+                for c in rule.conditions
+            ):
+                current = rule.probability_value
+        out.append(current)
+    return out
+
+
+class TestCompiledPestModel:
+    def test_last_match_matches_eval(self, weather):
+        compiled = compile_pest_model(PEST_MODEL)
+        result = compiled.last_match(weather, n=len(weather))
+        assert result.tolist() == _eval_last_match(weather, PEST_MODEL)
+
+    @pytest.mark.parametrize("parameter", [None, "moderate", "high"])
+    def test_highest_match_matches_eval(self, weather, parameter):
+        hours = weather.dropna().head(500).to_dict(orient="records")
+        frame = pd.DataFrame(hours)
+        compiled = compile_pest_model(PEST_MODEL)
+        result = compiled.highest_match(
+            frame, n=len(frame), ranks=prob_values, min_value=parameter,
+        )
+        assert result.tolist() == _eval_hourly(hours, PEST_MODEL, parameter)
+
+    def test_rule_without_conditions_never_fires(self):
+        pm = _pest_model(_rule(1, "high"))
+        result = compile_pest_model(pm).last_match({}, n=3)
+        assert result.tolist() == ["Low"] * 3
+
+    def test_units(self):
+        assert compile_pest_model(PEST_MODEL).units() == {
+            "atmospheric_temperature", "atmospheric_relative_humidity", "precipitation",
+        }
+
+    def test_unknown_operator_rejected(self):
+        pm = _pest_model(_rule(1, "high", _cond("precipitation", "=>", 1.0)))
+        with pytest.raises(ValueError):
+            compile_pest_model(pm)
+
+
+class TestPestRuleCache:
+    def test_reuses_compiled_model(self):
+        cache = PestRuleCache()
+        pm = _pest_model(_rule(1, "high", _cond("precipitation", ">", 1.0)))
+        assert cache.get(pm) is cache.get(pm)
+
+    def test_compiled_model_passes_through(self):
+        compiled = compile_pest_model(PEST_MODEL)
+        assert PestRuleCache().get(compiled) is compiled
+
+    def test_recompiles_when_rules_change(self):
+        cache = PestRuleCache()
+        pm = _pest_model(_rule(1, "high", _cond("precipitation", ">", 1.0)))
+        first = cache.get(pm)
+        pm.rules[0].conditions[0].value = 2.0
+        second = cache.get(pm)
+        assert second is not first
+        assert second.rules[0].conditions[0].value == 2.0
+
+
+class TestRiskIndexProbabilityWd:
+    @pytest.fixture(scope="class")
+    def hours(self, weather) -> list[dict]:
+        return weather.dropna().head(500).to_dict(orient="records")
+
+    @pytest.fixture(scope="class")
+    def weather_data(self, hours) -> dict:
+        return {
+            "data": [
+                {
+                    "timestamp": f"2024-06-01T{i:05d}",
+                    "values": {openmeteo_friendly_variables[k]: v for k, v in hour.items()},
+                }
+                for i, hour in enumerate(hours)
+            ]
+        }
+
+    @pytest.mark.parametrize("parameter", [None, "moderate", "high"])
+    def test_matches_per_hour_eval(self, hours, weather_data, parameter):
+        doc = calculate_risk_index_probability_wd(
+            parcel={"@id": "p1"}, pest_models=[PEST_MODEL, PEST_MODEL],
+            weather_data=weather_data, lat=45.0, lon=14.0, parameter=parameter,
+        )
+        expected = [
+            (f"2024-06-01T{i:05d}", risk)
+            for i, risk in enumerate(_eval_hourly(hours, PEST_MODEL, parameter))
+            if not parameter or prob_values[risk] >= prob_values[parameter]
+        ]
+        assert len(doc["@graph"]) == 2
+        for collection in doc["@graph"]:
+            members = [(m["phenomenonTime"], m["hasSimpleResult"]) for m in collection["hasMember"]]
+            assert members == expected
+
+
+class TestPestModelCatalog:
+    @pytest.fixture
+    def models(self):
+        return [
+            _pest_model(_rule(10 + i, "high", _cond("precipitation", ">", float(i))))
+            for i in range(3)
+        ]
+
+    @pytest.fixture
+    def crud_pest_model(self, mocker, models):
+        by_id = {pm.id: pm for pm in models}
+        mock = mocker.patch("utils.rule_compiler.crud.pest_model")
+        mock.get_with_rules.side_effect = lambda db, ids: [by_id[i] for i in ids if i in by_id]
+        return mock
+
+    def test_resolve_order_and_missing(self, crud_pest_model, models):
+        catalog = PestModelCatalog(maxsize=8)
+        unknown = uuid.uuid4()
+        found, missing = catalog.resolve(MagicMock(), [models[2].id, unknown, models[0].id])
+        assert [pm.id for pm in found] == [models[2].id, models[0].id]
+        assert missing == [unknown]
+
+    def test_one_load_for_all_misses(self, crud_pest_model, models):
+        catalog = PestModelCatalog(maxsize=8)
+        ids = [pm.id for pm in models]
+        catalog.resolve(MagicMock(), ids)
+        catalog.resolve(MagicMock(), ids)
+        crud_pest_model.get_with_rules.assert_called_once()
+
+    def test_lru_eviction(self, crud_pest_model, models):
+        catalog = PestModelCatalog(maxsize=2)
+        catalog.resolve(MagicMock(), [models[0].id, models[1].id])
+        catalog.resolve(MagicMock(), [models[0].id])
+        catalog.resolve(MagicMock(), [models[2].id])
+        crud_pest_model.get_with_rules.reset_mock()
+        catalog.resolve(MagicMock(), [models[0].id, models[1].id])
+        crud_pest_model.get_with_rules.assert_called_once_with(db=ANY, ids=[models[1].id])
+
+    def test_invalidate_by_rule_id(self, crud_pest_model, models):
+        catalog = PestModelCatalog(maxsize=8)
+        catalog.resolve(MagicMock(), [pm.id for pm in models])
+        catalog.invalidate(rule_ids=[11], pest_model_ids=[])
+        crud_pest_model.get_with_rules.reset_mock()
+        catalog.resolve(MagicMock(), [pm.id for pm in models])
+        crud_pest_model.get_with_rules.assert_called_once_with(db=ANY, ids=[models[1].id])
+
+
+class TestFlushInvalidation:
+    @pytest.fixture
+    def catalog(self, mocker):
+        return mocker.patch("utils.rule_compiler.pest_model_catalog")
+
+    @staticmethod
+    def _session(new=(), dirty=(), deleted=()):
+        return SimpleNamespace(new=list(new), dirty=list(dirty), deleted=list(deleted), info={})
+
+    def test_new_rule_invalidates_its_pest_model(self, catalog):
+        pm_id = uuid.uuid4()
+        rule = Rule(id=5, pest_model_id=pm_id)
+        _invalidate_changed_pest_models(self._session(new=[rule]), None)
+        catalog.invalidate.assert_called_once_with({pm_id}, {5})
+
+    def test_condition_invalidates_by_rule(self, catalog):
+        _invalidate_changed_pest_models(self._session(deleted=[Condition(rule_id=7)]), None)
+        catalog.invalidate.assert_called_once_with(set(), {7})
+
+    def test_pest_model_change(self, catalog):
+        pm = PestModel(id=uuid.uuid4(), name="X")
+        _invalidate_changed_pest_models(self._session(dirty=[pm]), None)
+        catalog.invalidate.assert_called_once_with({pm.id}, set())
+
+    def test_unit_change_clears_everything(self, catalog):
+        _invalidate_changed_pest_models(self._session(dirty=[Unit(name="x")]), None)
+        catalog.invalidate.assert_called_once_with()
+
+    def test_unrelated_rows_ignored(self, catalog):
+        session = self._session(new=[object()])
+        _invalidate_changed_pest_models(session, None)
+        _invalidate_committed_pest_models(session)
+        catalog.invalidate.assert_not_called()
+
+    def test_invalidated_again_on_commit(self, catalog):
+        session = self._session(deleted=[Condition(rule_id=7)])
+        _invalidate_changed_pest_models(session, None)
+        session.deleted = [Condition(rule_id=8)]
+        _invalidate_changed_pest_models(session, None)
+        catalog.invalidate.reset_mock()
+
+        _invalidate_committed_pest_models(session)
+        catalog.invalidate.assert_called_once_with(set(), {7, 8})
+        # the next transaction starts clean
+        _invalidate_committed_pest_models(session)
+        catalog.invalidate.assert_called_once()
+
+    def test_unit_change_clears_everything_on_commit(self, catalog):
+        session = self._session(dirty=[Unit(name="x")])
+        _invalidate_changed_pest_models(session, None)
+        session.dirty = [Condition(rule_id=7)]
+        _invalidate_changed_pest_models(session, None)
+        catalog.invalidate.reset_mock()
+
+        _invalidate_committed_pest_models(session)
+        catalog.invalidate.assert_called_once_with()
+
+    def test_rollback_forgets_the_changes(self, catalog):
+        session = self._session(deleted=[Condition(rule_id=7)])
+        _invalidate_changed_pest_models(session, None)
+        _forget_rolled_back_pest_models(session)
+        catalog.invalidate.reset_mock()
+
+        _invalidate_committed_pest_models(session)
+        catalog.invalidate.assert_not_called()
+
+
+class TestRiskIndexSqlPushdown:
+    @pytest.fixture(scope="class")
+    def db(self, weather):
+        engine = create_engine("sqlite://")
+        Data.__table__.create(engine)
+        session = sessionmaker(bind=engine)()
+        start = datetime.datetime(2024, 5, 1)
+        for i, row in enumerate(weather.head(300).itertuples(index=False)):
+            ts = start + datetime.timedelta(hours=i)
+            session.add(Data(
+                id=i + 1, parcel_id=1, date=ts.date(), time=ts.time(),
+                atmospheric_temperature=None if np.isnan(row.atmospheric_temperature) else row.atmospheric_temperature,
+                atmospheric_relative_humidity=row.atmospheric_relative_humidity,
+                precipitation=None if np.isnan(row.precipitation) else row.precipitation,
+            ))
+        session.commit()
+        yield session
+        session.close()
+
+    @staticmethod
+    def _results(graph: dict) -> list:
+        return [
+            [(o["phenomenonTime"], o["hasSimpleResult"]) for o in element["hasMember"]]
+            for element in graph["@graph"]
+        ]
+
+    @pytest.mark.parametrize("parameter", [None, "high", "moderate"])
+    def test_sql_case_matches_pandas(self, db, parameter):
+        args = (db, SimpleNamespace(id=1, latitude=40.0, longitude=22.0), [PEST_MODEL],
+                datetime.date(2024, 5, 1), datetime.date(2024, 5, 31), parameter)
+        in_pandas = calculate_risk_index_probability(*args, pushdown=False)
+        in_sql = calculate_risk_index_probability(*args, pushdown=True)
+        assert self._results(in_sql) == self._results(in_pandas)
+        assert any(self._results(in_sql)[0])
+
+    def test_unknown_column_falls_back_to_pandas(self, db, mocker):
+        pm = _pest_model(_rule(1, "high", _cond("not_a_data_column", ">", 1.0)))
+        get_risk_rows = mocker.patch("crud.data.get_risk_rows")
+        with pytest.raises(KeyError):
+            calculate_risk_index_probability(db, SimpleNamespace(id=1, latitude=40.0, longitude=22.0), [pm],
+                                             datetime.date(2024, 5, 1), datetime.date(2024, 5, 31),
+                                             pushdown=True)
+        get_risk_rows.assert_not_called()
+
+    def test_no_rules_is_default_literal(self):
+        compiled = compile_pest_model(_pest_model())
+        assert compiled.sql_case(Data.__table__.c).value == "Low"
@@ -0,0 +1,98 @@
+"""
+Unit tests for app/utils/sensor_buffer.py.
+crud and the GDD refresh are patched, so no database is needed.
+"""
+
+from __future__ import annotations
+
+import datetime
+from unittest.mock import MagicMock
+
+import pandas as pd
+import pytest
+
+from utils.sensor_buffer import SensorBuffer
+
+MODULE = "utils.sensor_buffer"
+
+
+@pytest.fixture
+def mock_crud(mocker) -> MagicMock:
+    crud = mocker.patch(f"{MODULE}.crud")
+    crud.data.bulk_write.side_effect = lambda db, frame, parcel_id, on_conflict: len(frame)
+    mocker.patch(f"{MODULE}.refresh_after_ingest")
+    return crud
+
+
+def _at(hour: int, minute: int) -> datetime.datetime:
+    return datetime.datetime(2024, 6, 1, hour, minute)
+
+
+def _written(mock_crud) -> list:
+    return [(c.kwargs["parcel_id"], c.kwargs["frame"]) for c in mock_crud.data.bulk_write.call_args_list]
+
+
+class TestSensorBuffer:
+    def test_readings_are_averaged_per_hour(self, mock_crud):
+        buffer = SensorBuffer()
+        buffer.append(1, [
+            (_at(6, 0), "a", {"leaf_wetness": 1.0, "precipitation": 0.2}),
+            (_at(6, 1), "a", {"leaf_wetness": 0.0, "precipitation": 0.2}),
+            (_at(6, 0), "b", {"leaf_wetness": 0.5, "precipitation": 0.6}),
+            (_at(7, 0), "a", {"leaf_wetness": 1.0, "precipitation": 0.0}),
+        ])
+        assert buffer.flush(db=MagicMock()) == 2
+
+        [(parcel_id, frame)] = _written(mock_crud)
+        assert parcel_id == 1
+        assert frame["date"].tolist() == [pd.Timestamp("2024-06-01 06:00"), pd.Timestamp("2024-06-01 07:00")]
+        assert frame["leaf_wetness"].tolist() == pytest.approx([0.5, 1.0])
+        # summed per node, averaged over the nodes
+        assert frame["precipitation"].tolist() == pytest.approx([0.5, 0.0])
+        assert mock_crud.data.bulk_write.call_args.kwargs["on_conflict"] == "update"
+
+    def test_open_hour_keeps_averaging_across_flushes(self, mock_crud):
+        buffer = SensorBuffer()
+        buffer.append(1, [(_at(6, 0), None, {"leaf_temperature": 10.0})])
+        buffer.flush(db=MagicMock())
+        buffer.append(1, [(_at(6, 30), None, {"leaf_temperature": 20.0})])
+        buffer.flush(db=MagicMock())
+        # an unchanged hour is not written again
+        buffer.flush(db=MagicMock())
+
+        frames = [frame for _, frame in _written(mock_crud)]
+        assert [f["leaf_temperature"].tolist() for f in frames] == [[10.0], [15.0]]
+
+    def test_columns_are_written_separately(self, mock_crud):
+        buffer = SensorBuffer()
+        buffer.append(1, [(_at(6, 0), None, {"leaf_wetness": 1.0}),
+                          (_at(7, 0), None, {"leaf_temperature": 12.0})])
+        buffer.append(2, [(_at(6, 0), None, {"leaf_wetness": 0.0})])
+        buffer.flush(db=MagicMock())
+
+        assert sorted((parcel_id, sorted(frame.columns)) for parcel_id, frame in _written(mock_crud)) == [
+            (1, ["date", "leaf_temperature"]), (1, ["date", "leaf_wetness"]), (2, ["date", "leaf_wetness"]),
+        ]
+
+    def test_due_by_size_and_full(self, mock_crud, mocker):
+        mocker.patch("core.config.settings.SENSOR_BUFFER_FLUSH_SIZE", 2)
+        mocker.patch("core.config.settings.SENSOR_BUFFER_MAX_DEPTH", 3)
+        buffer = SensorBuffer()
+        assert buffer.append(1, [(_at(6, 0), None, {"leaf_wetness": 1.0})])
+        assert not buffer.due()
+        assert buffer.append(1, [(_at(6, 1), None, {"leaf_wetness": 1.0})])
+        assert buffer.due()
+        assert not buffer.append(1, [(_at(6, m), None, {"leaf_wetness": 1.0}) for m in (2, 3)])
+        assert buffer.stats()["depth"] == 2 and buffer.stats()["rejected_readings"] == 2
+
+        buffer.flush(db=MagicMock())
+        stats = buffer.stats()
+        assert stats["depth"] == 0 and stats["flushes"] == 1 and stats["last_flush_seconds"] is not None
+
+    def test_failed_write_is_counted(self, mock_crud):
+        mock_crud.data.bulk_write.side_effect = None
+        mock_crud.data.bulk_write.return_value = None
+        buffer = SensorBuffer()
+        buffer.append(9, [(_at(6, 0), None, {"leaf_wetness": 1.0})])
+        assert buffer.flush(db=MagicMock()) == 0
+        assert buffer.stats()["failed_hours"] == 1
@@ -0,0 +1,151 @@
+"""
+Tests for the grid-cell shared weather store: reads resolving a parcel's hours
+through its weather cell on an in-memory SQLite database, and the fetch / write
+paths with crud patched.
+"""
+
+from __future__ import annotations
+
+import datetime
+from types import SimpleNamespace
+from unittest.mock import MagicMock
+
+import numpy as np
+import pandas as pd
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.orm import sessionmaker
+
+import crud
+from crud.crud_data_daily import rollup_select
+from models import Data, Parcel, WeatherCell, WeatherCellData
+from utils.data import _dedupe_and_store_hourly, fetch_historical_data_for_parcel, store_parcel_weather
+
+
+def _at(hour: int) -> datetime.time:
+    return datetime.time(hour)
+
+
+@pytest.fixture
+def shared(mocker):
+    mocker.patch("core.config.settings.WEATHER_SHARED_CELLS", True)
+
+
+@pytest.fixture
+def db():
+    engine = create_engine("sqlite://")
+    for model in (WeatherCell, Parcel, Data, WeatherCellData):
+        model.__table__.create(engine)
+    session = sessionmaker(bind=engine)()
+    session.add(WeatherCell(id=1, latitude=45.0, longitude=14.0))
+    session.add_all([
+        Parcel(id=1, name="a", latitude=45.01, longitude=14.02, weather_cell_id=1),
+        Parcel(id=2, name="b", latitude=44.99, longitude=13.98, weather_cell_id=1),
+        Parcel(id=3, name="c", latitude=40.0, longitude=10.0),
+    ])
+    day = datetime.date(2024, 6, 1)
+    for i, hour in enumerate((5, 6, 7), start=1):
+        session.add(WeatherCellData(id=i, cell_id=1, date=day, time=_at(hour),
+                                    atmospheric_temperature=10.0 + hour, precipitation=0.5))
+    # parcel 1's own logger overrides the cell at 06:00
+    session.add(Data(id=1, parcel_id=1, date=day, time=_at(6), atmospheric_temperature=30.0))
+    session.commit()
+    yield session
+    session.close()
+
+
+def _hours(db, parcel_id: int):
+    rows = crud.data.get_data_by_parcel_id_and_date_interval(
+        db=db, parcel_id=parcel_id, start=datetime.date(2024, 6, 1), end=datetime.date(2024, 6, 1)
+    )
+    return [(row.id, row.time.hour, row.atmospheric_temperature) for row in rows]
+
+
+class TestSharedReads:
+    def test_parcel_rows_override_the_cell(self, db, shared):
+        assert _hours(db, 1) == [(None, 5, 15.0), (1, 6, 30.0), (None, 7, 17.0)]
+
+    def test_neighbour_reads_the_cell(self, db, shared):
+        assert _hours(db, 2) == [(None, 5, 15.0), (None, 6, 16.0), (None, 7, 17.0)]
+        assert _hours(db, 3) == []
+
+    def test_off_by_default(self, db):
+        assert _hours(db, 1) == [(1, 6, 30.0)]
+        assert _hours(db, 2) == []
+
+    def test_rollup_counts_the_cell_hours(self, db, shared):
+        [row] = db.execute(rollup_select(2, [datetime.date(2024, 6, 1)])).all()
+        assert row[1:6] == (datetime.date(2024, 6, 1), 15.0, 17.0, 16.0, None) and row[6] == 1.5
+
+    def test_weather_columns(self, db, shared):
+        columns = crud.data.get_weather_columns(
+            db=db, parcel_id=1, columns=["atmospheric_temperature"],
+            date_from=datetime.date(2024, 6, 1), date_to=datetime.date(2024, 6, 1),
+        )
+        assert columns["time"].astype("timedelta64[h]").astype(int).tolist() == [5, 6, 7]
+        assert columns["atmospheric_temperature"].tolist() == [15.0, 30.0, 17.0]
+
+
+class TestSharedWrites:
+    @staticmethod
+    def _frame() -> pd.DataFrame:
+        return pd.DataFrame({
+            "date": pd.date_range("2024-06-01 00:00", periods=2, freq="h"),
+            "atmospheric_temperature": [10.0, np.nan],
+        })
+
+    def test_cell_bulk_write_refreshes_every_parcel(self, mocker):
+        mocker.patch("crud.crud_weather_cell_data.weather_cell.get_parcel_ids", return_value=[1, 2])
+        refresh = mocker.patch("crud.crud_weather_cell_data.data_daily.refresh")
+        session = MagicMock()
+        session.execute.return_value.scalars.return_value.all.return_value = [datetime.date(2024, 6, 1)] * 2
+
+        assert crud.weather_cell_data.bulk_write(db=session, frame=self._frame(), cell_id=7) == 2
+
+        stmt = session.execute.call_args.args[0]
+        compiled = stmt.compile(dialect=postgresql.dialect())
+        assert "ON CONFLICT ON CONSTRAINT uq_weather_cell_data_cell_date_time DO NOTHING" in str(compiled)
+        assert compiled.params["cell_id_m0"] == 7
+        assert [c.kwargs["parcel_id"] for c in refresh.call_args_list] == [1, 2]
+        session.commit.assert_called_once()
+
+    def test_store_routes_through_the_cell(self, mocker, shared):
+        mock_crud = mocker.patch("utils.data.crud")
+        mock_crud.weather_cell.assign.return_value = SimpleNamespace(id=7)
+        mock_crud.weather_cell.get_parcel_ids.return_value = [1, 2]
+        mock_crud.weather_cell_data.bulk_write.return_value = 2
+
+        assert store_parcel_weather(db=MagicMock(), frame=self._frame(), parcel=SimpleNamespace(id=1)) == (2, [1, 2])
+        assert mock_crud.weather_cell_data.bulk_write.call_args.kwargs["cell_id"] == 7
+        mock_crud.data.bulk_write.assert_not_called()
+
+    def test_store_without_cells(self, mocker):
+        mock_crud = mocker.patch("utils.data.crud")
+        mock_crud.data.bulk_write.return_value = 2
+        assert store_parcel_weather(db=MagicMock(), frame=self._frame(), parcel=SimpleNamespace(id=1)) == (2, [1])
+        mock_crud.weather_cell.assign.assert_not_called()
+
+    def test_ingest_refreshes_every_parcel_of_the_cell(self, mocker, shared):
+        mocker.patch("utils.data.store_parcel_weather", return_value=(2, [1, 2]))
+        refresh = mocker.patch("utils.data.refresh_after_ingest")
+        assert _dedupe_and_store_hourly(MagicMock(), self._frame(), SimpleNamespace(id=1)) == 2
+        assert [c.args[1:] for c in refresh.call_args_list] == [
+            (1, datetime.date(2024, 6, 1)), (2, datetime.date(2024, 6, 1)),
+        ]
+
+    def test_history_fetched_by_a_neighbour_is_not_fetched_again(self, mocker, shared):
+        mock_crud = mocker.patch("utils.data.crud")
+        mock_crud.weather_cell.assign.return_value = SimpleNamespace(id=7, latitude=45.0, longitude=14.0)
+        mock_crud.weather_cell_data.get_dates.side_effect = lambda db, cell_id, start, end: [
+            start + datetime.timedelta(days=i) for i in range((end - start).days + 1)
+        ]
+        fetch = mocker.patch("utils.data.weather_api")
+        session = MagicMock()
+        parcel = SimpleNamespace(id=3, latitude=45.01, longitude=14.02, weather_cell_id=7)
+
+        fetch_historical_data_for_parcel(db=session, parcel=parcel)
+
+        fetch.assert_not_called()
+        assert mock_crud.data_daily.refresh.call_args.kwargs["parcel_id"] == 3
+        session.commit.assert_called_once()